@@ -1,4 +1,7 @@
 from .flock import Flock
-from .boid import Boid
+from .boid import Boid, BoidView
 from .spatial_hash_grid import SpatialHashGrid
-from .profiler import profile
+from .vector import Vector2
+from .profiler import profile, FlockProfiler
+from .recorder import TrajectoryRecorder, TrajectoryReader
+from .loop import SimulationLoop
@@ -0,0 +1,181 @@
+"""Predators and attractors that the boids of a flock react to
+
+A group of agents is a rule of the flock. The agents are indexed in their
+own SpatialHashGrid with cells as big as the radius the boids react in, so
+every boid only looks at the agents in the 3 by 3 cells around it, no
+matter how many agents there are.
+"""
+import numpy as np
+
+from boids import vectorized
+from boids.rules import Neighbours, Rule
+from boids.spatial_hash_grid import SpatialHashGrid
+
+
+class Agents(Rule):
+    """A group of agents the boids steer to or away from
+
+    Moving agents see the boids a boid would see from where they are, in
+    the grid of the flock, and steer to their center with the same
+    vectorized cohesion as the boids. They keep in the bounds of the world
+    and away from its obstacles like the boids.
+    """
+    neighbours = None
+
+    # 1 when the boids seek the agents and -1 when they flee from them
+    response = 1.0
+
+    def __init__(self, positions: np.ndarray, directions: np.ndarray = None,
+                 radius: float = 100.0, factor: float = 0.5,
+                 max_speed: float = 0.0, chase_factor: float = 0.0):
+        """The initialize method
+
+        Args:
+            positions (np.ndarray): the positions of the agents
+            directions (np.ndarray, optional): the directions of the agents.
+                Defaults to None for agents that stand still.
+            radius (float, optional): how far away the boids react to an
+                agent. Defaults to 100.0.
+            factor (float, optional): how strongly the boids react, most
+                strongly right next to an agent. Defaults to 0.5.
+            max_speed (float, optional): the maximum speed of the agents,
+                0 for agents that don't move. Defaults to 0.0.
+            chase_factor (float, optional): the factor of the agents going
+                to the center of the boids they see. Defaults to 0.0.
+        """
+        self.positions = np.array(positions, float).reshape(-1, 2)
+        if directions is None:
+            self.directions = np.zeros_like(self.positions)
+        else:
+            self.directions = np.array(directions, float).reshape(-1, 2)
+
+        self.radius = radius
+        self.factor = factor
+        self.max_speed = max_speed
+        self.chase_factor = chase_factor
+
+        # Created for the world of the first flock
+        self.grid = None
+
+    def prepare(self, flock):
+        """Move the agents and index them
+
+        Args:
+            flock (Flock): the flock of the boids, its grid is rebuilt
+        """
+        if self.grid is None or self.grid.cell_size != self.radius:
+            # A perception of 2 cells covers the radius around every boid
+            self.grid = SpatialHashGrid(
+                self.radius, 2, 360, "rebuild",
+                (flock.world_size.x, flock.world_size.y), flock.loop_bounds
+            )
+
+        if self.max_speed:
+            self.move(flock)
+
+        self.grid.rebuild(self.positions)
+
+    def offsets(self, flock, positions: np.ndarray, others: np.ndarray,
+                points: np.ndarray) -> np.ndarray:
+        """Get the offsets from points to others, the short way around a
+        looping world
+
+        Args:
+            flock (Flock): the flock of the world
+            positions (np.ndarray): the positions of the others
+            others (np.ndarray): the other of every pair
+            points (np.ndarray): the point of every pair
+
+        Returns:
+            np.ndarray: the offset of every pair
+        """
+        offsets = positions[others] - points
+
+        if flock.loop_bounds:
+            world_size = np.array(flock.world_size)
+            offsets -= world_size * np.round(offsets / world_size)
+
+        return offsets
+
+    def move(self, flock):
+        """Steer the agents to the boids they see and move them
+
+        Args:
+            flock (Flock): the flock of the boids, its grid is rebuilt
+        """
+        positions, directions = self.positions, self.directions
+        world_size = np.array(flock.world_size)
+
+        if self.chase_factor:
+            # The boids in the perception cells of the flock around an agent
+            agents, boids = vectorized.query_pairs(flock.spatial_hash_grid,
+                                                   positions)
+            offsets = self.offsets(flock, flock.positions, boids,
+                                   positions[agents])
+
+            # Agents see as far as the boids do
+            if flock.perception_radius is not None:
+                close = ((offsets ** 2).sum(axis=1) <=
+                         flock.perception_radius ** 2)
+                agents, offsets = agents[close], offsets[close]
+
+            vectorized.cohesion(
+                directions, agents, offsets,
+                np.bincount(agents, minlength=len(positions)),
+                self.chase_factor * flock.time_scale
+            )
+
+        # Keep the agents within bounds, away from obstacles and slow enough
+        if flock.loop_bounds:
+            vectorized.keep_in_bounds_loop(positions, world_size)
+        else:
+            vectorized.keep_in_bounds_turn(
+                positions, directions, world_size,
+                flock.turn_margin, flock.turn_factor * flock.time_scale
+            )
+        if flock.obstacle_field is not None:
+            vectorized.avoid_obstacles(
+                positions, directions, flock.obstacle_field,
+                flock.turn_margin, flock.turn_factor * flock.time_scale
+            )
+        vectorized.limit_speed(directions, self.max_speed)
+
+        positions += directions * flock.time_scale
+
+    def apply(self, flock, start: int, stop: int, neighbours: Neighbours,
+              directions: np.ndarray):
+        points = flock.positions[start:stop]
+
+        # Only the agents in the cells around every boid
+        boids, agents = vectorized.query_pairs(self.grid, points)
+        offsets = self.offsets(flock, self.positions, agents, points[boids])
+        distances = np.hypot(offsets[:, 0], offsets[:, 1])
+
+        close = distances < self.radius
+        boids, offsets = boids[close], offsets[close]
+        distances = distances[close]
+
+        # The direction to every agent, weighted from 1 next to the agent
+        # to 0 at the radius
+        weight = (1 - distances / self.radius) / np.maximum(distances, 1e-12)
+        steering = vectorized.sum_by_boid(boids, offsets * weight[:, None],
+                                          len(directions))
+
+        directions += steering * (self.response * self.factor *
+                                  flock.time_scale)
+
+
+class Predators(Agents):
+    """Agents the boids flee from, by default they chase the boids"""
+    response = -1.0
+
+    def __init__(self, positions: np.ndarray, directions: np.ndarray = None,
+                 radius: float = 100.0, factor: float = 0.5,
+                 max_speed: float = 10.0, chase_factor: float = 0.01):
+        super().__init__(positions, directions, radius, factor, max_speed,
+                         chase_factor)
+
+
+class Attractors(Agents):
+    """Agents the boids seek, by default they stand still"""
+    response = 1.0
@@ -0,0 +1,343 @@
+"""Benchmark the flock and the grid and save the results as JSON
+
+Example:
+    python -m boids.benchmark --out results.json
+    python -m boids.benchmark --out new.json --compare results.json
+"""
+from typing import Callable, Dict, Iterable, List, Tuple
+import argparse
+import json
+import platform
+import statistics
+import time
+import numpy as np
+
+from boids.boid import Boid
+from boids.config import load_config
+from boids.flock import Flock, ENGINES
+from boids.spatial_hash_grid import SpatialHashGrid
+from boids.vector import Vector2
+
+
+BOID_COUNTS = (100, 1000, 10000, 100000)
+
+# The (cell_size, perception) pairs to benchmark
+GRID_SETTINGS = ((100, 2), (50, 3), (25, 5))
+
+# The fields of view to benchmark getting the boids with
+FIELDS_OF_VIEW = (120, 270, 360)
+
+# The number of boids per 1000 by 1000 area, the same as main.py
+DENSITY = 150
+
+# The object engine and grid are too slow for the biggest flocks
+MAX_OBJECT_BOIDS = 10000
+
+
+def time_it(fnc: Callable[[], None], repeat: int) -> Dict[str, float]:
+    """Time a function after running it once to warm up
+
+    Args:
+        fnc (Callable[[], None]): the function to time
+        repeat (int): the number of times to run the function
+
+    Returns:
+        Dict[str, float]: the median, minimum and maximum seconds
+    """
+    fnc()
+
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fnc()
+        times.append(time.perf_counter() - start)
+
+    return {
+        "seconds": statistics.median(times),
+        "min": min(times),
+        "max": max(times),
+    }
+
+
+def create_flock(num_boids: int, cell_size: int, perception: int,
+                 loop_bounds: bool, engine: str) -> Flock:
+    """Create a flock with the same density of boids as main.py, seeded so
+    every engine gets the same boids
+
+    Args:
+        num_boids (int): the number of boids
+        cell_size (int): the size of the grid cells
+        perception (int): how many cells away can a boid see
+        loop_bounds (bool): use loop or turn
+        engine (str): how the boids are updated
+
+    Returns:
+        Flock: the flock
+    """
+    size = int(1000 * np.sqrt(num_boids / DENSITY))
+
+    config = load_config(
+        num_boids=num_boids, world_size=(size, size),
+        cell_size=cell_size, perception=perception, loop_bounds=loop_bounds
+    )
+    return Flock(**config, engine=engine, rng=np.random.default_rng(0))
+
+
+def benchmark_grid(
+    flock: Flock, repeat: int,
+    fields_of_view: Iterable[float] = FIELDS_OF_VIEW
+) -> Iterable[Tuple[str, dict, dict]]:
+    """Benchmark the grid operations on the boids of a flock
+
+    Args:
+        flock (Flock): a flock with the "object" engine
+        repeat (int): the number of times to run every benchmark
+        fields_of_view (Iterable[float], optional): the fields of view to
+            get the boids with. Defaults to FIELDS_OF_VIEW.
+
+    Yields:
+        Tuple[str, dict, dict]: the name, extra parameters and timings of
+            every benchmark
+    """
+    boids = flock.boids
+    grid = flock.spatial_hash_grid
+    positions = np.array([tuple(boid.pos) for boid in boids])
+
+    # Inserting and moving changes the cells of the boids, so they use
+    # copies and the grid of the flock stays the same
+    def copy_boids() -> List[Boid]:
+        return [Boid(Vector2(boid.pos), boid.dir, boid.type, boid.color)
+                for boid in boids]
+
+    # The grids have the world of the flock and wrap around it like the
+    # grid of the flock when the boids loop around
+    def create_grid(mode: str = "incremental") -> SpatialHashGrid:
+        return SpatialHashGrid(grid.cell_size, grid.perception, 360, mode,
+                               grid.world_size, grid.wrap, grid.storage)
+
+    insert_boids = copy_boids()
+    move_boids = copy_boids()
+    move_grid = create_grid()
+    for boid in move_boids:
+        move_grid.insert(boid, boid.pos)
+
+    def get_boids():
+        for boid in boids:
+            grid.get_boids(boid)
+
+    def insert():
+        new_grid = create_grid()
+        for boid in insert_boids:
+            new_grid.insert(boid, boid.pos)
+
+    def move():
+        # Every call moves the boids on, like an update does
+        for boid in move_boids:
+            boid.pos.x += boid.dir.x
+            boid.pos.y += boid.dir.y
+            move_grid.move(boid, boid.pos)
+
+    def rebuild():
+        new_grid = create_grid("rebuild")
+        new_grid.rebuild(positions)
+
+    for field_of_view in fields_of_view:
+        flock.field_of_view = field_of_view
+        yield ("get_boids", {"field_of_view": field_of_view},
+               time_it(get_boids, repeat))
+
+    yield "insert", {}, time_it(insert, repeat)
+    yield "move", {}, time_it(move, repeat)
+    yield "rebuild", {}, time_it(rebuild, repeat)
+
+
+def run_benchmarks(counts: Iterable[int] = BOID_COUNTS,
+                   grid_settings: Iterable[Tuple[int, int]] = GRID_SETTINGS,
+                   engines: Iterable[str] = ENGINES,
+                   repeat: int = 5,
+                   max_object_boids: int = MAX_OBJECT_BOIDS) -> dict:
+    """Run all benchmarks
+
+    Args:
+        counts (Iterable[int], optional): the numbers of boids.
+            Defaults to BOID_COUNTS.
+        grid_settings (Iterable[Tuple[int, int]], optional): the cell sizes
+            and perceptions. Defaults to GRID_SETTINGS.
+        engines (Iterable[str], optional): the engines of the flock.
+            Defaults to ENGINES.
+        repeat (int, optional): the number of times to run every benchmark.
+            Defaults to 5.
+        max_object_boids (int, optional): the most boids to benchmark the
+            "object" engine and grid with. Defaults to MAX_OBJECT_BOIDS.
+
+    Returns:
+        dict: the machine and the results of all benchmarks
+    """
+    results = []
+
+    for num_boids in counts:
+        for cell_size, perception in grid_settings:
+            for loop_bounds in (True, False):
+                params = {
+                    "boids": num_boids,
+                    "cell_size": cell_size,
+                    "perception": perception,
+                    "loop_bounds": loop_bounds,
+                }
+
+                for engine in engines:
+                    if engine == "object" and num_boids > max_object_boids:
+                        continue
+
+                    flock = create_flock(num_boids, cell_size, perception,
+                                         loop_bounds, engine)
+
+                    with flock:
+                        timings = time_it(flock.update_boids, repeat)
+                    results.append({"benchmark": "update_boids",
+                                    "engine": engine, **params, **timings})
+
+                # A grid that wraps finds boids across the edges as well
+                if num_boids > max_object_boids:
+                    continue
+
+                flock = create_flock(num_boids, cell_size, perception,
+                                     loop_bounds, "object")
+
+                for name, extra, timings in benchmark_grid(flock, repeat):
+                    results.append({"benchmark": name, "engine": "object",
+                                    **params, **extra, **timings})
+
+    return {
+        "machine": {
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "processor": platform.processor(),
+        },
+        "results": results,
+    }
+
+
+def result_key(result: dict) -> tuple:
+    """Get what identifies a benchmark in a result
+
+    Args:
+        result (dict): the result of a benchmark
+
+    Returns:
+        tuple: the benchmark, engine and parameters
+    """
+    return tuple(value for key, value in result.items()
+                 if key not in ("seconds", "min", "max"))
+
+
+def describe(result: dict) -> str:
+    """Describe the settings of a benchmark
+
+    Args:
+        result (dict): the result of a benchmark
+
+    Returns:
+        str: the settings of the grid and the bounds
+    """
+    settings = ("cell_size", "perception", "field_of_view", "loop_bounds")
+
+    return ", ".join(f"{key}={result[key]}" for key in settings
+                     if key in result)
+
+
+def compare(old: dict, new: dict,
+            threshold: float = 1.1) -> List[Tuple[dict, float]]:
+    """Find the benchmarks that got slower
+
+    Args:
+        old (dict): the previous results
+        new (dict): the current results
+        threshold (float, optional): how many times slower a benchmark has
+            to be to count as slower. Defaults to 1.1.
+
+    Returns:
+        List[Tuple[dict, float]]: the slower results and how much slower
+    """
+    old_results = {result_key(result): result for result in old["results"]}
+    slower = []
+
+    for result in new["results"]:
+        old_result = old_results.get(result_key(result))
+
+        if old_result is None:
+            continue
+
+        ratio = result["seconds"] / max(old_result["seconds"], 1e-12)
+        if ratio > threshold:
+            slower.append((result, ratio))
+
+    return slower
+
+
+def parse_args(args: List[str] = None) -> argparse.Namespace:
+    """Parse the command line arguments
+
+    Args:
+        args (List[str], optional): the arguments. Defaults to None for
+            the arguments of the program.
+
+    Returns:
+        argparse.Namespace: the parsed arguments
+    """
+    parser = argparse.ArgumentParser(
+        prog="python -m boids.benchmark",
+        description="Benchmark the flock and save the results as JSON"
+    )
+    parser.add_argument("--out", default="benchmark.json",
+                        help="the JSON file to save the results to")
+    parser.add_argument("--counts", type=int, nargs="+",
+                        default=list(BOID_COUNTS),
+                        help="the numbers of boids")
+    parser.add_argument("--engines", nargs="+", choices=ENGINES,
+                        default=list(ENGINES),
+                        help="the engines to benchmark")
+    parser.add_argument("--repeat", type=int, default=5,
+                        help="the number of times to run every benchmark")
+    parser.add_argument("--compare",
+                        help="a previous JSON file to compare with")
+    parser.add_argument("--threshold", type=float, default=1.1,
+                        help="how many times slower counts as slower")
+
+    return parser.parse_args(args)
+
+
+def main(args: List[str] = None):
+    """Run the benchmarks from the command line
+
+    Args:
+        args (List[str], optional): the arguments. Defaults to None for
+            the arguments of the program.
+    """
+    args = parse_args(args)
+
+    results = run_benchmarks(args.counts, engines=args.engines,
+                             repeat=args.repeat)
+
+    with open(args.out, "w") as file:
+        json.dump(results, file, indent=4)
+
+    for result in results["results"]:
+        print(f"{result['benchmark']:>12} {result['engine']:>6} "
+              f"{result['boids']:>7} boids, {describe(result)}: "
+              f"{result['seconds'] * 1000:.3f}ms")
+
+    if args.compare is None:
+        return
+
+    with open(args.compare) as file:
+        old = json.load(file)
+
+    for result, ratio in compare(old, results, args.threshold):
+        print(f"SLOWER {ratio:.2f}x: {result['benchmark']} "
+              f"{result['engine']} {result['boids']} boids, "
+              f"{describe(result)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,19 +1,25 @@
-from pygame import Vector2
-import pygame
+from boids.vector import Vector2
 
 
 class Boid:
     """The boid object with a position and steerection
+
+    The boid has no __dict__ and the color is the shared color of its type,
+    so big flocks of boid objects stay small.
     """
+    __slots__ = ("pos", "dir", "type", "color", "hash", "id", "cell_index")
 
     def __init__(self, pos: Vector2, dir_: Vector2,
-                 type_: int, color: pygame.color.Color):
+                 type_: int, color: tuple, id_: int = None):
         """The initialize method
 
         Args:
             pos (Vector2): the position of the boid
             steer (Vector2): the direction of the boid
-            perception (float): how far the boid can see
+            type_ (int): the type of the boid
+            color (tuple): the color of the boid's type
+            id_ (int, optional): the id of the boid in its flock.
+                Defaults to None.
         """
         self.pos = pos
         self.dir = dir_
@@ -21,7 +27,101 @@ class Boid:
         self.type = type_
         self.color = color
 
+        self.id = id_
+
+        # The cell and the index of the boid in the cell in the grid
         self.hash = tuple
+        self.cell_index = -1
 
     def __repr__(self) -> str:
         return (f"Boid(pos={self.pos}, dir={self.dir}, hash={self.hash})")
+
+
+class RowVector(Vector2):
+    """A Vector2 that reads and writes a row of a flock's arrays
+
+    Changing the vector, like view.pos.x = 1 or view.dir += other, changes
+    the array. The array is looked up on every access, so the vector stays
+    valid when the flock grows its arrays.
+    """
+    __slots__ = ("flock", "name", "index")
+
+    def __init__(self, flock, name: str, index: int):
+        """The initialize method
+
+        Args:
+            flock (Flock): the flock that owns the arrays
+            name (str): the name of the array, "positions" or "directions"
+            index (int): the row of the boid in the array
+        """
+        self.flock = flock
+        self.name = name
+        self.index = index
+
+    @property
+    def x(self) -> float:
+        return float(getattr(self.flock, self.name)[self.index, 0])
+
+    @x.setter
+    def x(self, x: float):
+        getattr(self.flock, self.name)[self.index, 0] = x
+
+    @property
+    def y(self) -> float:
+        return float(getattr(self.flock, self.name)[self.index, 1])
+
+    @y.setter
+    def y(self, y: float):
+        getattr(self.flock, self.name)[self.index, 1] = y
+
+
+class BoidView:
+    """A boid-like view of one row in a flock's arrays
+    """
+    __slots__ = ("flock", "index")
+
+    def __init__(self, flock, index: int):
+        """The initialize method
+
+        Args:
+            flock (Flock): the flock that owns the arrays
+            index (int): the row of the boid in the arrays
+        """
+        self.flock = flock
+        self.index = index
+
+    @property
+    def pos(self) -> Vector2:
+        return RowVector(self.flock, "positions", self.index)
+
+    @pos.setter
+    def pos(self, pos):
+        self.flock.positions[self.index] = tuple(pos)
+
+    @property
+    def dir(self) -> Vector2:
+        return RowVector(self.flock, "directions", self.index)
+
+    @dir.setter
+    def dir(self, dir_):
+        self.flock.directions[self.index] = tuple(dir_)
+
+    @property
+    def type(self) -> int:
+        return int(self.flock.types[self.index])
+
+    @type.setter
+    def type(self, type_: int):
+        self.flock.types[self.index] = type_
+
+    @property
+    def id(self) -> int:
+        return int(self.flock.ids[self.index])
+
+    @property
+    def color(self) -> tuple:
+        return self.flock.type_colors[self.type]
+
+    def __repr__(self) -> str:
+        return (f"BoidView(pos={self.pos}, dir={self.dir}, "
+                f"index={self.index})")
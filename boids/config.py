@@ -0,0 +1,47 @@
+import json
+
+
+# The settings of the flock in main.py
+DEFAULT_CONFIG = {
+    "num_boids": 150,
+    "num_types": 2,
+    "world_size": (1000, 1000),
+    "cell_size": 100,
+    "max_speed": 15,
+    "perception": 2,
+    "field_of_view": 270,
+    "avoid_dist": 20,
+    "other_avoid_mult": 1.5,
+    "other_avoid_dist": 40,
+    "alignment_factor": 0.05,
+    "cohesion_factor": 0.005,
+    "seperation_factor": 0.05,
+    "turn_margin": 100,
+    "turn_factor": 1.5,
+    "loop_bounds": True,
+}
+
+
+def load_config(path: str = None, **overrides) -> dict:
+    """Load the settings of a flock
+
+    Args:
+        path (str, optional): a JSON file with the settings to change.
+            Defaults to None.
+        **overrides: settings that replace the settings in the file
+
+    Returns:
+        dict: the keyword arguments of the flock
+    """
+    config = dict(DEFAULT_CONFIG)
+
+    if path is not None:
+        with open(path) as file:
+            config.update(json.load(file))
+
+    config.update(
+        (key, value) for key, value in overrides.items() if value is not None
+    )
+    config["world_size"] = tuple(config["world_size"])
+
+    return config
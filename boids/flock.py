@@ -1,10 +1,26 @@
-from typing import List
-from pygame import Vector2
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List
+import colorsys
+import math
 import numpy as np
-import pygame
 
 from boids.spatial_hash_grid import SpatialHashGrid
-from boids.boid import Boid
+from boids.boid import Boid, BoidView
+from boids.vector import Vector2
+from boids.snapshot import write_snapshot, read_snapshot
+from boids import vectorized
+from boids.rules import Neighbours, Rule, default_rules, fused_rules
+from boids.obstacles import (
+    RESOLUTION, Obstacle, ObstacleField, load_obstacle
+)
+from boids.profiler import FlockProfiler
+
+
+ENGINES = ("object", "numpy", "numba")
+
+# The speeds and factors are per update at this many updates per second,
+# the rate main.py always ran at
+TICK_RATE = 30
 
 
 class Flock:
@@ -17,7 +33,15 @@ class Flock:
                  alignment_factor: float, cohesion_factor: float,
                  seperation_factor: float,
                  turn_margin: int, turn_factor: float,
-                 loop_bounds: bool = True):
+                 loop_bounds: bool = True, engine: str = "object",
+                 grid_mode: str = "incremental",
+                 double_buffer: bool = False, workers: int = 1,
+                 perception_radius: float = None,
+                 grid_storage: str = "sparse",
+                 rng: np.random.Generator = None,
+                 time_step: float = None, rules: List[Rule] = None,
+                 obstacles: List[Obstacle] = None,
+                 obstacle_resolution: float = RESOLUTION):
         """The init method
 
         Args:
@@ -37,15 +61,85 @@ class Flock:
             turn_margin (int): margin when the boids need to turn
             turn_factor (float): how much to turn when in the turn margin
             loop_bounds (bool, optional): use loop or turn. Defaults to True.
+            engine (str, optional): "object" to update Boid objects one by
+                one, "numpy" to update arrays of all boids at once or
+                "numba" to update the arrays with a compiled kernel.
+                Defaults to "object".
+            grid_mode (str, optional): "incremental" to move boids between
+                cells one by one or "rebuild" to rebuild the grid once per
+                update. The array engines always rebuild.
+                Defaults to "incremental".
+            double_buffer (bool, optional): let the "object" engine read the
+                previous update of all boids instead of the boids that were
+                already updated. The array engines are always double
+                buffered. Defaults to False.
+            workers (int, optional): the number of threads that update
+                ranges of boids in the array engines. Defaults to 1.
+            perception_radius (float, optional): how far away a boid can
+                see within the perception cells. Defaults to None.
+            grid_storage (str, optional): "sparse" to store the grid cells
+                in a dict or "dense" to store all cells of the world in
+                preallocated lists and arrays. Defaults to "sparse".
+            rng (np.random.Generator, optional): the random generator of
+                the boids. Defaults to None for a generator seeded from
+                np.random, so np.random.seed still works.
+            time_step (float, optional): the seconds of every update, the
+                speeds and factors are scaled from TICK_RATE updates per
+                second so the flock moves the same at every rate.
+                Defaults to None for one tick of TICK_RATE per update.
+            rules (List[Rule], optional): the steering rules in the order
+                they are applied, only the array engines apply other rules
+                than the default ones. Defaults to None for seperation,
+                alignment and cohesion.
+            obstacles (List[Obstacle], optional): circles and polygons, or
+                their JSON data, the boids turn away from within the turn
+                margin like from the edges of the world. Defaults to None.
+            obstacle_resolution (float, optional): the size of the cells
+                the obstacles are baked into, larger cells bake faster and
+                use less memory in large worlds. Defaults to RESOLUTION.
+
+        Raises:
+            ValueError: if the engine is unknown or the "object" engine
+                gets other rules than the default ones
         """
+        if engine not in ENGINES:
+            raise ValueError(f"Unknown engine {engine!r}, use {ENGINES}")
+
+        self.rules = default_rules() if rules is None else list(rules)
+        if engine == "object" and fused_rules(self.rules) != len(self.rules):
+            raise ValueError("The object engine only applies the default "
+                             "rules, use an array engine for other rules")
+
+        self.engine = engine
+        self.double_buffer = double_buffer
         self.boids = []
 
+        # Reused every update so the object engine doesn't allocate
+        self.next_dirs = []
+
+        # Set to a FlockProfiler to time the phases of every update
+        self.profiler = None
+
+        # Set to a TrajectoryRecorder to record every update
+        self.recorder = None
+
+        # Threads for the array engines, NumPy and Numba release the GIL,
+        # they are started by the first update that uses them
+        self.workers = workers
+        self.executor = None
+
         self.world_size = Vector2(world_size[0], world_size[1])
+        if engine != "object":
+            grid_mode = "rebuild"
+
+        # The grid wraps around the world when the boids loop around
         self.spatial_hash_grid = SpatialHashGrid(
             cell_size,
-            perception, field_of_view
+            perception, field_of_view,
+            grid_mode, world_size, loop_bounds, grid_storage
         )
         self.max_speed = max_speed
+        self.perception_radius = perception_radius
 
         # Seperation variables
         self.avoid_dist = avoid_dist
@@ -57,78 +151,789 @@ class Flock:
         self.cohesion_factor = cohesion_factor
         self.seperation_factor = seperation_factor
 
+        self.loop_bounds = loop_bounds
+        self.turn_margin = turn_margin
+        self.turn_factor = turn_factor
+        self.time_step = time_step
+        self.obstacle_resolution = obstacle_resolution
+        self.obstacles = obstacles
         if loop_bounds:
             self.keep_in_bounds = self.keep_in_bounds_loop
         else:
             self.keep_in_bounds = self.keep_in_bounds_turn
-            self.turn_margin = turn_margin
-            self.turn_factor = turn_factor
+
+        if rng is None:
+            # The default integers are 32 bits on Windows, too small for
+            # every seed
+            rng = np.random.default_rng(
+                np.random.randint(2 ** 32, dtype=np.uint64)
+            )
+        self.rng = rng
 
         self.reset_boids(num_boids, num_types)
 
-    def reset_boids(self, num_boids: int, num_types: int):
-        # Remove all previous boids
-        for boid in self.boids:
-            self.spatial_hash_grid.delete(boid)
+    @property
+    def boids(self) -> List[Boid]:
+        if self.engine == "object":
+            return self._boids
+
+        # Views into the arrays for callers that expect boid objects
+        return [BoidView(self, i) for i in range(len(self.positions))]
+
+    @boids.setter
+    def boids(self, boids: List[Boid]):
+        self._boids = boids
+
+    @property
+    def time_step(self) -> float:
+        return self._time_step
+
+    @time_step.setter
+    def time_step(self, time_step: float):
+        self._time_step = time_step
+
+        # How many ticks of TICK_RATE one update is
+        self.time_scale = 1.0 if time_step is None else time_step * TICK_RATE
+
+    @property
+    def obstacles(self) -> List[Obstacle]:
+        return self._obstacles
+
+    @obstacles.setter
+    def obstacles(self, obstacles: List[Obstacle]):
+        self._obstacles = [load_obstacle(obstacle)
+                           for obstacle in obstacles or ()]
+
+        # The obstacles are only baked into a field when they change
+        self.obstacle_field = None
+        if self._obstacles:
+            self.obstacle_field = ObstacleField(
+                self._obstacles, (self.world_size.x, self.world_size.y),
+                self.obstacle_resolution
+            )
+
+    @property
+    def indices(self) -> Dict[int, int]:
+        # Loaded flocks only find the index of every id when it is needed
+        if self._indices is None:
+            ids = (self.get_state()["ids"] if self.engine == "object"
+                   else self.ids)
+            self._indices = dict(zip(ids.tolist(), range(len(ids))))
+
+        return self._indices
+
+    @indices.setter
+    def indices(self, indices: Dict[int, int]):
+        self._indices = indices
+
+    def reset_boids(self, num_boids: int, num_types: int,
+                    rng: np.random.Generator = None):
+        """Replace all boids with new random boids
+
+        Args:
+            num_boids (int): the number of boids
+            num_types (int): the number of types of boids
+            rng (np.random.Generator, optional): the random generator of
+                the boids. Defaults to None for the generator of the flock.
+        """
+        if rng is not None:
+            self.rng = rng
 
-        self.boids = []
         color_scale = 360 / num_types
+        self.type_colors = [
+            self.create_color(type_, color_scale)
+            for type_ in range(num_types)
+        ]
+
+        positions, directions, types = self.random_boids(num_boids,
+                                                         num_types)
+
+        # Remove all previous boids
+        self.spatial_hash_grid.clear()
+        self.boids = []
+        if self.engine != "object":
+            self.positions = np.empty((0, 2))
+            self.directions = np.empty((0, 2))
+            self.types = np.empty(0, np.int64)
+            self.ids = np.empty(0, np.int64)
+        self.row_buffers = None
+
+        # The index of every boid by its id
+        self.indices = {}
+        self.next_id = 0
+        self.grid_stale = False
+
+        self.add_boids(positions, directions, types)
+
+    def add_boids(self, positions: np.ndarray, directions: np.ndarray,
+                  types: np.ndarray) -> List[int]:
+        """Add boids to the flock
+
+        Args:
+            positions (np.ndarray): the positions of the new boids
+            directions (np.ndarray): the directions of the new boids
+            types (np.ndarray): the types of the new boids
+
+        Raises:
+            ValueError: if a type has no color
+
+        Returns:
+            List[int]: the ids of the new boids, they never change
+        """
+        positions = np.asarray(positions, float).reshape(-1, 2)
+        directions = np.asarray(directions, float).reshape(-1, 2)
+        types = np.asarray(types, np.int64).reshape(-1)
+
+        num_types = len(self.type_colors)
+        if len(types) and (types.min() < 0 or types.max() >= num_types):
+            raise ValueError(f"The types of the boids have to be below "
+                             f"{num_types}")
+
+        start = len(self.boids) if self.engine == "object" else len(self.ids)
+        ids = list(range(self.next_id, self.next_id + len(types)))
+        self.next_id += len(types)
+        self.indices.update(zip(ids, range(start, start + len(ids))))
+
+        if self.engine != "object":
+            self.append_rows(positions, directions, types, ids)
+            return ids
 
         # Create the boids
-        for _ in range(num_boids):
-            boid = self.create_boid(num_types, color_scale)
+        colors = self.type_colors
+        boids = [
+            Boid(Vector2(pos_x, pos_y), Vector2(dir_x, dir_y),
+                 type_, colors[type_], id_)
+            for (pos_x, pos_y), (dir_x, dir_y), type_, id_ in zip(
+                positions.tolist(), directions.tolist(), types.tolist(), ids
+            )
+        ]
+        self.boids.extend(boids)
 
-            self.spatial_hash_grid.insert(boid, boid.pos)
-            self.boids.append(boid)
+        if self.spatial_hash_grid.mode == "incremental":
+            self.spatial_hash_grid.insert_all(boids, positions)
 
-    def create_boid(self, num_types: int, color_scale: int):
-        # Set a random position
-        pos = Vector2(
-            np.random.uniform(0, self.world_size.x),
-            np.random.uniform(0, self.world_size.y)
+        return ids
+
+    def append_rows(self, positions: np.ndarray, directions: np.ndarray,
+                    types: np.ndarray, ids: List[int]):
+        """Append the rows of boids to the arrays of the array engines
+
+        The arrays are views into larger buffers that double when they are
+        full, so adding a few boids at a time doesn't copy all boids every
+        time.
+
+        Args:
+            positions (np.ndarray): the positions of the new boids
+            directions (np.ndarray): the directions of the new boids
+            types (np.ndarray): the types of the new boids
+            ids (List[int]): the ids of the new boids
+        """
+        rows = (self.positions, self.directions, self.types, self.ids)
+        start = len(self.ids)
+        stop = start + len(ids)
+
+        # Loaded or replaced arrays are not views into the buffers
+        buffers = self.row_buffers
+        if buffers is None or stop > len(buffers[0]) or any(
+            row.base is not buffer for row, buffer in zip(rows, buffers)
+        ):
+            capacity = max(stop, 2 * start)
+            buffers = tuple(
+                np.empty((capacity,) + row.shape[1:], row.dtype)
+                for row in rows
+            )
+            for row, buffer in zip(rows, buffers):
+                buffer[:start] = row
+            self.row_buffers = buffers
+
+        for buffer, new_rows in zip(buffers,
+                                    (positions, directions, types, ids)):
+            buffer[start:stop] = new_rows
+
+        self.positions, self.directions, self.types, self.ids = (
+            buffer[:stop] for buffer in buffers
+        )
+
+    def remove_boids(self, ids: List[int]):
+        """Remove boids from the flock
+
+        Every boid is swapped with the last boid and then removed, so
+        removing a boid doesn't depend on the number of boids. This changes
+        the order of the boids, but not their ids.
+
+        Args:
+            ids (List[int]): the ids of the boids to remove
+
+        Raises:
+            ValueError: if a boid is not in the flock or removed twice
+        """
+        ids = [int(id_) for id_ in ids]
+        for id_ in ids:
+            if id_ not in self.indices:
+                raise ValueError(f"There is no boid with id {id_}")
+        if len(set(ids)) != len(ids):
+            raise ValueError("A boid can only be removed once")
+
+        if self.engine != "object":
+            self.remove_rows(ids)
+            return
+
+        boids = self.boids
+        for id_ in ids:
+            index = self.indices.pop(id_)
+            self.spatial_hash_grid.delete(boids[index])
+
+            last = boids.pop()
+            if index < len(boids):
+                boids[index] = last
+                self.indices[last.id] = index
+
+    def remove_rows(self, ids: List[int]):
+        """Remove the rows of boids from the arrays of the array engines
+
+        Args:
+            ids (List[int]): the ids of the boids to remove
+        """
+        positions, directions = self.positions, self.directions
+        types, row_ids = self.types, self.ids
+        num_boids = len(row_ids)
+
+        for id_ in ids:
+            index = self.indices.pop(id_)
+            num_boids -= 1
+
+            # Move the last row into the removed row
+            if index < num_boids:
+                positions[index] = positions[num_boids]
+                directions[index] = directions[num_boids]
+                types[index] = types[num_boids]
+                row_ids[index] = row_ids[num_boids]
+                self.indices[int(row_ids[index])] = index
+
+        self.positions = positions[:num_boids]
+        self.directions = directions[:num_boids]
+        self.types = types[:num_boids]
+        self.ids = row_ids[:num_boids]
+
+    def random_boids(self, num_boids: int, num_types: int) -> tuple:
+        """Draw the positions, directions and types of boids all at once
+
+        Args:
+            num_boids (int): the number of boids
+            num_types (int): the number of types of boids
+
+        Returns:
+            tuple: the positions, directions and types
+        """
+        # Set random positions
+        positions = self.rng.uniform(
+            (0, 0), (self.world_size.x, self.world_size.y), (num_boids, 2)
         )
 
-        # Set a random direction
-        dir_ = Vector2(
-            np.random.uniform(-self.max_speed, self.max_speed),
-            np.random.uniform(-self.max_speed, self.max_speed)
+        # Set random directions
+        directions = self.rng.uniform(
+            -self.max_speed, self.max_speed, (num_boids, 2)
         )
 
-        # Set a random type
-        type_ = np.random.randint(0, num_types)
+        # Set random types
+        types = self.rng.integers(0, num_types, num_boids)
 
-        # Set a random color
-        color = pygame.Color(0, 0, 0)
-        color.hsla = (type_ * color_scale, 100, 50, 100)
+        return positions, directions, types
+
+    def create_boid(self, num_types: int, color_scale: int):
+        # Set a random position, direction and type
+        positions, directions, types = self.random_boids(1, num_types)
+        pos = Vector2(positions[0].tolist())
+        dir_ = Vector2(directions[0].tolist())
+        type_ = int(types[0])
+
+        # Share the color of the type, types the flock doesn't have yet get
+        # their own color
+        if type_ < len(self.type_colors):
+            color = self.type_colors[type_]
+        else:
+            color = self.create_color(type_, color_scale)
 
         # Return the boid
         return Boid(pos, dir_, type_, color)
 
+    @staticmethod
+    def create_color(type_: int, color_scale: int) -> tuple:
+        """Create the color of a type of boid
+
+        Args:
+            type_ (int): the type of the boid
+            color_scale (int): the hue between two types
+
+        Returns:
+            tuple: the RGB color of the type
+        """
+        hue = (type_ * color_scale) % 360 / 360
+        red, green, blue = colorsys.hls_to_rgb(hue, 0.5, 1)
+
+        return round(red * 255), round(green * 255), round(blue * 255)
+
+    def index_boids(self):
+        """Put all boids in the grid again, for example after loading
+        """
+        grid = self.spatial_hash_grid
+        grid.clear()
+
+        if self.engine == "object" and grid.mode == "incremental":
+            positions = self.get_state()["positions"]
+            grid.insert_all(self.boids, positions)
+
+        self.grid_stale = False
+
+    def get_state(self) -> dict:
+        """Get the positions, directions, types and ids of all boids
+
+        Returns:
+            dict: the arrays of the state
+        """
+        if self.engine != "object":
+            return {
+                "positions": self.positions,
+                "directions": self.directions,
+                "types": self.types,
+                "ids": self.ids,
+            }
+
+        boids = self.boids
+        return {
+            "positions": np.array(
+                [(boid.pos.x, boid.pos.y) for boid in boids], float
+            ).reshape(-1, 2),
+            "directions": np.array(
+                [(boid.dir.x, boid.dir.y) for boid in boids], float
+            ).reshape(-1, 2),
+            "types": np.array([boid.type for boid in boids], np.int64),
+            "ids": np.array([boid.id for boid in boids], np.int64),
+        }
+
+    def get_params(self) -> dict:
+        """Get the keyword arguments that create a flock like this one
+
+        Returns:
+            dict: the keyword arguments, without num_boids
+        """
+        grid = self.spatial_hash_grid
+
+        return {
+            "num_types": len(self.type_colors),
+            "world_size": tuple(self.world_size),
+            "cell_size": grid.cell_size,
+            "max_speed": self.max_speed,
+            "perception": grid.perception,
+            "field_of_view": self.field_of_view,
+            "avoid_dist": self.avoid_dist,
+            "other_avoid_mult": self.other_avoid_mult,
+            "other_avoid_dist": self.other_avoid_dist,
+            "alignment_factor": self.alignment_factor,
+            "cohesion_factor": self.cohesion_factor,
+            "seperation_factor": self.seperation_factor,
+            "turn_margin": self.turn_margin,
+            "turn_factor": self.turn_factor,
+            "loop_bounds": self.loop_bounds,
+            "engine": self.engine,
+            "grid_mode": grid.mode,
+            "double_buffer": self.double_buffer,
+            "workers": self.workers,
+            "perception_radius": self.perception_radius,
+            "grid_storage": grid.storage,
+            "time_step": self.time_step,
+            "obstacles": [obstacle.to_dict() for obstacle in self.obstacles],
+            "obstacle_resolution": self.obstacle_resolution,
+        }
+
+    def close(self):
+        """Stop the threads of the workers
+
+        Updating the flock again starts new threads.
+        """
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+
+    def __enter__(self) -> "Flock":
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def save(self, path: str):
+        """Save the boids, the settings and the random state to a file
+
+        Args:
+            path (str): the file to save to
+        """
+        header = {
+            "params": self.get_params(),
+            "rng": self.rng.bit_generator.state,
+            "next_id": self.next_id,
+        }
+        write_snapshot(path, header, self.get_state())
+
+    @classmethod
+    def load(cls, path: str, **overrides) -> "Flock":
+        """Load a flock saved with save
+
+        The arrays are memory-mapped, so the file is only read when the
+        boids are used, and the grid is filled on the first update.
+
+        Args:
+            path (str): the file to load
+            **overrides: settings that replace the saved settings, like
+                engine or workers
+
+        Returns:
+            Flock: the flock
+        """
+        header, arrays = read_snapshot(path)
+
+        state = header["rng"]
+        rng = np.random.Generator(
+            getattr(np.random, state["bit_generator"])()
+        )
+        rng.bit_generator.state = state
+
+        params = dict(header["params"], **overrides)
+        flock = cls(num_boids=0, rng=rng, **params)
+
+        ids = arrays["ids"]
+        flock.indices = None
+        flock.next_id = header["next_id"]
+
+        if flock.engine != "object":
+            flock.positions = arrays["positions"]
+            flock.directions = arrays["directions"]
+            flock.types = arrays["types"]
+            flock.ids = ids
+        else:
+            colors = flock.type_colors
+            flock.boids = [
+                Boid(Vector2(pos_x, pos_y), Vector2(dir_x, dir_y),
+                     type_, colors[type_], id_)
+                for (pos_x, pos_y), (dir_x, dir_y), type_, id_ in zip(
+                    arrays["positions"].tolist(),
+                    arrays["directions"].tolist(),
+                    arrays["types"].tolist(), ids.tolist()
+                )
+            ]
+
+        flock.grid_stale = True
+        return flock
+
     def update_boids(self):
         """Update the boids
         """
+        profiler = self.profiler
+        if profiler is not None:
+            profiler.start_tick()
+
+        if self.grid_stale:
+            self.index_boids()
+
+        if self.engine != "object":
+            self.update_arrays()
+        else:
+            self.update_objects()
+
+        if self.recorder is not None:
+            self.recorder.record(self)
+            if profiler is not None:
+                profiler.lap("record")
+
+        if profiler is not None:
+            profiler.count("max_cell",
+                           self.spatial_hash_grid.max_occupancy())
+            profiler.count("migrated", self.spatial_hash_grid.migrated)
+            profiler.end_tick()
+
+    def update_objects(self):
+        """Update the Boid objects one by one
+        """
+        profiler = self.profiler
+        self.spatial_hash_grid.reset_counters()
+
+        # Index all boids once per update
+        rebuild = self.spatial_hash_grid.mode == "rebuild"
+        if rebuild:
+            self.spatial_hash_grid.rebuild(
+                np.array([tuple(boid.pos) for boid in self.boids]
+                         ).reshape(-1, 2),
+                self.boids
+            )
+            if profiler is not None:
+                profiler.lap("grid")
+
+        if self.double_buffer:
+            self.update_double_buffered(rebuild)
+            return
+
+        neighbours = 0
+
         # Update all the boids
         for boid in self.boids:
-            # Get all close boids
-            all_boids = self.spatial_hash_grid.get_boids(boid)
-            boids, boids_of_type = all_boids
-
-            # Seperate from ALL boids
-            if boids:
-                self.seperation(boid, boids)
-            # Only align and cohese with boids of boid's own type
-            if boids_of_type:
-                self.alignment(boid, boids_of_type)
-                self.cohesion(boid, boids_of_type)
-
-            # Keep the boid within bounds
+            # Apply all rules while looking at the close boids
+            visible = self.steer(boid, boid.dir)
+            if profiler is not None:
+                neighbours += visible
+
+            # Keep the boid within bounds and away from obstacles
             self.keep_in_bounds(boid)
+            if self.obstacle_field is not None:
+                self.avoid_obstacles(boid)
             # Limit the boid's speed
             self.limit_speed(boid)
+            if profiler is not None:
+                profiler.lap("bounds")
 
             # Update the boid's position
-            boid.pos += boid.dir
-            self.spatial_hash_grid.move(boid, boid.pos)
+            boid.pos.x += boid.dir.x * self.time_scale
+            boid.pos.y += boid.dir.y * self.time_scale
+            if not rebuild:
+                self.spatial_hash_grid.move(boid, boid.pos)
+            if profiler is not None:
+                profiler.lap("grid")
+
+        if profiler is not None:
+            profiler.count("avg_neighbours",
+                           neighbours / max(len(self.boids), 1))
+
+    def update_double_buffered(self, rebuild: bool):
+        """Update the boids while they all read the previous update
+
+        Args:
+            rebuild (bool): whether the grid was rebuilt for this update
+        """
+        profiler = self.profiler
+        neighbours = 0
+
+        # Only create the next directions when the number of boids grows
+        next_dirs = self.next_dirs
+        while len(next_dirs) < len(self.boids):
+            next_dirs.append(Vector2(0, 0))
+
+        # Steer all boids into the next directions without changing them
+        for boid, next_dir in zip(self.boids, next_dirs):
+            visible = self.steer(boid, next_dir)
+            if profiler is not None:
+                neighbours += visible
+
+        # Move all boids
+        for boid, next_dir in zip(self.boids, next_dirs):
+            boid.dir.x = next_dir.x
+            boid.dir.y = next_dir.y
+
+            self.keep_in_bounds(boid)
+            if self.obstacle_field is not None:
+                self.avoid_obstacles(boid)
+            self.limit_speed(boid)
+            if profiler is not None:
+                profiler.lap("bounds")
+
+            boid.pos.x += boid.dir.x * self.time_scale
+            boid.pos.y += boid.dir.y * self.time_scale
+            if not rebuild:
+                self.spatial_hash_grid.move(boid, boid.pos)
+            if profiler is not None:
+                profiler.lap("grid")
+
+        if profiler is not None:
+            profiler.count("avg_neighbours",
+                           neighbours / max(len(self.boids), 1))
+
+    def update_arrays(self):
+        """Update all boids at once with array operations
+        """
+        profiler = self.profiler
+        positions, directions = self.positions, self.directions
+        world_size = np.array(self.world_size)
+
+        grid = self.spatial_hash_grid
+        grid.rebuild(positions)
+        if profiler is not None:
+            profiler.lap("grid")
+
+        # Every boid reads the current arrays and writes the next directions
+        next_dirs = np.empty_like(directions)
+        neighbours = np.zeros(len(positions), np.int64)
+
+        radius_sq = np.inf
+        if self.perception_radius is not None:
+            radius_sq = float(self.perception_radius) ** 2
+
+        cell_offsets = np.array(grid.cell_offsets(), np.int64).reshape(-1, 2)
+        world_width, world_height = grid.world_size or (0.0, 0.0)
+
+        # The kernel applies the default rules at the start of the pipeline
+        fused = fused_rules(self.rules) if self.engine == "numba" else 0
+        pipeline = self.rules[fused:]
+
+        # The neighbours are only found when a rule of the pipeline needs
+        # them, then all rules share them
+        find_neighbours = any(rule.neighbours is not None
+                              for rule in pipeline)
+
+        # The factors of one update
+        alignment_factor = self.alignment_factor * self.time_scale
+        cohesion_factor = self.cohesion_factor * self.time_scale
+        seperation_factor = self.seperation_factor * self.time_scale
+
+        # Every worker times its range on its own, the update times the
+        # wall time of all ranges
+        range_timers = []
+
+        def steer(start: int, stop: int):
+            timer = profiler
+            if profiler is not None and self.workers > 1:
+                timer = FlockProfiler()
+                timer.start_tick()
+                range_timers.append(timer)
+
+            if fused:
+                # Numba is slow to import, so it is only imported when used
+                from boids import kernels
+
+                kernels.steer(
+                    positions, directions, self.types,
+                    grid.local_cells, grid.order,
+                    grid.cell_start, grid.cell_end,
+                    grid.shape[0], grid.shape[1], cell_offsets,
+                    world_width, world_height, grid.wrap,
+                    grid.fov_cos, radius_sq,
+                    self.avoid_dist, self.other_avoid_dist,
+                    self.other_avoid_mult, alignment_factor,
+                    cohesion_factor, seperation_factor,
+                    start, stop, next_dirs, neighbours
+                )
+                if timer is not None:
+                    timer.lap("rules")
+            else:
+                next_dirs[start:stop] = directions[start:stop]
+
+            if not pipeline:
+                return
+
+            all_neighbours = None
+            if find_neighbours:
+                all_neighbours = self.find_neighbours(start, stop)
+                if timer is not None:
+                    timer.lap("neighbours")
+                    if not fused:
+                        neighbours[start:stop] = all_neighbours.counts
+
+            # Apply the other rules in order
+            for rule in pipeline:
+                rule_neighbours = all_neighbours
+                if rule.neighbours == "type":
+                    rule_neighbours = all_neighbours.of_type()
+
+                rule.apply(self, start, stop, rule_neighbours,
+                           next_dirs[start:stop])
+                if timer is not None:
+                    timer.lap(rule.name)
+
+        # Apply all rules
+        for rule in pipeline:
+            rule.prepare(self)
+            if profiler is not None:
+                profiler.lap(rule.name)
+        self.run_ranges(steer, len(positions))
+        directions = next_dirs
+
+        if profiler is not None:
+            if self.workers > 1:
+                profiler.lap("ranges")
+            for timer in range_timers:
+                profiler.add_worker_tick(timer.tick)
+            profiler.count("avg_neighbours", neighbours.mean()
+                           if len(neighbours) else 0.0)
+
+        # Keep the boids within bounds
+        if self.loop_bounds:
+            vectorized.keep_in_bounds_loop(positions, world_size)
+        else:
+            vectorized.keep_in_bounds_turn(
+                positions, directions, world_size,
+                self.turn_margin, self.turn_factor * self.time_scale
+            )
+        if self.obstacle_field is not None:
+            vectorized.avoid_obstacles(
+                positions, directions, self.obstacle_field,
+                self.turn_margin, self.turn_factor * self.time_scale
+            )
+        # Limit the boids' speed
+        vectorized.limit_speed(directions, self.max_speed)
+        if profiler is not None:
+            profiler.lap("bounds")
+
+        # Update the boids' positions
+        if self.time_scale == 1:
+            positions += directions
+        else:
+            positions += directions * self.time_scale
+        self.directions = directions
+        if profiler is not None:
+            profiler.lap("move")
+
+    def run_ranges(self, fnc: Callable[[int, int], None], num_boids: int):
+        """Split the boids into a range per worker and run a function on them
+
+        Args:
+            fnc (Callable[[int, int], None]): the function of a range
+            num_boids (int): the number of boids
+        """
+        bounds = np.linspace(0, num_boids, self.workers + 1).astype(int)
+        ranges = list(zip(bounds[:-1].tolist(), bounds[1:].tolist()))
+
+        if self.workers <= 1:
+            for start, stop in ranges:
+                fnc(start, stop)
+            return
+
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(self.workers)
+
+        # Wait for all ranges and raise their errors
+        for future in [self.executor.submit(fnc, *r) for r in ranges]:
+            future.result()
+
+    def find_neighbours(self, start: int, stop: int) -> Neighbours:
+        """Find the visible neighbours of a range of boids in the arrays
+
+        Args:
+            start (int): the first boid
+            stop (int): the boid after the last boid
+
+        Returns:
+            Neighbours: the visible neighbours of the range
+        """
+        grid = self.spatial_hash_grid
+        positions, directions = self.positions, self.directions
+
+        # Get all pairs of boids in nearby cells
+        boids, others = vectorized.neighbour_pairs(grid, start, stop)
+        offsets, distances_sq = vectorized.neighbour_offsets(
+            positions, boids, others, grid.world_size if grid.wrap else None
+        )
+
+        # Skip pairs that are too far before the angle
+        if self.perception_radius is not None:
+            close = distances_sq <= self.perception_radius ** 2
+            boids, others = boids[close], others[close]
+            offsets, distances_sq = offsets[close], distances_sq[close]
+
+        visible = vectorized.field_of_view_mask(
+            offsets, directions[boids], distances_sq, grid.fov_cos
+        )
+        boids, others = boids[visible], others[visible]
+
+        return Neighbours(
+            stop - start, boids - start, others, offsets[visible],
+            distances_sq[visible], self.types[boids] == self.types[others]
+        )
 
     def keep_in_bounds_loop(self, boid: Boid):
         """Keep a boid in bounds by looping
@@ -152,15 +957,35 @@ class Flock:
         Args:
             boid (Boid): the target boid
         """
+        turn_factor = self.turn_factor * self.time_scale
+
         if (boid.pos.x < self.turn_margin):
-            boid.dir.x += self.turn_factor
+            boid.dir.x += turn_factor
         if (boid.pos.x > self.world_size.x - self.turn_margin):
-            boid.dir.x -= self.turn_factor
+            boid.dir.x -= turn_factor
 
         if (boid.pos.y < self.turn_margin):
-            boid.dir.y += self.turn_factor
+            boid.dir.y += turn_factor
         if (boid.pos.y > self.world_size.y - self.turn_margin):
-            boid.dir.y -= self.turn_factor
+            boid.dir.y -= turn_factor
+
+    def avoid_obstacles(self, boid: Boid):
+        """Turn a boid away from the obstacles within the turn margin
+
+        Args:
+            boid (Boid): the target boid
+        """
+        field = self.obstacle_field
+        cell = field.cell(boid.pos.x, boid.pos.y)
+
+        if field.distance_list[cell] < self.turn_margin:
+            gradients = field.gradient_list
+            gradient_x = gradients[2 * cell]
+            gradient_y = gradients[2 * cell + 1]
+            turn_factor = self.turn_factor * self.time_scale
+
+            boid.dir.x += gradient_x * turn_factor
+            boid.dir.y += gradient_y * turn_factor
 
     def limit_speed(self, boid: Boid):
         """Limit the speed of a boid
@@ -169,11 +994,129 @@ class Flock:
             boid (Boid): the target boid
         """
         # Calculate speed
-        speed = np.sqrt(boid.dir.x ** 2 + boid.dir.y ** 2)
+        speed = math.hypot(boid.dir.x, boid.dir.y)
 
         # Lower speed if it exceeds the max speed
         if speed > self.max_speed:
-            boid.dir = (boid.dir / speed) * self.max_speed
+            boid.dir *= self.max_speed / speed
+
+    def steer(self, boid: Boid, direction: Vector2) -> int:
+        """Apply seperation, alignment and cohesion in one pass over the
+        boids around a boid
+
+        The same as get_neighbours followed by seperation, alignment and
+        cohesion, without creating lists of the close boids.
+
+        Args:
+            boid (Boid): the target boid
+            direction (Vector2): where to write the new direction, boid.dir
+                to steer the boid itself
+
+        Returns:
+            int: the number of boids the boid sees
+        """
+        grid = self.spatial_hash_grid
+        wrap = grid.wrap
+        if wrap:
+            width, height = grid.world_size
+
+        radius_sq = None
+        if self.perception_radius is not None:
+            radius_sq = self.perception_radius ** 2
+
+        # Compare squared distances so no square root is needed
+        avoid_dist_sq = self.avoid_dist ** 2
+        other_avoid_dist_sq = self.other_avoid_dist ** 2
+        other_avoid = self.other_avoid_mult + 1
+
+        pos_x, pos_y = boid.pos.x, boid.pos.y
+        dir_x, dir_y = boid.dir.x, boid.dir.y
+        boid_type = boid.type
+
+        # The same field of view test as get_neighbours
+        sqrt = math.sqrt
+        sees_all = grid.fov_cos <= -1
+        threshold = grid.fov_cos * math.sqrt(dir_x ** 2 + dir_y ** 2)
+
+        avoid_x = avoid_y = 0.0
+        sum_dir_x = sum_dir_y = 0.0
+        sum_offset_x = sum_offset_y = 0.0
+        count = 0
+        visible = 0
+
+        # Loop over all cells in the perception range
+        for boids_in_cell in grid.get_cells_around(boid.hash):
+            for other in boids_in_cell:
+                if other is boid:
+                    continue
+
+                other_pos = other.pos
+                offset_x = other_pos.x - pos_x
+                offset_y = other_pos.y - pos_y
+                if wrap:
+                    offset_x -= width * round(offset_x / width)
+                    offset_y -= height * round(offset_y / height)
+                dist_sq = offset_x * offset_x + offset_y * offset_y
+
+                # Skip boids that are too far before the angle
+                if radius_sq is not None and dist_sq > radius_sq:
+                    continue
+
+                if (not sees_all and
+                        offset_x * dir_x + offset_y * dir_y <
+                        threshold * sqrt(dist_sq)):
+                    continue
+
+                visible += 1
+
+                # Only align and cohese with boids of boid's own type
+                if other.type == boid_type:
+                    if dist_sq <= avoid_dist_sq:
+                        avoid_x -= offset_x
+                        avoid_y -= offset_y
+
+                    sum_dir_x += other.dir.x
+                    sum_dir_y += other.dir.y
+                    sum_offset_x += offset_x
+                    sum_offset_y += offset_y
+                    count += 1
+                elif dist_sq <= other_avoid_dist_sq:
+                    avoid_x -= offset_x * other_avoid
+                    avoid_y -= offset_y * other_avoid
+
+        # The rules only add up what the pass found, so most of the time is
+        # looking at the neighbours
+        profiler = self.profiler
+        if profiler is not None:
+            profiler.lap("neighbours")
+
+        # Seperate from ALL boids
+        factor = self.seperation_factor * self.time_scale
+        dir_x += avoid_x * factor
+        dir_y += avoid_y * factor
+        if profiler is not None:
+            profiler.lap("seperation")
+
+        # Align with the average direction
+        if count:
+            factor = self.alignment_factor * self.time_scale
+            dir_x += (sum_dir_x / count - dir_x) * factor
+            dir_y += (sum_dir_y / count - dir_y) * factor
+        if profiler is not None:
+            profiler.lap("alignment")
+
+        # Go to the center of mass seen from the boid
+        if count:
+            factor = self.cohesion_factor * self.time_scale
+            dir_x += sum_offset_x / count * factor
+            dir_y += sum_offset_y / count * factor
+        if profiler is not None:
+            profiler.lap("cohesion")
+
+        direction.x = dir_x
+        direction.y = dir_y
+
+        return visible
 
     def alignment(self, boid: Boid, boids_of_type: List[Boid]):
         """Align with closeby boids of the same type
@@ -183,15 +1126,19 @@ class Flock:
             boids_of_type (List[Boid]): the closeby boids of the same type
         """
         # Get the average direction of all close boids
-        avg_dir = Vector2(0, 0)
+        avg_x = avg_y = 0.0
 
         for other in boids_of_type:
-            avg_dir += other.dir
+            avg_x += other.dir.x
+            avg_y += other.dir.y
 
-        avg_dir /= len(boids_of_type)
+        avg_x /= len(boids_of_type)
+        avg_y /= len(boids_of_type)
 
         # Update the boid's direction
-        boid.dir += (avg_dir - boid.dir) * self.alignment_factor
+        factor = self.alignment_factor * self.time_scale
+        boid.dir.x += (avg_x - boid.dir.x) * factor
+        boid.dir.y += (avg_y - boid.dir.y) * factor
 
     def cohesion(self, boid: Boid, boids_of_type: List[Boid]):
         """Go to the center of mass of closeby boids of the same type
@@ -200,42 +1147,84 @@ class Flock:
             boid (Boid): the target boid
             boids_of_type (List[Boid]): the closeby boids of the same type
         """
-        # Get the center of mass of all close boids
-        center_of_mass = Vector2(0, 0)
+        grid = self.spatial_hash_grid
+        if grid.wrap:
+            width, height = grid.world_size
+
+        # Get the center of mass of all close boids, seen from the boid
+        center_x = center_y = 0.0
 
         for other in boids_of_type:
-            center_of_mass += other.pos
+            offset_x = other.pos.x - boid.pos.x
+            offset_y = other.pos.y - boid.pos.y
+
+            # Use the closest position of other around the world
+            if grid.wrap:
+                offset_x -= width * round(offset_x / width)
+                offset_y -= height * round(offset_y / height)
 
-        center_of_mass /= len(boids_of_type)
+            center_x += offset_x
+            center_y += offset_y
+
+        center_x /= len(boids_of_type)
+        center_y /= len(boids_of_type)
 
         # Update the boid's direction
-        boid.dir += (center_of_mass - boid.pos) * self.cohesion_factor
+        factor = self.cohesion_factor * self.time_scale
+        boid.dir.x += center_x * factor
+        boid.dir.y += center_y * factor
 
-    def seperation(self, boid: Boid, close_boids: List[Boid]):
+    def seperation(self, boid: Boid, close_boids: List[Boid],
+                   distances_sq: List[float] = None):
         """Move away from closeby boids to not bundle up
 
         Args:
             boid (Boid): the target boid
             close_boids (List[Boid]): all the closeby boids
+            distances_sq (List[float], optional): the squared distances to
+                the closeby boids. Defaults to None to calculate them.
         """
+        grid = self.spatial_hash_grid
+        if grid.wrap:
+            width, height = grid.world_size
+
+        # Compare squared distances so no square root is needed
+        avoid_dist_sq = self.avoid_dist ** 2
+        other_avoid_dist_sq = self.other_avoid_dist ** 2
+
         # Get the avoidance to all close boids
-        avoid = Vector2(0, 0)
+        avoid_x = avoid_y = 0.0
+
+        for i, other in enumerate(close_boids):
+            offset_x = other.pos.x - boid.pos.x
+            offset_y = other.pos.y - boid.pos.y
+
+            # Use the shortest offset around the world
+            if grid.wrap:
+                offset_x -= width * round(offset_x / width)
+                offset_y -= height * round(offset_y / height)
 
-        for other in close_boids:
-            dist = boid.pos.distance_to(other.pos)
+            if distances_sq is None:
+                dist_sq = offset_x ** 2 + offset_y ** 2
+            else:
+                dist_sq = distances_sq[i]
 
             other_type = abs(boid.type - other.type)
             if other_type:
                 other_avoid = min(other_type, 1) * \
                     self.other_avoid_mult + 1
 
-                if dist <= self.other_avoid_dist:
-                    avoid += (boid.pos - other.pos) * other_avoid
-            elif dist <= self.avoid_dist:
-                avoid += (boid.pos - other.pos)
+                if dist_sq <= other_avoid_dist_sq:
+                    avoid_x -= offset_x * other_avoid
+                    avoid_y -= offset_y * other_avoid
+            elif dist_sq <= avoid_dist_sq:
+                avoid_x -= offset_x
+                avoid_y -= offset_y
 
         # Update the boids direction
-        boid.dir += avoid * self.seperation_factor
+        factor = self.seperation_factor * self.time_scale
+        boid.dir.x += avoid_x * factor
+        boid.dir.y += avoid_y * factor
 
     @property
     def perception(self) -> float:
@@ -247,8 +1236,9 @@ class Flock:
 
     @property
     def field_of_view(self) -> float:
-        return self.spatial_hash_grid.field_of_view
+        return self.spatial_hash_grid.field_of_view * 2
 
     @field_of_view.setter
     def field_of_view(self, fov):
-        self.spatial_hash_grid.field_of_view = fov
+        # The grid keeps half of the field of view and its cosine
+        self.spatial_hash_grid.field_of_view = fov / 2
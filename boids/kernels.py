@@ -0,0 +1,138 @@
+import math
+import numpy as np
+
+try:
+    from numba import njit
+except ImportError:
+    def njit(*args, **kwargs):
+        """Run the kernels as plain Python when Numba is not installed
+        """
+        if len(args) == 1 and callable(args[0]) and not kwargs:
+            return args[0]
+
+        return lambda fnc: fnc
+
+
+@njit(cache=True, nogil=True)
+def steer(positions: np.ndarray, directions: np.ndarray, types: np.ndarray,
+          cells: np.ndarray, order: np.ndarray,
+          cell_start: np.ndarray, cell_end: np.ndarray,
+          width: int, height: int, cell_offsets: np.ndarray,
+          world_width: float, world_height: float, wrap: bool,
+          fov_cos: float, radius_sq: float,
+          avoid_dist: float, other_avoid_dist: float,
+          other_avoid_mult: float, alignment_factor: float,
+          cohesion_factor: float, seperation_factor: float,
+          start: int, stop: int, new_dirs: np.ndarray,
+          neighbours: np.ndarray):
+    """Apply seperation, alignment and cohesion in one pass per boid
+
+    The boids only read the positions and directions and write to new_dirs,
+    so ranges of boids can be updated at the same time.
+
+    Args:
+        positions (np.ndarray): the positions of all boids
+        directions (np.ndarray): the directions of all boids
+        types (np.ndarray): the types of all boids
+        cells (np.ndarray): the cell of every boid in the grid
+        order (np.ndarray): the boids sorted by their cell id
+        cell_start (np.ndarray): where every cell starts in the order
+        cell_end (np.ndarray): where every cell ends in the order
+        width (int): the number of cells in a row of the grid
+        height (int): the number of cells in a column of the grid
+        cell_offsets (np.ndarray): the offsets of the cells to look in
+        world_width (float): the width of the world
+        world_height (float): the height of the world
+        wrap (bool): whether the cells and offsets wrap around the world
+        fov_cos (float): the cosine of half of the boid's field of view
+        radius_sq (float): the squared distance a boid can see
+        avoid_dist (float): distance to keep between boids
+        other_avoid_dist (float): distance to keep between other types
+        other_avoid_mult (float): multiplier of avoiding other types
+        alignment_factor (float): the factor of alignment
+        cohesion_factor (float): the factor of cohesion
+        seperation_factor (float): the factor of seperation
+        start (int): the first boid
+        stop (int): the boid after the last boid
+        new_dirs (np.ndarray): the new directions of all boids
+        neighbours (np.ndarray): the number of visible boids of all boids
+    """
+    # Compare squared distances so no square root is needed
+    avoid_dist_sq = avoid_dist ** 2
+    other_avoid_dist_sq = other_avoid_dist ** 2
+
+    for i in range(start, stop):
+        pos_x, pos_y = positions[i, 0], positions[i, 1]
+        dir_x, dir_y = directions[i, 0], directions[i, 1]
+        threshold = fov_cos * math.sqrt(dir_x ** 2 + dir_y ** 2)
+
+        avoid_x = avoid_y = 0.0
+        sum_dir_x = sum_dir_y = 0.0
+        sum_offset_x = sum_offset_y = 0.0
+        count = 0
+        visible = 0
+
+        # Loop over all cells in the perception range
+        for c in range(len(cell_offsets)):
+            cell = ((cells[i, 0] + cell_offsets[c, 0]) % width * height +
+                    (cells[i, 1] + cell_offsets[c, 1]) % height)
+
+            for k in range(cell_start[cell], cell_end[cell]):
+                j = order[k]
+                if j == i:
+                    continue
+
+                offset_x = positions[j, 0] - pos_x
+                offset_y = positions[j, 1] - pos_y
+
+                # Use the shortest offset around the world
+                if wrap:
+                    offset_x -= world_width * np.round(offset_x / world_width)
+                    offset_y -= world_height * np.round(
+                        offset_y / world_height
+                    )
+
+                # Skip boids that are too far before the angle
+                dist_sq = offset_x ** 2 + offset_y ** 2
+                if dist_sq > radius_sq:
+                    continue
+
+                # Test if other is in boid's field of view, a boid that
+                # doesn't move sees all around
+                if (fov_cos > -1 and
+                        offset_x * dir_x + offset_y * dir_y <
+                        threshold * math.sqrt(dist_sq)):
+                    continue
+
+                visible += 1
+
+                if types[j] == types[i]:
+                    if dist_sq <= avoid_dist_sq:
+                        avoid_x -= offset_x
+                        avoid_y -= offset_y
+
+                    sum_dir_x += directions[j, 0]
+                    sum_dir_y += directions[j, 1]
+                    sum_offset_x += offset_x
+                    sum_offset_y += offset_y
+                    count += 1
+                elif dist_sq <= other_avoid_dist_sq:
+                    avoid_x -= offset_x * (other_avoid_mult + 1)
+                    avoid_y -= offset_y * (other_avoid_mult + 1)
+
+        # Seperate from ALL boids
+        dir_x += avoid_x * seperation_factor
+        dir_y += avoid_y * seperation_factor
+
+        # Only align and cohese with boids of boid's own type
+        if count:
+            dir_x += (sum_dir_x / count - dir_x) * alignment_factor
+            dir_y += (sum_dir_y / count - dir_y) * alignment_factor
+
+            # The center of mass seen from the boid
+            dir_x += sum_offset_x / count * cohesion_factor
+            dir_y += sum_offset_y / count * cohesion_factor
+
+        new_dirs[i, 0] = dir_x
+        new_dirs[i, 1] = dir_y
+        neighbours[i] = visible
@@ -0,0 +1,157 @@
+"""Update a flock at a fixed rate on a thread, independent of drawing
+"""
+from typing import Callable
+import threading
+import time
+import numpy as np
+
+from boids.flock import Flock
+
+
+class SimulationLoop:
+    """Update a flock a fixed number of times per second on a thread
+
+    Every update is one time step of 1 / rate seconds. The last two states
+    are kept, so the state between them can be shown at any time while the
+    flock updates at its own rate.
+    """
+
+    def __init__(self, flock: Flock, rate: float = 30.0, max_steps: int = 5,
+                 clock: Callable[[], float] = time.perf_counter):
+        """The initialize method
+
+        Args:
+            flock (Flock): the flock to update, only the loop may use it
+                while the loop is running
+            rate (float, optional): the number of updates per second.
+                Defaults to 30.0.
+            max_steps (int, optional): the most updates to catch up at
+                once, when the flock is slower than the rate it slows down
+                instead. Defaults to 5.
+            clock (Callable[[], float], optional): the current time in
+                seconds. Defaults to time.perf_counter.
+        """
+        self.flock = flock
+        self.time_step = 1 / rate
+        self.max_steps = max_steps
+        self.clock = clock
+
+        flock.time_step = self.time_step
+
+        # The time and state of the previous and the last update
+        self.lock = threading.Lock()
+        self.previous = self.current = (clock(), self.get_state())
+        self.next_time = self.current[0] + self.time_step
+
+        self.stopped = threading.Event()
+        self.thread = None
+
+    def get_state(self) -> dict:
+        """Copy the state of the flock
+
+        Returns:
+            dict: the positions, directions, types and ids
+        """
+        return {name: np.array(array)
+                for name, array in self.flock.get_state().items()}
+
+    def step(self, now: float) -> int:
+        """Do all updates that are due at a time
+
+        Args:
+            now (float): the current time
+
+        Returns:
+            int: the number of updates
+        """
+        steps = 0
+
+        while now >= self.next_time and steps < self.max_steps:
+            self.flock.update_boids()
+            state = self.get_state()
+
+            with self.lock:
+                self.previous = self.current
+                self.current = (self.next_time, state)
+
+            self.next_time += self.time_step
+            steps += 1
+
+        # Skip the updates the flock can't catch up with
+        if now >= self.next_time:
+            self.next_time = now + self.time_step
+
+        return steps
+
+    def interpolate(self, now: float = None) -> dict:
+        """Get the state between the last two updates
+
+        The state is shown one time step late, so it is always between two
+        updates that are done.
+
+        Args:
+            now (float, optional): the current time.
+                Defaults to None for the time of the clock.
+
+        Returns:
+            dict: the positions, directions, types and ids
+        """
+        if now is None:
+            now = self.clock()
+
+        with self.lock:
+            (previous_time, previous), (current_time, current) = \
+                self.previous, self.current
+
+        duration = current_time - previous_time
+        if duration <= 0 or not np.array_equal(previous["ids"],
+                                               current["ids"]):
+            return current
+
+        alpha = min(max((now - self.time_step - previous_time) / duration,
+                        0.0), 1.0)
+
+        # Boids that looped around the world move the short way
+        offsets = current["positions"] - previous["positions"]
+        if self.flock.loop_bounds:
+            world_size = np.array(self.flock.world_size)
+            offsets -= world_size * np.round(offsets / world_size)
+
+        positions = previous["positions"] + offsets * alpha
+        if self.flock.loop_bounds:
+            positions %= world_size
+
+        directions = (previous["directions"] +
+                      (current["directions"] - previous["directions"]) *
+                      alpha)
+
+        return dict(current, positions=positions, directions=directions)
+
+    def run(self):
+        """Update the flock until the loop is stopped
+        """
+        while not self.stopped.is_set():
+            self.step(self.clock())
+
+            # Sleep until the next update or until the loop is stopped
+            self.stopped.wait(max(self.next_time - self.clock(), 0.0))
+
+    def start(self):
+        """Start updating the flock on a thread
+        """
+        self.stopped.clear()
+        self.next_time = self.clock() + self.time_step
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """Stop updating the flock, wait for the last update and stop the
+        threads of the flock
+        """
+        self.stopped.set()
+
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+        self.flock.close()
@@ -0,0 +1,244 @@
+"""Static obstacles baked into a signed-distance field
+
+The signed distance of a point is its distance to the closest obstacle,
+negative inside of an obstacle. ObstacleField samples it once at the
+center of every cell of a grid over the world, with its gradient, so the
+distance and the way out of every boid is one lookup per update.
+"""
+from typing import List, Tuple, Union
+import math
+import numpy as np
+
+
+# The size of a cell of the field
+RESOLUTION = 4.0
+
+
+class Circle:
+    """A round obstacle"""
+
+    def __init__(self, center: tuple, radius: float):
+        """The initialize method
+
+        Args:
+            center (tuple): the center of the circle
+            radius (float): the radius of the circle
+        """
+        self.center = (float(center[0]), float(center[1]))
+        self.radius = float(radius)
+
+    def signed_distance(self, points: np.ndarray) -> np.ndarray:
+        """Get the signed distance of points to the circle
+
+        Args:
+            points (np.ndarray): the points
+
+        Returns:
+            np.ndarray: the distance of every point, negative inside
+        """
+        return np.hypot(points[:, 0] - self.center[0],
+                        points[:, 1] - self.center[1]) - self.radius
+
+    def to_dict(self) -> dict:
+        return {"circle": list(self.center), "radius": self.radius}
+
+
+class Polygon:
+    """An obstacle with straight edges, the points go around it in order"""
+
+    def __init__(self, points: List[tuple]):
+        """The initialize method
+
+        Args:
+            points (List[tuple]): the corners of the polygon
+
+        Raises:
+            ValueError: if the polygon has less than 3 corners
+        """
+        if len(points) < 3:
+            raise ValueError("A polygon needs at least 3 points")
+
+        self.points = np.array(points, float).reshape(-1, 2)
+
+    def signed_distance(self, points: np.ndarray) -> np.ndarray:
+        """Get the signed distance of points to the polygon
+
+        Args:
+            points (np.ndarray): the points
+
+        Returns:
+            np.ndarray: the distance of every point, negative inside
+        """
+        xs, ys = points[:, 0], points[:, 1]
+        distances_sq = np.full(len(points), np.inf)
+        inside = np.zeros(len(points), bool)
+
+        for start, end in zip(self.points, np.roll(self.points, -1, 0)):
+            # The closest point on the edge
+            edge = end - start
+            t = ((xs - start[0]) * edge[0] + (ys - start[1]) * edge[1]) / \
+                max(edge @ edge, 1e-12)
+            t = np.clip(t, 0, 1)
+            distances_sq = np.minimum(
+                distances_sq,
+                (xs - start[0] - t * edge[0]) ** 2 +
+                (ys - start[1] - t * edge[1]) ** 2
+            )
+
+            # Count the edges a ray to the right crosses
+            crosses = (start[1] > ys) != (end[1] > ys)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                cross_x = start[0] + (ys - start[1]) * edge[0] / edge[1]
+            inside ^= crosses & (xs < cross_x)
+
+        return np.where(inside, -1, 1) * np.sqrt(distances_sq)
+
+    def to_dict(self) -> dict:
+        return {"polygon": self.points.tolist()}
+
+
+Obstacle = Union[Circle, Polygon]
+
+
+def load_obstacle(data: Union[Obstacle, dict]) -> Obstacle:
+    """Create an obstacle from its JSON data
+
+    Args:
+        data (Union[Obstacle, dict]): {"circle": center, "radius": radius},
+            {"polygon": points} or an obstacle that is returned as it is
+
+    Raises:
+        ValueError: if the data is not an obstacle
+
+    Returns:
+        Obstacle: the obstacle
+    """
+    if isinstance(data, (Circle, Polygon)):
+        return data
+    if "circle" in data:
+        return Circle(data["circle"], data["radius"])
+    if "polygon" in data:
+        return Polygon(data["polygon"])
+
+    raise ValueError(f"Unknown obstacle {data!r}, use a circle or polygon")
+
+
+class ObstacleField:
+    """The signed distance and its gradient at every cell of the world
+
+    Boids outside of the world use the closest cell.
+    """
+
+    def __init__(self, obstacles: List[Obstacle], world_size: tuple,
+                 resolution: float = RESOLUTION):
+        """The initialize method, bakes the field
+
+        Args:
+            obstacles (List[Obstacle]): the obstacles
+            world_size (tuple): the size of the world
+            resolution (float, optional): the size of a cell.
+                Defaults to RESOLUTION.
+        """
+        self.obstacles = list(obstacles)
+        self.resolution = float(resolution)
+        self.scale = 1 / self.resolution
+        self.shape = (max(math.ceil(world_size[0] / resolution), 1),
+                      max(math.ceil(world_size[1] / resolution), 1))
+
+        # The centers of the cells, indexed by x and y
+        xs, ys = np.meshgrid(
+            (np.arange(self.shape[0]) + 0.5) * resolution,
+            (np.arange(self.shape[1]) + 0.5) * resolution,
+            indexing="ij"
+        )
+        centers = np.stack((xs.ravel(), ys.ravel()), axis=1)
+
+        distances = np.full(len(centers), np.inf)
+        for obstacle in self.obstacles:
+            distances = np.minimum(distances,
+                                   obstacle.signed_distance(centers))
+        self.distances = distances.reshape(self.shape)
+
+        # The direction the distance grows fastest, away from the obstacles
+        self.gradients = np.zeros(self.shape + (2,))
+        if self.obstacles and min(self.shape) > 1:
+            self.gradients[..., 0], self.gradients[..., 1] = np.gradient(
+                self.distances, resolution
+            )
+            lengths = np.hypot(self.gradients[..., 0],
+                               self.gradients[..., 1])
+            self.gradients /= np.maximum(lengths, 1e-12)[..., None]
+
+        # Flat views indexed by x * height + y for looking up many boids
+        self.flat_distances = self.distances.ravel()
+        self.flat_gradients = self.gradients.reshape(-1, 2)
+
+        # The lists are only built for the "object" engine
+        self._distance_list = None
+        self._gradient_list = None
+
+    @property
+    def distance_list(self) -> List[float]:
+        """The distances as a list, for looking up one boid at a time
+        without NumPy, indexed like flat_distances
+        """
+        if self._distance_list is None:
+            self._distance_list = self.flat_distances.tolist()
+
+        return self._distance_list
+
+    @property
+    def gradient_list(self) -> List[float]:
+        """The gradients as a flat list of x and y, the gradient of a cell
+        starts at 2 * cell
+        """
+        if self._gradient_list is None:
+            self._gradient_list = self.flat_gradients.ravel().tolist()
+
+        return self._gradient_list
+
+    def cell(self, x: float, y: float) -> int:
+        """Get the index of the cell of a point in the flat lists
+
+        Args:
+            x (float): the x of the point
+            y (float): the y of the point
+
+        Returns:
+            int: the index of the cell, x * height + y
+        """
+        # Negative coordinates round up, but they are in the first cell
+        width, height = self.shape
+        cell_x = min(max(int(x * self.scale), 0), width - 1)
+        cell_y = min(max(int(y * self.scale), 0), height - 1)
+
+        return cell_x * height + cell_y
+
+    def cells(self, positions: np.ndarray) -> np.ndarray:
+        """Get the indices of the cells of many points at once
+
+        Args:
+            positions (np.ndarray): the points
+
+        Returns:
+            np.ndarray: the index of the cell of every point
+        """
+        # Multiplying and truncating is much faster than a float floor
+        cells = (positions * self.scale).astype(np.int64)
+        np.clip(cells, 0, np.array(self.shape) - 1, out=cells)
+
+        return cells[:, 0] * self.shape[1] + cells[:, 1]
+
+    def sample(self, positions: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Look up the distance and gradient of many positions at once
+
+        Args:
+            positions (np.ndarray): the positions
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: the signed distance and the
+                gradient at every position
+        """
+        cells = self.cells(positions)
+
+        return self.flat_distances[cells], self.flat_gradients[cells]
@@ -1,6 +1,10 @@
+from collections import deque
 import cProfile
 import pstats
 import io
+import json
+import time
+import numpy as np
 
 
 def profile(fnc):
@@ -17,3 +21,134 @@ def profile(fnc):
         return retval
 
     return inner
+
+
+class FlockProfiler:
+    """Record how long every phase of an update takes
+
+    Set flock.profiler to a FlockProfiler to profile the flock, the flock
+    only checks whether it has a profiler when it is None.
+    """
+
+    def __init__(self, history: int = 300):
+        """The initialize method
+
+        Args:
+            history (int, optional): the number of updates to remember.
+                Defaults to 300.
+        """
+        self.history = history
+        self.timings = {}
+        self.counters = {}
+
+        self.tick = {}
+        self.worker_tick = {}
+        self.last = 0.0
+
+    def start_tick(self):
+        """Start timing an update
+        """
+        self.tick = {}
+        self.worker_tick = {}
+        self.last = time.perf_counter()
+
+    def lap(self, phase: str):
+        """Add the time since the last lap to a phase
+
+        Args:
+            phase (str): the name of the phase
+        """
+        now = time.perf_counter()
+        self.tick[phase] = self.tick.get(phase, 0.0) + now - self.last
+        self.last = now
+
+    def add_worker_tick(self, tick: dict):
+        """Add the phases a worker timed on its own range
+
+        The workers run at the same time, so their times are added up
+        under "workers.<phase>" apart from the phases of the update and
+        are not part of the total.
+
+        Args:
+            tick (dict): the seconds of every phase
+        """
+        for phase, seconds in tick.items():
+            self.worker_tick[phase] = \
+                self.worker_tick.get(phase, 0.0) + seconds
+
+    def count(self, name: str, value: float):
+        """Record a counter of the update
+
+        Args:
+            name (str): the name of the counter
+            value (float): the value of the counter
+        """
+        self.counters.setdefault(
+            name, deque(maxlen=self.history)
+        ).append(value)
+
+    def end_tick(self):
+        """Save the timings of the update
+        """
+        total = 0.0
+        for phase, seconds in self.tick.items():
+            self.timings.setdefault(
+                phase, deque(maxlen=self.history)
+            ).append(seconds)
+            total += seconds
+
+        self.timings.setdefault(
+            "total", deque(maxlen=self.history)
+        ).append(total)
+
+        for phase, seconds in self.worker_tick.items():
+            self.timings.setdefault(
+                "workers." + phase, deque(maxlen=self.history)
+            ).append(seconds)
+
+    def histogram(self, name: str, bins: int = 20) -> tuple:
+        """Get a histogram of the recent values of a phase or counter
+
+        Args:
+            name (str): the name of the phase or counter
+            bins (int, optional): the number of bins. Defaults to 20.
+
+        Returns:
+            tuple: the counts and the edges of the bins
+        """
+        values = self.timings.get(name, self.counters.get(name, ()))
+        return np.histogram(np.array(values), bins)
+
+    def summary(self) -> dict:
+        """Get statistics of the recent values of all phases and counters
+
+        Returns:
+            dict: the mean, median, 95th percentile and maximum per name,
+                the timings are in seconds
+        """
+        summary = {}
+
+        for name, values in {**self.timings, **self.counters}.items():
+            values = np.array(values)
+            summary[name] = {
+                "mean": float(values.mean()),
+                "median": float(np.median(values)),
+                "p95": float(np.percentile(values, 95)),
+                "max": float(values.max()),
+                "samples": len(values),
+            }
+
+        return summary
+
+    def export(self, path: str):
+        """Save the summary and recent values as JSON
+
+        Args:
+            path (str): the path of the JSON file
+        """
+        with open(path, "w") as file:
+            json.dump({
+                "summary": self.summary(),
+                "timings": {k: list(v) for k, v in self.timings.items()},
+                "counters": {k: list(v) for k, v in self.counters.items()},
+            }, file, indent=4)
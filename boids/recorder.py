@@ -0,0 +1,281 @@
+"""Record the trajectories of the boids to a file and read them back
+
+A trajectory file starts with MAGIC, the length of the header as a little
+endian uint64 and the JSON header. Chunks of frames follow, every chunk
+starts with its first tick, number of frames and number of boids as int64,
+then the ids and types of the boids and the positions of every frame, and
+the directions of every frame when they are recorded. A new chunk starts
+when the chunk is full or the boids change.
+"""
+from collections import namedtuple
+from typing import Iterator, List
+import json
+import numpy as np
+
+
+MAGIC = b"BOIDTRAJ"
+VERSION = 1
+
+# A recorded frame, directions is None when they were not recorded
+Frame = namedtuple("Frame", ("tick", "positions", "directions", "types",
+                             "ids"))
+
+
+class TrajectoryRecorder:
+    """Stream the positions of the boids to a file while the flock updates
+
+    Set flock.recorder to a TrajectoryRecorder to record every update, the
+    flock only checks whether it has a recorder when it is None.
+    """
+
+    def __init__(self, path: str, stride: int = 1, dtype=np.float32,
+                 directions: bool = False, chunk_frames: int = 64):
+        """The initialize method
+
+        Args:
+            path (str): the file to write
+            stride (int, optional): only record every stride-th update.
+                Defaults to 1.
+            dtype (optional): the type to store the positions as.
+                Defaults to np.float32.
+            directions (bool, optional): record the directions as well.
+                Defaults to False.
+            chunk_frames (int, optional): the number of frames to keep in
+                memory before writing them. Defaults to 64.
+
+        Raises:
+            ValueError: if the stride is below 1
+        """
+        if stride < 1:
+            raise ValueError("The stride has to be at least 1")
+
+        self.stride = stride
+        self.dtype = np.dtype(dtype)
+        self.directions = directions
+        self.chunk_frames = chunk_frames
+
+        self.file = open(path, "wb")
+        header = json.dumps({
+            "version": VERSION,
+            "dtype": self.dtype.str,
+            "directions": directions,
+            "stride": stride,
+        }).encode()
+        self.file.write(MAGIC)
+        self.file.write(np.uint64(len(header)).tobytes())
+        self.file.write(header)
+
+        self.ticks = 0
+        self.frames = 0
+
+        # The frames of the chunk that is not written yet
+        self.key = None
+        self.first_tick = 0
+        self.ids = self.types = None
+        self.pos_frames = self.dir_frames = None
+
+    def record(self, flock):
+        """Record the boids of a flock after an update
+
+        Args:
+            flock (Flock): the flock
+        """
+        tick = self.ticks
+        self.ticks += 1
+        if tick % self.stride:
+            return
+
+        # The boids change when boids are added or removed
+        boids = flock.boids if flock.engine == "object" else None
+        num_boids = len(boids) if boids is not None else len(flock.ids)
+        key = (num_boids, flock.next_id)
+
+        if key != self.key or self.frames == self.chunk_frames:
+            self.flush()
+            self.start_chunk(flock, key, tick)
+
+        frame = self.frames
+        if boids is None:
+            self.pos_frames[frame] = flock.positions
+            if self.directions:
+                self.dir_frames[frame] = flock.directions
+        else:
+            self.pos_frames[frame] = [(boid.pos.x, boid.pos.y)
+                                      for boid in boids]
+            if self.directions:
+                self.dir_frames[frame] = [(boid.dir.x, boid.dir.y)
+                                          for boid in boids]
+
+        self.frames += 1
+
+    def start_chunk(self, flock, key: tuple, tick: int):
+        """Start a new chunk of frames with the current boids
+
+        Args:
+            flock (Flock): the flock
+            key (tuple): the number of boids and the next id of the flock
+            tick (int): the tick of the first frame
+        """
+        state = flock.get_state() if flock.engine == "object" else {
+            "ids": flock.ids, "types": flock.types,
+        }
+        self.ids = np.array(state["ids"], np.int64)
+        self.types = np.array(state["types"], np.int64)
+
+        # Only allocate new buffers when the number of boids changes
+        shape = (self.chunk_frames, key[0], 2)
+        if self.pos_frames is None or self.pos_frames.shape != shape:
+            self.pos_frames = np.empty(shape, self.dtype)
+            if self.directions:
+                self.dir_frames = np.empty(shape, self.dtype)
+
+        self.key = key
+        self.first_tick = tick
+
+    def flush(self):
+        """Write the recorded frames to the file
+        """
+        if not self.frames:
+            return
+
+        frames = self.frames
+        self.file.write(np.array(
+            [self.first_tick, frames, len(self.ids)], np.int64
+        ).tobytes())
+        self.file.write(self.ids.tobytes())
+        self.file.write(self.types.tobytes())
+        self.file.write(self.pos_frames[:frames].tobytes())
+        if self.directions:
+            self.file.write(self.dir_frames[:frames].tobytes())
+
+        self.file.flush()
+        self.frames = 0
+
+    def close(self):
+        """Write the last frames and close the file
+        """
+        self.flush()
+        self.file.close()
+
+    def __enter__(self) -> "TrajectoryRecorder":
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class TrajectoryReader:
+    """Read the frames of a trajectory file without loading all of them
+
+    The file is memory-mapped and only the chunk headers are read when
+    opening it, reading a frame reads only that frame.
+    """
+
+    def __init__(self, path: str):
+        """The initialize method
+
+        Args:
+            path (str): the file to read
+
+        Raises:
+            ValueError: if the file is not a trajectory of this version
+        """
+        with open(path, "rb") as file:
+            if file.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"{path} is not a trajectory")
+
+            header_length = int(np.frombuffer(file.read(8), np.uint64)[0])
+            self.header = json.loads(file.read(header_length))
+
+        if self.header["version"] != VERSION:
+            raise ValueError(f"Trajectory version {self.header['version']} "
+                             f"is not supported, use version {VERSION}")
+
+        self.dtype = np.dtype(self.header["dtype"])
+        self.has_directions = self.header["directions"]
+        self.data = np.memmap(path, np.uint8, "r")
+
+        # The offset of every chunk and its first frame
+        self.chunks = []
+        self.first_frames = []
+        num_frames = 0
+        offset = len(MAGIC) + 8 + header_length
+
+        while offset + 24 <= len(self.data):
+            first_tick, frames, num_boids = np.frombuffer(
+                self.data, np.int64, 3, offset
+            ).tolist()
+
+            size = (24 + 16 * num_boids +
+                    frames * num_boids * 2 * self.dtype.itemsize *
+                    (2 if self.has_directions else 1))
+
+            # Stop at a chunk that is still being written
+            if offset + size > len(self.data):
+                break
+
+            self.chunks.append((offset, first_tick, frames, num_boids))
+            self.first_frames.append(num_frames)
+            num_frames += frames
+            offset += size
+
+        self.num_frames = num_frames
+
+    def __len__(self) -> int:
+        return self.num_frames
+
+    def __getitem__(self, index: int) -> Frame:
+        """Read a frame
+
+        Args:
+            index (int): the index of the frame
+
+        Raises:
+            IndexError: if there is no such frame
+
+        Returns:
+            Frame: the frame
+        """
+        if index < 0:
+            index += self.num_frames
+        if not 0 <= index < self.num_frames:
+            raise IndexError(f"Frame {index} is out of range")
+
+        chunk = np.searchsorted(self.first_frames, index, "right") - 1
+        offset, first_tick, frames, num_boids = self.chunks[chunk]
+        frame = index - self.first_frames[chunk]
+
+        ids = np.frombuffer(self.data, np.int64, num_boids, offset + 24)
+        types = np.frombuffer(self.data, np.int64, num_boids,
+                              offset + 24 + 8 * num_boids)
+
+        frame_size = num_boids * 2 * self.dtype.itemsize
+        positions_offset = offset + 24 + 16 * num_boids
+        positions = np.frombuffer(
+            self.data, self.dtype, num_boids * 2,
+            positions_offset + frame * frame_size
+        ).reshape(num_boids, 2)
+
+        directions = None
+        if self.has_directions:
+            directions = np.frombuffer(
+                self.data, self.dtype, num_boids * 2,
+                positions_offset + (frames + frame) * frame_size
+            ).reshape(num_boids, 2)
+
+        return Frame(first_tick + frame * self.header["stride"], positions,
+                     directions, types, ids)
+
+    def __iter__(self) -> Iterator[Frame]:
+        for index in range(self.num_frames):
+            yield self[index]
+
+    def ticks(self) -> List[int]:
+        """Get the tick of every frame
+
+        Returns:
+            List[int]: the ticks
+        """
+        return [first_tick + frame * self.header["stride"]
+                for _, first_tick, frames, _ in self.chunks
+                for frame in range(frames)]
@@ -0,0 +1,165 @@
+"""Play back a recorded trajectory with seeking, pausing and speed control
+"""
+from typing import List
+import threading
+import numpy as np
+
+from boids.recorder import Frame, TrajectoryReader
+
+
+class Replay:
+    """The playback state of a trajectory, decoding frames ahead of time
+
+    A background thread reads the next frames from the file and copies
+    them into memory, so showing a frame only waits for the file when
+    seeking to a frame that was not decoded yet.
+    """
+
+    def __init__(self, reader: TrajectoryReader, speed: float = 1.0,
+                 prefetch: int = 16):
+        """The initialize method
+
+        Args:
+            reader (TrajectoryReader): the frames to play
+            speed (float, optional): the number of frames to advance per
+                step, negative to play backwards. Defaults to 1.0.
+            prefetch (int, optional): the number of frames to decode ahead.
+                Defaults to 16.
+        """
+        self.reader = reader
+        self.speed = speed
+        self.prefetch = prefetch
+        self.paused = False
+        self.position = 0.0
+
+        # The decoded frames by their index, shared with the thread
+        self.frames = {}
+        self.condition = threading.Condition()
+        self.running = True
+
+        self.thread = threading.Thread(target=self.decode_ahead, daemon=True)
+        self.thread.start()
+
+    @property
+    def index(self) -> int:
+        return int(self.position)
+
+    def seek(self, index: int):
+        """Go to a frame
+
+        Args:
+            index (int): the index of the frame, clamped to the frames
+        """
+        # Without frames the replay stays at the start
+        last = max(len(self.reader) - 1, 0)
+
+        with self.condition:
+            self.position = float(min(max(index, 0), last))
+            self.condition.notify_all()
+
+    def step(self) -> int:
+        """Advance by the speed unless paused, stopping at both ends
+
+        Returns:
+            int: the index of the current frame
+        """
+        if not self.paused:
+            self.seek(self.position + self.speed)
+
+        return self.index
+
+    def toggle_pause(self):
+        """Pause or unpause the playback
+        """
+        self.paused = not self.paused
+
+    def frame(self) -> Frame:
+        """Get the current frame, decoding it now if it isn't decoded yet
+
+        Returns:
+            Frame: the current frame, None when there are no frames
+        """
+        if not len(self.reader):
+            return None
+
+        index = self.index
+
+        with self.condition:
+            frame = self.frames.get(index)
+        if frame is not None:
+            return frame
+
+        frame = self.decode(index)
+        with self.condition:
+            self.frames[index] = frame
+
+        return frame
+
+    def upcoming(self) -> List[int]:
+        """Get the indices of the frames that will be shown next
+
+        Returns:
+            List[int]: the current frame and the frames after it
+        """
+        step = max(int(round(abs(self.speed))), 1)
+        if self.speed < 0:
+            step = -step
+
+        indices = range(self.index, self.index + step * self.prefetch, step)
+        return [index for index in indices if 0 <= index < len(self.reader)]
+
+    def decode(self, index: int) -> Frame:
+        """Read a frame from the file into memory
+
+        Args:
+            index (int): the index of the frame
+
+        Returns:
+            Frame: the frame with arrays in memory
+        """
+        frame = self.reader[index]
+        directions = frame.directions
+        if directions is not None:
+            directions = np.array(directions, float)
+
+        return frame._replace(positions=np.array(frame.positions, float),
+                              directions=directions,
+                              types=np.array(frame.types),
+                              ids=np.array(frame.ids))
+
+    def decode_ahead(self):
+        """Keep decoding the upcoming frames until the replay is closed
+        """
+        while True:
+            with self.condition:
+                while self.running:
+                    wanted = self.upcoming()
+                    missing = [index for index in wanted
+                               if index not in self.frames]
+                    if missing:
+                        break
+
+                    self.condition.wait()
+
+                if not self.running:
+                    return
+
+                # Forget the frames that are not needed anymore
+                for index in list(self.frames):
+                    if index not in wanted:
+                        del self.frames[index]
+
+            for index in missing:
+                frame = self.decode(index)
+                with self.condition:
+                    self.frames[index] = frame
+                    self.condition.notify_all()
+
+    def close(self):
+        """Stop decoding frames
+        """
+        with self.condition:
+            self.running = False
+            self.condition.notify_all()
+
+        self.thread.join()
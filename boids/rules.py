@@ -0,0 +1,204 @@
+"""Steering rules that are applied to ranges of boids with array operations
+
+Flock.rules is the pipeline of rules of a flock. The visible neighbours of
+a range of boids are found once per update and shared by all rules, every
+rule declares which neighbours it needs and changes the next directions of
+the range in place.
+"""
+from typing import List
+import numpy as np
+
+from boids import vectorized
+
+
+class Neighbours:
+    """The visible neighbours of a range of boids, as pairs of indices
+
+    The boids are indexed from the start of the range and the neighbours
+    from the start of the flock.
+    """
+
+    def __init__(self, num_boids: int, boids: np.ndarray, others: np.ndarray,
+                 offsets: np.ndarray, distances_sq: np.ndarray,
+                 same_type: np.ndarray):
+        """The initialize method
+
+        Args:
+            num_boids (int): the number of boids in the range
+            boids (np.ndarray): the boid of every pair
+            others (np.ndarray): the neighbour of every pair
+            offsets (np.ndarray): the offset from the boid to the neighbour
+            distances_sq (np.ndarray): the squared distance of every pair
+            same_type (np.ndarray): whether both boids have the same type
+        """
+        self.num_boids = num_boids
+        self.boids = boids
+        self.others = others
+        self.offsets = offsets
+        self.distances_sq = distances_sq
+        self.same_type = same_type
+
+        # Only calculated when a rule needs them
+        self._counts = None
+        self._of_type = None
+
+    @property
+    def counts(self) -> np.ndarray:
+        # The number of neighbours of every boid
+        if self._counts is None:
+            self._counts = np.bincount(self.boids, minlength=self.num_boids)
+
+        return self._counts
+
+    def of_type(self) -> "Neighbours":
+        """Get the neighbours of the same type as their boid
+
+        Returns:
+            Neighbours: the pairs of the same type
+        """
+        if self._of_type is None:
+            same_type = self.same_type
+            self._of_type = Neighbours(
+                self.num_boids, self.boids[same_type],
+                self.others[same_type], self.offsets[same_type],
+                self.distances_sq[same_type], same_type[same_type]
+            )
+
+        return self._of_type
+
+
+class Rule:
+    """A steering rule that changes the directions of a range of boids
+
+    neighbours is "all" when the rule uses every visible boid, "type" when
+    it only uses the visible boids of the same type and None when it
+    doesn't look at other boids, then the neighbours aren't found for it.
+    """
+    neighbours = "all"
+
+    @property
+    def name(self) -> str:
+        # The phase of the rule in the profiler
+        return type(self).__name__.lower()
+
+    def prepare(self, flock):
+        """Get ready for an update, once before the ranges are steered
+
+        Args:
+            flock (Flock): the flock of the boids
+        """
+
+    def apply(self, flock, start: int, stop: int, neighbours: Neighbours,
+              directions: np.ndarray):
+        """Steer a range of boids
+
+        The positions, directions and types of the flock are from before
+        the update, so ranges can be steered at the same time.
+
+        Args:
+            flock (Flock): the flock of the boids
+            start (int): the first boid
+            stop (int): the boid after the last boid
+            neighbours (Neighbours): the neighbours the rule needs, None
+                when it needs none
+            directions (np.ndarray): the next directions of the range, to
+                change in place
+        """
+        raise NotImplementedError
+
+
+class Seperation(Rule):
+    """Move away from all close boids, other types more strongly"""
+    neighbours = "all"
+
+    def apply(self, flock, start: int, stop: int, neighbours: Neighbours,
+              directions: np.ndarray):
+        vectorized.seperation(
+            directions, neighbours.boids, neighbours.offsets,
+            neighbours.distances_sq, neighbours.same_type,
+            flock.avoid_dist, flock.other_avoid_dist,
+            flock.other_avoid_mult,
+            flock.seperation_factor * flock.time_scale
+        )
+
+
+class Alignment(Rule):
+    """Align with the average direction of close boids of the same type"""
+    neighbours = "type"
+
+    def apply(self, flock, start: int, stop: int, neighbours: Neighbours,
+              directions: np.ndarray):
+        vectorized.alignment(
+            directions, flock.directions, neighbours.boids,
+            neighbours.others, neighbours.counts,
+            flock.alignment_factor * flock.time_scale
+        )
+
+
+class Cohesion(Rule):
+    """Go to the center of mass of close boids of the same type"""
+    neighbours = "type"
+
+    def apply(self, flock, start: int, stop: int, neighbours: Neighbours,
+              directions: np.ndarray):
+        vectorized.cohesion(
+            directions, neighbours.boids, neighbours.offsets,
+            neighbours.counts, flock.cohesion_factor * flock.time_scale
+        )
+
+
+class Seek(Rule):
+    """Steer towards a point, the short way around a looping world"""
+    neighbours = None
+
+    def __init__(self, target: tuple, factor: float = 0.001):
+        """The initialize method
+
+        Args:
+            target (tuple): the point to steer to
+            factor (float, optional): the part of the offset to the target
+                to steer by. Defaults to 0.001.
+        """
+        self.target = np.asarray(target, float)
+        self.factor = factor
+
+    def apply(self, flock, start: int, stop: int, neighbours: Neighbours,
+              directions: np.ndarray):
+        offsets = self.target - flock.positions[start:stop]
+
+        if flock.loop_bounds:
+            world_size = np.array(flock.world_size)
+            offsets -= world_size * np.round(offsets / world_size)
+
+        directions += offsets * (self.factor * flock.time_scale)
+
+
+# The rules of every flock, in the order the fused steering applies them
+DEFAULT_RULES = (Seperation, Alignment, Cohesion)
+
+
+def default_rules() -> List[Rule]:
+    """Create the rules of a flock without rules of its own
+
+    Returns:
+        List[Rule]: seperation, alignment and cohesion
+    """
+    return [rule() for rule in DEFAULT_RULES]
+
+
+def fused_rules(rules: List[Rule]) -> int:
+    """Count the rules that the fused steering of a flock can apply
+
+    Flock.steer and the Numba kernel apply the default rules in one pass,
+    so they can replace the pipeline when it starts with exactly them.
+
+    Args:
+        rules (List[Rule]): the pipeline of rules
+
+    Returns:
+        int: the number of rules at the start to apply fused
+    """
+    if tuple(map(type, rules[:len(DEFAULT_RULES)])) == DEFAULT_RULES:
+        return len(DEFAULT_RULES)
+
+    return 0
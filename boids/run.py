@@ -0,0 +1,107 @@
+"""Run a flock without a display, as fast as possible
+
+Example:
+    python -m boids.run --steps 1000 --boids 5000 --seed 1 --engine numba
+"""
+from typing import List
+import argparse
+import time
+import numpy as np
+
+from boids.config import load_config
+from boids.flock import Flock, ENGINES
+from boids.recorder import TrajectoryRecorder
+
+
+def run(flock: Flock, steps: int) -> float:
+    """Update a flock a number of times
+
+    Args:
+        flock (Flock): the flock to simulate
+        steps (int): the number of updates
+
+    Returns:
+        float: the number of seconds it took
+    """
+    start = time.perf_counter()
+
+    for _ in range(steps):
+        flock.update_boids()
+
+    return time.perf_counter() - start
+
+
+def parse_args(args: List[str] = None) -> argparse.Namespace:
+    """Parse the command line arguments
+
+    Args:
+        args (List[str], optional): the arguments. Defaults to None for
+            the arguments of the program.
+
+    Returns:
+        argparse.Namespace: the parsed arguments
+    """
+    parser = argparse.ArgumentParser(
+        prog="python -m boids.run",
+        description="Run a flock without a display"
+    )
+    parser.add_argument("--steps", type=int, default=100,
+                        help="the number of updates")
+    parser.add_argument("--boids", type=int,
+                        help="the number of boids")
+    parser.add_argument("--seed", type=int,
+                        help="the seed of the random boids")
+    parser.add_argument("--config",
+                        help="a JSON file with the settings of the flock")
+    parser.add_argument("--engine", choices=ENGINES,
+                        help="how the boids are updated, the config or "
+                             "object by default")
+    parser.add_argument("--workers", type=int,
+                        help="the number of threads of the array engines, "
+                             "the config or 1 by default")
+    parser.add_argument("--dump",
+                        help="save the final state to this .npz file")
+    parser.add_argument("--record",
+                        help="record the trajectories to this file")
+    parser.add_argument("--stride", type=int, default=1,
+                        help="only record every stride-th step")
+
+    return parser.parse_args(args)
+
+
+def main(args: List[str] = None):
+    """Run a flock from the command line
+
+    Args:
+        args (List[str], optional): the arguments. Defaults to None for
+            the arguments of the program.
+    """
+    args = parse_args(args)
+
+    rng = None
+    if args.seed is not None:
+        rng = np.random.default_rng(args.seed)
+
+    # The flags replace the settings of the config when they are given
+    config = load_config(args.config, num_boids=args.boids,
+                         engine=args.engine, workers=args.workers)
+    flock = Flock(**config, rng=rng)
+
+    if args.record is not None:
+        flock.recorder = TrajectoryRecorder(args.record, args.stride)
+
+    seconds = run(flock, args.steps)
+    flock.close()
+
+    if flock.recorder is not None:
+        flock.recorder.close()
+    print(f"{args.steps} steps of {config['num_boids']} boids "
+          f"in {seconds:.3f}s ({args.steps / max(seconds, 1e-9):.1f} "
+          "steps/s)")
+
+    if args.dump is not None:
+        np.savez(args.dump, **flock.get_state())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""Save and load arrays with a JSON header in one binary file
+
+A snapshot starts with MAGIC, the length of the header as a little endian
+uint64 and the JSON header. The arrays follow, every array starts at a
+multiple of ALIGNMENT bytes so it can be memory-mapped.
+"""
+from typing import Dict, Tuple
+import json
+import numpy as np
+
+
+MAGIC = b"BOIDSNAP"
+VERSION = 1
+ALIGNMENT = 64
+
+
+def align(offset: int) -> int:
+    """Round an offset up to the next multiple of ALIGNMENT
+
+    Args:
+        offset (int): the offset in bytes
+
+    Returns:
+        int: the aligned offset
+    """
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+
+def write_snapshot(path: str, header: dict, arrays: Dict[str, np.ndarray]):
+    """Write a header and arrays to a snapshot file
+
+    Args:
+        path (str): the file to write
+        header (dict): the JSON data of the snapshot
+        arrays (Dict[str, np.ndarray]): the arrays of the snapshot
+    """
+    arrays = {name: np.ascontiguousarray(array)
+              for name, array in arrays.items()}
+
+    # The offsets of the arrays from the start of the data
+    layout = {}
+    offset = 0
+    for name, array in arrays.items():
+        layout[name] = {
+            "dtype": array.dtype.str,
+            "shape": list(array.shape),
+            "offset": offset,
+        }
+        offset = align(offset + array.nbytes)
+
+    header = dict(header, version=VERSION, arrays=layout)
+    header_bytes = json.dumps(header).encode()
+    data_start = align(len(MAGIC) + 8 + len(header_bytes))
+
+    with open(path, "wb") as file:
+        file.write(MAGIC)
+        file.write(np.uint64(len(header_bytes)).tobytes())
+        file.write(header_bytes)
+
+        for name, array in arrays.items():
+            file.seek(data_start + layout[name]["offset"])
+            array.tofile(file)
+
+        # Pad the last array so the file ends at an aligned offset
+        file.truncate(data_start + offset)
+
+
+def read_snapshot(path: str) -> Tuple[dict, Dict[str, np.ndarray]]:
+    """Read a snapshot file without reading the arrays into memory
+
+    The arrays are views of copy-on-write memory maps: the file is read
+    when the arrays are read and changing the arrays never changes the file.
+
+    Args:
+        path (str): the file to read
+
+    Raises:
+        ValueError: if the file is not a snapshot of this version
+
+    Returns:
+        Tuple[dict, Dict[str, np.ndarray]]: the header and the arrays
+    """
+    with open(path, "rb") as file:
+        if file.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a snapshot")
+
+        header_length = int(np.frombuffer(file.read(8), np.uint64)[0])
+        header = json.loads(file.read(header_length))
+
+    if header["version"] != VERSION:
+        raise ValueError(f"Snapshot version {header['version']} is not "
+                         f"supported, use version {VERSION}")
+
+    data_start = align(len(MAGIC) + 8 + header_length)
+    arrays = {}
+
+    for name, layout in header.pop("arrays").items():
+        shape = tuple(layout["shape"])
+
+        # Empty arrays can't be memory-mapped
+        if not np.prod(shape):
+            arrays[name] = np.empty(shape, layout["dtype"])
+            continue
+
+        arrays[name] = np.asarray(np.memmap(
+            path, layout["dtype"], "c", data_start + layout["offset"], shape
+        ))
+
+    return header, arrays
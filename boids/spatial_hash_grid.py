@@ -1,37 +1,198 @@
-from pygame import Vector2
 from typing import List, Tuple
+import math
+import numpy as np
 
 from boids.boid import Boid
+from boids.vector import Vector2
+
+
+GRID_MODES = ("incremental", "rebuild")
+GRID_STORAGES = ("sparse", "dense")
+
+# The rows of the keys of a sparse grid without wrapping, cells up to
+# 2 ** 31 away from the origin have a key of their own
+SPARSE_ROWS = 2 ** 32
+
+# Returned for the missing cells of a sparse grid, without creating a list
+EMPTY_CELL = ()
 
 
 class SpatialHashGrid:
     def __init__(self, cell_size: int,
-                 perception: int, field_of_view: float):
+                 perception: int, field_of_view: float,
+                 mode: str = "incremental",
+                 world_size: tuple = None, wrap: bool = False,
+                 storage: str = "sparse"):
         """The init method for the hashgrid
 
         Args:
             cell_size (int): the size of the hashgrid cells
             perception (int): how many cells away can a boid see
             field_of_view (float): what is the boid's field of view
+            mode (str, optional): "incremental" to move boids between cells
+                one by one or "rebuild" to rebuild the whole grid once per
+                update. Defaults to "incremental".
+            world_size (tuple, optional): the size of the world.
+                Defaults to None.
+            wrap (bool, optional): whether the world loops around, then the
+                cells and the offsets between boids wrap around the world
+                size. Defaults to False.
+            storage (str, optional): "sparse" to store the cells in a dict
+                of cell keys or "dense" to store every cell of the world
+                in lists and arrays of a fixed size, boids outside of the
+                world are in the closest cell. Defaults to "sparse".
         """
+        if (wrap or storage == "dense") and world_size is None:
+            raise ValueError("A grid that wraps or is dense needs a world "
+                             "size")
+        if mode not in GRID_MODES:
+            raise ValueError(f"Unknown grid mode {mode!r}, use {GRID_MODES}")
+        if storage not in GRID_STORAGES:
+            raise ValueError(f"Unknown grid storage {storage!r}, "
+                             f"use {GRID_STORAGES}")
+
         # Set the cell size and the grid
         self.cell_size = cell_size
+        self.mode = mode
+        self.storage = storage
         self.grid = {}
 
+        # The world and the number of cells in the world
+        self.wrap = wrap
+        self.world_size = None
+        self.num_cells = None
+        self.cell_width = (cell_size, cell_size)
+        if world_size is not None and wrap:
+            # Every cell of a looping world is at least cell_size wide, so
+            # the cells around a boid also reach far enough across the seam
+            self.world_size = (float(world_size[0]), float(world_size[1]))
+            self.num_cells = (max(int(world_size[0] // cell_size), 1),
+                              max(int(world_size[1] // cell_size), 1))
+            self.cell_width = (self.world_size[0] / self.num_cells[0],
+                               self.world_size[1] / self.num_cells[1])
+        elif world_size is not None:
+            self.world_size = (float(world_size[0]), float(world_size[1]))
+            self.num_cells = (math.ceil(world_size[0] / cell_size),
+                              math.ceil(world_size[1] / cell_size))
+
+        # The cells are indexed by x * num_rows + y, the rows of a sparse
+        # grid that doesn't wrap have room for cells outside of the world
+        self.num_rows = (self.num_cells[1] if storage == "dense" or wrap
+                         else SPARSE_ROWS)
+        self.key_shift = 0
+        if self.num_rows == SPARSE_ROWS:
+            self.key_shift = SPARSE_ROWS // 2
+
+        if storage == "dense":
+            self.cells_list = [
+                [] for _ in range(self.num_cells[0] * self.num_cells[1])
+            ]
+            self.around_perception = None
+            self.cells_around = []
+
+        # How many boids were moved and how many of them changed cell
+        self.moved = 0
+        self.migrated = 0
+
+        # The index that is created by rebuild
+        self.origin = np.zeros(2, np.int64)
+        self.shape = np.ones(2, np.int64)
+        self.cell_ids = np.empty(0, np.int64)
+        self.order = np.empty(0, np.intp)
+        self.cells = np.empty((0, 2), np.int64)
+        self.local_cells = np.empty((0, 2), np.int64)
+        self.cell_start = np.zeros(1, np.intp)
+        self.cell_end = np.zeros(1, np.intp)
+        self.sorted_boids = []
+
         # Set the perception and calculate the field of view
         self.perception = perception
         self.field_of_view = field_of_view / 2  # Dividing by 2 for angle
 
-    def hash(self, point: Vector2) -> tuple:
+        # The cell offsets are only calculated when the perception changes,
+        # with the offsets of the keys and the list of the cells around a
+        # cell that get_cells_around reuses
+        self.offsets_perception = None
+        self.offsets = []
+        self.key_offsets = []
+        self.around = []
+
+    @property
+    def field_of_view(self) -> float:
+        return self._field_of_view
+
+    @field_of_view.setter
+    def field_of_view(self, field_of_view: float):
+        self._field_of_view = field_of_view
+
+        # A boid sees another boid when the cosine of the angle between
+        # them is at least fov_cos, -1 when it sees all around
+        self.fov_cos = math.cos(math.radians(min(max(field_of_view, 0), 180)))
+
+    def hash(self, point: Vector2):
         """Get the hash of a point
 
         Args:
             point (Vector2): the point to get the hash
 
         Returns:
-            tuple: the hash or the key at that point
+            int: the key of the cell at that point, x * num_rows + y
+        """
+        if self.wrap:
+            width, height = self.num_cells
+            x = int(point.x % self.world_size[0] // self.cell_width[0])
+            y = int(point.y % self.world_size[1] // self.cell_width[1])
+
+            return x % width * height + y % height
+
+        x = int(point.x // self.cell_size)
+        y = int(point.y // self.cell_size)
+
+        if self.storage == "dense":
+            width, height = self.num_cells
+            x = min(max(x, 0), width - 1)
+            y = min(max(y, 0), height - 1)
+
+        return x * self.num_rows + y
+
+    def key_cell(self, key: int) -> Tuple[int, int]:
+        """Get the x and y of the cell of a key
+
+        Args:
+            key (int): the key of the cell
+
+        Returns:
+            Tuple[int, int]: the x and y of the cell
+        """
+        # Cells with a negative y have a key in the row before
+        x, y = divmod(key + self.key_shift, self.num_rows)
+
+        return x, y - self.key_shift
+
+    def cell_offsets(self) -> List[Tuple[int, int]]:
+        """Get the offsets of all cells in the perception range
+
+        Returns:
+            List[Tuple[int, int]]: the offsets from the cell of a boid
         """
-        return point.x // self.cell_size, point.y // self.cell_size
+        if self.offsets_perception == self.perception:
+            return self.offsets
+
+        reach = range(1 - self.perception, self.perception)
+
+        if not self.wrap:
+            self.offsets = [(x, y) for x in reach for y in reach]
+        else:
+            # Cells that wrap onto the same cell are only visited once
+            xs = sorted({x % self.num_cells[0] for x in reach})
+            ys = sorted({y % self.num_cells[1] for y in reach})
+            self.offsets = [(x, y) for x in xs for y in ys]
+
+        self.key_offsets = [x * self.num_rows + y for x, y in self.offsets]
+        self.around = [EMPTY_CELL] * len(self.offsets)
+
+        self.offsets_perception = self.perception
+        return self.offsets
 
     def insert(self, boid: Boid, point: Vector2):
         """Insert the boid at a point
@@ -44,8 +205,7 @@ class SpatialHashGrid:
         point_hash = self.hash(point)
 
         # Add the boid to the point hash
-        self.grid.setdefault(point_hash, []).append(boid)
-        boid.hash = point_hash
+        self.add_to_cell(boid, point_hash)
 
     def delete(self, boid: Boid):
         """Delete a boid from a cell
@@ -54,12 +214,23 @@ class SpatialHashGrid:
             boid (Boid): the target boid
         """
         # Get all boids in the same hash
-        boids_in_hash = self.grid.get(boid.hash, [])
+        if self.storage == "dense":
+            boids_in_hash = (self.cells_list[boid.hash]
+                             if isinstance(boid.hash, int) else [])
+        else:
+            boids_in_hash = self.grid.get(boid.hash, [])
+
+        # If the boid is in the boid hash, swap it with the last boid and
+        # delete it, so no other boids have to shift
+        index = boid.cell_index
+        if 0 <= index < len(boids_in_hash) and boids_in_hash[index] is boid:
+            last = boids_in_hash.pop()
+            if last is not boid:
+                boids_in_hash[index] = last
+                last.cell_index = index
 
-        # If the boid is in the boid hash, delete it
-        if boid in boids_in_hash:
-            boids_in_hash.remove(boid)
             boid.hash = tuple
+            boid.cell_index = -1
 
     def move(self, boid: Boid, point: Vector2):
         """Move a boid from one cell to the other
@@ -68,42 +239,387 @@ class SpatialHashGrid:
             boid (Boid): the target boid
             point (Vector2): the point to move the boid to
         """
+        point_hash = self.hash(point)
+        self.moved += 1
+
+        # Most boids stay in the same cell, then nothing has to change
+        if point_hash == boid.hash:
+            return
+
         # Remove and insert the boid
+        self.migrated += 1
         self.delete(boid)
-        self.insert(boid, point)
+        self.add_to_cell(boid, point_hash)
+
+    def add_to_cell(self, boid: Boid, point_hash):
+        """Add a boid to the end of a cell and remember where it is
+
+        Args:
+            boid (Boid): the target boid
+            point_hash (int): the key of the cell
+        """
+        cell = self.cell_of(point_hash)
+        boid.cell_index = len(cell)
+        cell.append(boid)
+        boid.hash = point_hash
+
+    def cell_of(self, point_hash) -> List[Boid]:
+        """Get the list of a cell to add boids to
+
+        Args:
+            point_hash (int): the key of the cell
+
+        Returns:
+            List[Boid]: the boids in the cell
+        """
+        if self.storage == "dense":
+            return self.cells_list[point_hash]
+
+        # Not setdefault, that would create an empty list every time
+        cell = self.grid.get(point_hash)
+        if cell is None:
+            cell = self.grid[point_hash] = []
+
+        return cell
+
+    def reset_counters(self):
+        """Reset the number of moved and migrated boids
+        """
+        self.moved = 0
+        self.migrated = 0
+
+    def get_cells(self, positions: np.ndarray) -> np.ndarray:
+        """Get the cells of many points at once, like hash
+
+        Args:
+            positions (np.ndarray): the points
+
+        Returns:
+            np.ndarray: the x and y of the cell of every point
+        """
+        if self.wrap:
+            cells = np.floor_divide(np.mod(positions, self.world_size),
+                                    self.cell_width).astype(np.int64)
+            cells %= self.num_cells
+        else:
+            cells = np.floor_divide(positions,
+                                    self.cell_size).astype(np.int64)
+
+            # Dense grids put boids outside of the world in the closest cell
+            if self.storage == "dense":
+                np.clip(cells, 0, np.array(self.num_cells) - 1, out=cells)
+
+        return cells.reshape(-1, 2)
+
+    def insert_all(self, boids: List[Boid], positions: np.ndarray):
+        """Insert many boids at once, their cells are found in one go
+
+        Args:
+            boids (List[Boid]): the boids to insert
+            positions (np.ndarray): the points at which to insert the boids
+        """
+        cells = self.get_cells(positions)
+
+        hashes = (cells[:, 0] * self.num_rows + cells[:, 1]).tolist()
+
+        for boid, point_hash in zip(boids, hashes):
+            self.add_to_cell(boid, point_hash)
+
+    def clear(self):
+        """Remove all boids from the grid
+        """
+        self.grid.clear()
+
+        if self.storage == "dense":
+            for cell in self.cells_list:
+                cell.clear()
+
+    def rebuild(self, positions: np.ndarray, boids: List[Boid] = None):
+        """Rebuild the whole grid by sorting all boids by their cell
+
+        Args:
+            positions (np.ndarray): the positions of all boids
+            boids (List[Boid], optional): the boids at those positions.
+                Defaults to None.
+        """
+        reach = max(self.perception - 1, 0)
+        cells = self.get_cells(positions)
+
+        # Count the boids that changed cell since the last rebuild
+        self.moved = len(cells)
+        if cells.shape == self.cells.shape:
+            self.migrated = int((cells != self.cells).any(axis=1).sum())
+        else:
+            self.migrated = len(cells)
+        self.cells = cells
+
+        if self.wrap:
+            # The cells around every boid wrap around the world
+            self.origin = np.zeros(2, np.int64)
+            self.shape = np.array(self.num_cells, np.int64)
+        elif self.storage == "dense":
+            # The whole world with a margin so the cells around every boid
+            # are in the grid
+            self.origin = np.full(2, -reach, np.int64)
+            self.shape = np.array(self.num_cells, np.int64) + 2 * reach
+        elif len(cells):
+            # Add a margin so the cells around every boid are in the grid
+            self.origin = cells.min(axis=0) - reach
+            self.shape = cells.max(axis=0) - self.origin + reach + 1
+        else:
+            self.origin = np.zeros(2, np.int64)
+            self.shape = np.ones(2, np.int64)
+
+        local = cells - self.origin
+        self.local_cells = local
+        self.cell_ids = local[:, 0] * self.shape[1] + local[:, 1]
+
+        # Count the boids per cell and get the offsets of every cell
+        num_cells = self.shape[0] * self.shape[1]
+        counts = np.bincount(self.cell_ids, minlength=num_cells)
+
+        if self.storage == "dense":
+            # Reuse the arrays, they only change when the perception does
+            if len(self.cell_end) != num_cells:
+                self.cell_start = np.zeros(num_cells, np.intp)
+                self.cell_end = np.zeros(num_cells, np.intp)
+
+            np.cumsum(counts, out=self.cell_end)
+            np.subtract(self.cell_end, counts, out=self.cell_start)
+        else:
+            self.cell_end = np.cumsum(counts)
+            self.cell_start = self.cell_end - counts
+
+        # Sort the boids by their cell, stable so equal cells keep order
+        self.order = np.argsort(self.cell_ids, kind="stable")
+
+        if boids is not None:
+            self.sorted_boids = [boids[i] for i in self.order]
+
+            keys = (cells[:, 0] * self.num_rows + cells[:, 1]).tolist()
+            for boid, key in zip(boids, keys):
+                boid.hash = key
+
+    def get_cell(self, cell: int) -> List[Boid]:
+        """Get the boids in a cell
+
+        Args:
+            cell (int): the key of the cell
+
+        Returns:
+            List[Boid]: the boids in the cell
+        """
+        if self.mode == "incremental":
+            if self.storage == "dense":
+                return self.cells_list[cell]
+
+            return self.grid.get(cell, [])
+
+        return self.get_rebuilt_cell(*self.key_cell(cell))
+
+    def get_rebuilt_cell(self, x: int, y: int) -> List[Boid]:
+        """Get the boids in a cell of the rebuilt grid
+
+        Args:
+            x (int): the x of the cell
+            y (int): the y of the cell
+
+        Returns:
+            List[Boid]: the boids in the cell
+        """
+        x -= self.origin[0]
+        y -= self.origin[1]
+
+        # Cells outside of the rebuilt grid are empty
+        if not (0 <= x < self.shape[0] and 0 <= y < self.shape[1]):
+            return []
+
+        cell_id = x * self.shape[1] + y
+        return self.sorted_boids[
+            self.cell_start[cell_id]:self.cell_end[cell_id]
+        ]
+
+    def get_cells_around(self, cell) -> List[List[Boid]]:
+        """Get the boids of all cells in the perception range of a cell
+
+        The list is reused by the next call, so use it before calling this
+        again.
+
+        Args:
+            cell (int): the key of the cell
+
+        Returns:
+            List[List[Boid]]: the boids of every cell
+        """
+        if self.mode == "incremental" and self.storage == "dense":
+            # The lists of the cells never change, so the cells around
+            # every cell are only found once per perception
+            if self.around_perception != self.perception:
+                self.cells_around = [
+                    self.find_cells_around(cell_id)
+                    for cell_id in range(len(self.cells_list))
+                ]
+                self.around_perception = self.perception
+
+            return self.cells_around[cell]
+
+        offsets = self.cell_offsets()
+        cells = self.around
+
+        if self.mode == "incremental":
+            grid = self.grid
+
+            if not self.wrap:
+                # The keys around a cell are the key plus the key offsets
+                for i, key_offset in enumerate(self.key_offsets):
+                    cells[i] = grid.get(cell + key_offset, EMPTY_CELL)
+                return cells
+
+            width, height = self.num_cells
+            cell_x, cell_y = divmod(cell, height)
+            for i, (x, y) in enumerate(offsets):
+                cells[i] = grid.get(
+                    (cell_x + x) % width * height + (cell_y + y) % height,
+                    EMPTY_CELL
+                )
+            return cells
+
+        cell_x, cell_y = self.key_cell(cell)
+        for i, (x, y) in enumerate(offsets):
+            x += cell_x
+            y += cell_y
+
+            if self.wrap:
+                x %= self.num_cells[0]
+                y %= self.num_cells[1]
+
+            cells[i] = self.get_rebuilt_cell(x, y)
+
+        return cells
+
+    def find_cells_around(self, cell: int) -> List[List[Boid]]:
+        """Find the lists of all dense cells in the perception range of a cell
+
+        Args:
+            cell (int): the id of the cell
+
+        Returns:
+            List[List[Boid]]: the lists of the cells
+        """
+        width, height = self.num_cells
+        cell_x, cell_y = divmod(cell, height)
+        cells = []
+
+        for x, y in self.cell_offsets():
+            x += cell_x
+            y += cell_y
+
+            if self.wrap:
+                x %= width
+                y %= height
+            elif not (0 <= x < width and 0 <= y < height):
+                continue
+
+            cells.append(self.cells_list[x * height + y])
+
+        return cells
+
+    def max_occupancy(self) -> int:
+        """Get the number of boids in the fullest cell
+
+        Returns:
+            int: the most boids in one cell
+        """
+        if self.mode == "incremental":
+            cells = (self.cells_list if self.storage == "dense"
+                     else self.grid.values())
+            return max(map(len, cells), default=0)
+
+        return int((self.cell_end - self.cell_start).max())
+
+    def get_neighbours(
+        self, boid: Boid, radius: float = None,
+        out: Tuple[List[Boid], List[float], List[Boid]] = None
+    ) -> Tuple[List[Boid], List[float], List[Boid]]:
+        """Get boids close to a certain boid and their squared distances
+
+        Args:
+            boid (Boid): the target boid
+            radius (float, optional): the furthest distance of a close boid.
+                Defaults to None for all boids in the perception range.
+            out (Tuple[List[Boid], List[float], List[Boid]], optional):
+                lists to clear and fill instead of creating new lists.
+                Defaults to None.
+
+        Returns:
+            Tuple[List[Boid], List[float], List[Boid]]: the boids that are
+                close to the target, their squared distances to the target
+                and the close boids of the same type
+        """
+        if out is None:
+            out = [], [], []
+        boids, distances_sq, boids_of_type = out
+        boids.clear()
+        distances_sq.clear()
+        boids_of_type.clear()
+
+        radius_sq = None if radius is None else radius ** 2
+
+        # The offsets are calculated without creating vectors
+        pos_x, pos_y = boid.pos.x, boid.pos.y
+        dir_x, dir_y = boid.dir.x, boid.dir.y
+
+        # Compare the dot product with the cosine times both lengths, a boid
+        # that doesn't move sees all around
+        sees_all = self.fov_cos <= -1
+        threshold = self.fov_cos * math.sqrt(dir_x ** 2 + dir_y ** 2)
+        if self.wrap:
+            width, height = self.world_size
+
+        # Loop over all cells in the perception range
+        for boids_in_cell in self.get_cells_around(boid.hash):
+            for other in boids_in_cell:  # Loop over all boids in cell
+                if other is not boid:
+                    offset_x = other.pos.x - pos_x
+                    offset_y = other.pos.y - pos_y
+                    if self.wrap:
+                        offset_x -= width * round(offset_x / width)
+                        offset_y -= height * round(offset_y / height)
+                    dist_sq = offset_x ** 2 + offset_y ** 2
+
+                    # Skip boids that are too far before the angle
+                    if radius_sq is not None and dist_sq > radius_sq:
+                        continue
+
+                    # Test if other is in boid's field of view
+                    if (not sees_all and
+                            offset_x * dir_x + offset_y * dir_y <
+                            threshold * math.sqrt(dist_sq)):
+                        continue
+
+                    # Add other to close boids
+                    boids.append(other)
+                    distances_sq.append(dist_sq)
+
+                    # Add other if it is the same type
+                    if other.type == boid.type:
+                        boids_of_type.append(other)
+
+        return boids, distances_sq, boids_of_type
 
     def get_boids(
-        self, boid: Boid
+        self, boid: Boid, radius: float = None
     ) -> Tuple[List[Boid], List[Boid]]:
         """Get boids close to a certain boid
 
         Args:
             boid (Boid): the target boid
+            radius (float, optional): the furthest distance of a close boid.
+                Defaults to None for all boids in the perception range.
 
         Returns:
             List[Boid]: the boids that are close to the target
         """
-        boids = []
-        boids_of_type = []
-
-        # Loop over all cells in the perception range
-        for x in range(1 - self.perception, self.perception):
-            for y in range(1 - self.perception, self.perception):
-                # Get boids in the current cell
-                boids_in_cell = self.grid.get((boid.hash[0] + x,
-                                               boid.hash[1] + y), [])
-
-                for other in boids_in_cell:  # Loop over all boids in cell
-                    if other != boid:
-                        angle = abs(boid.dir.angle_to(other.pos - boid.pos))
-
-                        # Test if other is in boid's field of view
-                        if angle <= self.field_of_view:
-                            # Add other to close boids
-                            boids.append(other)
-
-                            # Add other if it is the same type
-                            if other.type == boid.type:
-                                boids_of_type.append(other)
+        boids, _, boids_of_type = self.get_neighbours(boid, radius)
 
         return boids, boids_of_type
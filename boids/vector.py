@@ -0,0 +1,124 @@
+import math
+
+
+class Vector2:
+    """A 2D vector that works like pygame's Vector2 without needing pygame
+    """
+    __slots__ = ("x", "y")
+
+    # Vectors closer than this are equal, like pygame's Vector2
+    epsilon = 1e-6
+
+    def __init__(self, x=0.0, y=None):
+        """The initialize method
+
+        Args:
+            x (float, optional): the x coordinate or a pair of coordinates.
+                Defaults to 0.0.
+            y (float, optional): the y coordinate. Defaults to None.
+        """
+        if y is None:
+            if isinstance(x, (int, float)):
+                y = x
+            else:
+                x, y = x
+
+        self.x = float(x)
+        self.y = float(y)
+
+    def __repr__(self) -> str:
+        return f"Vector2({self.x}, {self.y})"
+
+    def __iter__(self):
+        yield self.x
+        yield self.y
+
+    def __len__(self) -> int:
+        return 2
+
+    def __getitem__(self, index: int) -> float:
+        return (self.x, self.y)[index]
+
+    def __eq__(self, other) -> bool:
+        try:
+            x, y = other
+        except (TypeError, ValueError):
+            return NotImplemented
+
+        return (abs(self.x - x) < self.epsilon and
+                abs(self.y - y) < self.epsilon)
+
+    def __ne__(self, other) -> bool:
+        equal = self.__eq__(other)
+        return equal if equal is NotImplemented else not equal
+
+    __hash__ = None
+
+    def __neg__(self) -> "Vector2":
+        return Vector2(-self.x, -self.y)
+
+    def __add__(self, other: "Vector2") -> "Vector2":
+        return Vector2(self.x + other.x, self.y + other.y)
+
+    def __sub__(self, other: "Vector2") -> "Vector2":
+        return Vector2(self.x - other.x, self.y - other.y)
+
+    def __mul__(self, scalar: float) -> "Vector2":
+        return Vector2(self.x * scalar, self.y * scalar)
+
+    __rmul__ = __mul__
+
+    def __truediv__(self, scalar: float) -> "Vector2":
+        return Vector2(self.x / scalar, self.y / scalar)
+
+    def __iadd__(self, other: "Vector2") -> "Vector2":
+        self.x += other.x
+        self.y += other.y
+        return self
+
+    def __isub__(self, other: "Vector2") -> "Vector2":
+        self.x -= other.x
+        self.y -= other.y
+        return self
+
+    def __imul__(self, scalar: float) -> "Vector2":
+        self.x *= scalar
+        self.y *= scalar
+        return self
+
+    def __itruediv__(self, scalar: float) -> "Vector2":
+        self.x /= scalar
+        self.y /= scalar
+        return self
+
+    def length(self) -> float:
+        """Get the length of the vector
+
+        Returns:
+            float: the length
+        """
+        return math.hypot(self.x, self.y)
+
+    def distance_to(self, other: "Vector2") -> float:
+        """Get the distance to another vector
+
+        Args:
+            other (Vector2): the other vector
+
+        Returns:
+            float: the distance
+        """
+        return math.hypot(self.x - other.x, self.y - other.y)
+
+    def angle_to(self, other: "Vector2") -> float:
+        """Get the angle to another vector in degrees, like pygame's Vector2
+
+        Args:
+            other (Vector2): the other vector
+
+        Returns:
+            float: the angle from this vector to the other vector
+        """
+        return math.degrees(
+            math.atan2(other.y, other.x) - math.atan2(self.y, self.x)
+        )
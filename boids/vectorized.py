@@ -0,0 +1,321 @@
+from typing import Tuple
+import numpy as np
+
+
+def cell_pairs(indices: np.ndarray, first: np.ndarray, counts: np.ndarray,
+               order: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Expand every index into one pair per boid in its target cell
+
+    Args:
+        indices (np.ndarray): the point of every target cell
+        first (np.ndarray): where every target cell starts in the order
+        counts (np.ndarray): the number of boids in every target cell
+        order (np.ndarray): the boids of the grid sorted by their cell
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: the point and boid indices
+    """
+    total = counts.sum()
+    run_starts = np.repeat(first - (np.cumsum(counts) - counts), counts)
+
+    return np.repeat(indices, counts), order[run_starts + np.arange(total)]
+
+
+def neighbour_pairs(grid, start: int = 0,
+                    stop: int = None) -> Tuple[np.ndarray, np.ndarray]:
+    """Get all pairs of boids that are in nearby cells of a rebuilt grid
+
+    Args:
+        grid (SpatialHashGrid): the grid after rebuilding it
+        start (int, optional): the first boid. Defaults to 0.
+        stop (int, optional): the boid after the last boid.
+            Defaults to None for all boids.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: the boid and neighbour indices
+    """
+    cells = grid.local_cells[start:stop]
+    num_boids = len(cells)
+    cell_offsets = grid.cell_offsets()
+
+    if num_boids == 0 or not cell_offsets:
+        return np.empty(0, np.intp), np.empty(0, np.intp)
+
+    all_boids = []
+    all_others = []
+    width, height = grid.shape
+    indices = np.arange(start, start + num_boids)
+
+    # Loop over all cells in the perception range
+    for x, y in cell_offsets:
+        # The cells only wrap when the world wraps, otherwise the grid
+        # has a margin around all boids
+        target = ((cells[:, 0] + x) % width * height +
+                  (cells[:, 1] + y) % height)
+        first = grid.cell_start[target]
+
+        boids, others = cell_pairs(indices, first,
+                                   grid.cell_end[target] - first, grid.order)
+        all_boids.append(boids)
+        all_others.append(others)
+
+    boids = np.concatenate(all_boids)
+    others = np.concatenate(all_others)
+
+    # A boid is not its own neighbour
+    not_self = boids != others
+    return boids[not_self], others[not_self]
+
+
+def query_pairs(grid, positions: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Get all pairs of points and the boids in nearby cells of a rebuilt
+    grid, the points don't have to be in the grid
+
+    Args:
+        grid (SpatialHashGrid): the grid after rebuilding it
+        positions (np.ndarray): the points to look around
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: the point and boid indices
+    """
+    cell_offsets = grid.cell_offsets()
+    if len(positions) == 0 or not cell_offsets or not len(grid.order):
+        return np.empty(0, np.intp), np.empty(0, np.intp)
+
+    cells = grid.get_cells(positions) - grid.origin
+    width, height = grid.shape
+    indices = np.arange(len(positions))
+
+    all_points = []
+    all_boids = []
+
+    for x, y in cell_offsets:
+        target_x = cells[:, 0] + x
+        target_y = cells[:, 1] + y
+
+        # Points can be far outside of the grid when it doesn't wrap
+        if grid.wrap:
+            target_x %= width
+            target_y %= height
+            inside = indices
+        else:
+            inside = np.flatnonzero((target_x >= 0) & (target_x < width) &
+                                    (target_y >= 0) & (target_y < height))
+
+        target = target_x[inside] * height + target_y[inside]
+        first = grid.cell_start[target]
+
+        points, boids = cell_pairs(inside, first,
+                                   grid.cell_end[target] - first, grid.order)
+        all_points.append(points)
+        all_boids.append(boids)
+
+    return np.concatenate(all_points), np.concatenate(all_boids)
+
+
+def neighbour_offsets(
+    positions: np.ndarray, boids: np.ndarray, others: np.ndarray,
+    world_size: tuple = None
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Get the offsets and squared distances from boids to their neighbours
+
+    Args:
+        positions (np.ndarray): the positions of all boids
+        boids (np.ndarray): the boid index of every pair
+        others (np.ndarray): the neighbour index of every pair
+        world_size (tuple, optional): the size of the world to wrap the
+            offsets around. Defaults to None to not wrap.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: the offsets and squared distances
+    """
+    offsets = positions[others] - positions[boids]
+
+    # Use the shortest offset around the world
+    if world_size is not None:
+        world_size = np.asarray(world_size)
+        offsets -= world_size * np.round(offsets / world_size)
+    distances_sq = offsets[:, 0] ** 2 + offsets[:, 1] ** 2
+
+    return offsets, distances_sq
+
+
+def field_of_view_mask(offsets: np.ndarray, directions: np.ndarray,
+                       distances_sq: np.ndarray,
+                       fov_cos: float) -> np.ndarray:
+    """Test which neighbours are in the field of view of their boid
+
+    Args:
+        offsets (np.ndarray): the offset from the boid to the neighbour
+        directions (np.ndarray): the direction of the boid of every pair
+        distances_sq (np.ndarray): the squared length of every offset
+        fov_cos (float): the cosine of half of the boid's field of view
+
+    Returns:
+        np.ndarray: whether each neighbour is visible, boids that don't
+            move see all around
+    """
+    if fov_cos <= -1:
+        return np.ones(len(offsets), bool)
+
+    # The cosine of the angle times both lengths, without any angles
+    dots = offsets[:, 0] * directions[:, 0] + offsets[:, 1] * directions[:, 1]
+    lengths = np.sqrt(
+        distances_sq *
+        (directions[:, 0] ** 2 + directions[:, 1] ** 2)
+    )
+
+    return dots >= fov_cos * lengths
+
+
+def sum_by_boid(boids: np.ndarray, values: np.ndarray,
+                num_boids: int) -> np.ndarray:
+    """Add up a vector of every pair for every boid
+
+    Args:
+        boids (np.ndarray): the boid index of every pair, from 0
+        values (np.ndarray): the vector of every pair
+        num_boids (int): the number of boids
+
+    Returns:
+        np.ndarray: the sum of the vectors of every boid
+    """
+    return np.stack([
+        np.bincount(boids, values[:, 0], num_boids),
+        np.bincount(boids, values[:, 1], num_boids)
+    ], axis=1)
+
+
+def seperation(new_dirs: np.ndarray, boids: np.ndarray,
+               offsets: np.ndarray, distances_sq: np.ndarray,
+               same_type: np.ndarray, avoid_dist: float,
+               other_avoid_dist: float, other_avoid_mult: float,
+               factor: float):
+    """Move a range of boids away from all close boids
+
+    Args:
+        new_dirs (np.ndarray): the new directions of the range to change
+        boids (np.ndarray): the boid index of every visible pair, from the
+            start of the range
+        offsets (np.ndarray): the offset from the boid to the neighbour
+        distances_sq (np.ndarray): the squared distance of every pair
+        same_type (np.ndarray): whether both boids have the same type
+        avoid_dist (float): distance to keep between boids
+        other_avoid_dist (float): distance to keep between other types
+        other_avoid_mult (float): multiplier of avoiding other types
+        factor (float): the factor of seperation
+    """
+    # Other types are avoided more strongly
+    weight = np.where(
+        same_type,
+        distances_sq <= avoid_dist ** 2,
+        (distances_sq <= other_avoid_dist ** 2) * (other_avoid_mult + 1)
+    )
+    avoid = -sum_by_boid(boids, offsets * weight[:, None], len(new_dirs))
+
+    new_dirs += avoid * factor
+
+
+def alignment(new_dirs: np.ndarray, directions: np.ndarray,
+              boids: np.ndarray, others: np.ndarray, counts: np.ndarray,
+              factor: float):
+    """Align a range of boids with the average direction of their pairs
+
+    Args:
+        new_dirs (np.ndarray): the new directions of the range to change
+        directions (np.ndarray): the directions of all boids
+        boids (np.ndarray): the boid index of every pair, from the start
+            of the range
+        others (np.ndarray): the neighbour index of every pair
+        counts (np.ndarray): the number of pairs of every boid
+        factor (float): the factor of alignment
+    """
+    has_pairs = counts > 0
+    avg_dir = sum_by_boid(boids, directions[others], len(new_dirs)) / \
+        np.maximum(counts, 1)[:, None]
+
+    new_dirs[has_pairs] += (avg_dir - new_dirs)[has_pairs] * factor
+
+
+def cohesion(new_dirs: np.ndarray, boids: np.ndarray, offsets: np.ndarray,
+             counts: np.ndarray, factor: float):
+    """Move a range of boids to the center of mass of their pairs
+
+    Args:
+        new_dirs (np.ndarray): the new directions of the range to change
+        boids (np.ndarray): the boid index of every pair, from the start
+            of the range
+        offsets (np.ndarray): the offset from the boid to the neighbour
+        counts (np.ndarray): the number of pairs of every boid
+        factor (float): the factor of cohesion
+    """
+    has_pairs = counts > 0
+
+    # The center of mass seen from the boid, so it works around the world
+    to_center = sum_by_boid(boids, offsets, len(new_dirs)) / \
+        np.maximum(counts, 1)[:, None]
+
+    new_dirs[has_pairs] += to_center[has_pairs] * factor
+
+
+def keep_in_bounds_loop(positions: np.ndarray, world_size: np.ndarray):
+    """Keep all boids in bounds by looping
+
+    Args:
+        positions (np.ndarray): the positions of all boids
+        world_size (np.ndarray): the size of the world
+    """
+    for axis in range(2):
+        coords = positions[:, axis]
+        size = world_size[axis]
+
+        coords[coords > size] = 0
+        coords[coords < 0] = size
+
+
+def keep_in_bounds_turn(positions: np.ndarray, directions: np.ndarray,
+                        world_size: np.ndarray,
+                        turn_margin: float, turn_factor: float):
+    """Keep all boids in bounds by turning
+
+    Args:
+        positions (np.ndarray): the positions of all boids
+        directions (np.ndarray): the directions of all boids
+        world_size (np.ndarray): the size of the world
+        turn_margin (float): margin when the boids need to turn
+        turn_factor (float): how much to turn when in the turn margin
+    """
+    directions[positions < turn_margin] += turn_factor
+    directions[positions > world_size - turn_margin] -= turn_factor
+
+
+def avoid_obstacles(positions: np.ndarray, directions: np.ndarray, field,
+                    turn_margin: float, turn_factor: float):
+    """Turn all boids away from the obstacles within the turn margin
+
+    Args:
+        positions (np.ndarray): the positions of all boids
+        directions (np.ndarray): the directions of all boids
+        field (ObstacleField): the baked obstacles
+        turn_margin (float): margin when the boids need to turn
+        turn_factor (float): how much to turn when in the turn margin
+    """
+    # Only the gradients of the boids near an obstacle are looked up
+    cells = field.cells(positions)
+    near = np.flatnonzero(field.flat_distances[cells] < turn_margin)
+
+    directions[near] += field.flat_gradients[cells[near]] * turn_factor
+
+
+def limit_speed(directions: np.ndarray, max_speed: float):
+    """Limit the speed of all boids
+
+    Args:
+        directions (np.ndarray): the directions of all boids
+        max_speed (float): the maximum speed
+    """
+    speed = np.hypot(directions[:, 0], directions[:, 1])
+    too_fast = speed > max_speed
+
+    directions[too_fast] = \
+        (directions[too_fast] / speed[too_fast, None]) * max_speed
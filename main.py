@@ -1,17 +1,20 @@
+import argparse
+import numpy as np
 import pygame
 
-from boids import Flock
+from boids import Flock, TrajectoryReader
+from boids.config import DEFAULT_CONFIG, load_config
+from boids.loop import SimulationLoop
+from boids.obstacles import Circle
+from boids.replay import Replay
 
 # ---------- VARIABLES ----------
-# Set the canvas and bounds
-world_size = width, height = (1000, 1000)
-
 # Background color
 BG_COLOR = pygame.Color(0, 26, 51)
 
 # Boid settings
 BOID_SIZE = 5
-num_types = 2
+num_types = DEFAULT_CONFIG["num_types"]
 
 # Line settings/colors
 LINE_COLOR = pygame.Color(0, 0, 0)
@@ -20,75 +23,234 @@ LINE_LENGTH = 1.5
 # Cell color
 CELL_COLOR = pygame.Color(0, 77, 0)
 
-# Initialize display
-SCREEN = pygame.display.set_mode(world_size)
-CLOCK = pygame.time.Clock()
+# Obstacle color
+OBSTACLE_COLOR = pygame.Color(90, 90, 110)
+
+# The display is only created when the simulation is shown
+SCREEN = None
+CLOCK = None
+RENDERER = None
+
+
+def init_display(world_size: tuple, cell_size: int,
+                 render_mode: str = "sprites", boid_size: int = BOID_SIZE,
+                 show_directions: bool = True):
+    """Initialize pygame and create the display
 
-cell_size = int((world_size[0] + world_size[1]) / 20)
+    Args:
+        world_size (tuple): the size of the world the display shows
+        cell_size (int): the size of the cells drawn on the background
+        render_mode (str, optional): how the boids are drawn, "sprites" or
+            "pixels". Defaults to "sprites".
+        boid_size (int, optional): the radius of the boids.
+            Defaults to BOID_SIZE.
+        show_directions (bool, optional): draw the directions of the boids.
+            Defaults to True.
+    """
+    global SCREEN, CLOCK, RENDERER
+
+    pygame.init()
+    SCREEN = pygame.display.set_mode([int(size) for size in world_size])
+    CLOCK = pygame.time.Clock()
+    RENDERER = Renderer(SCREEN, render_mode, boid_size, show_directions,
+                        cell_size)
 
 
 # ---------- DRAW ----------
-def draw(flock):
-    """Draw everything to the screen
+RENDER_MODES = ("sprites", "pixels")
+
+
+class Renderer:
+    """Draw boids from their arrays without drawing shapes per boid
+
+    The background and the cells are drawn once on a surface. In the
+    "sprites" mode every type of boid has a pre-rendered circle that is
+    blitted in one call, in the "pixels" mode the boids are written
+    straight into the pixels of the screen with array operations. The
+    directions are always written into the pixels.
     """
-    SCREEN.fill(BG_COLOR)
 
-    # Draw boids
-    for boid in flock.boids:
-        pos = tuple(boid.pos)
-        next_pos = tuple(boid.pos + boid.dir * LINE_LENGTH)
+    def __init__(self, screen: pygame.Surface, mode: str = "sprites",
+                 boid_size: int = BOID_SIZE, show_directions: bool = True,
+                 cell_size: int = DEFAULT_CONFIG["cell_size"]):
+        """The initialize method
+
+        Args:
+            screen (pygame.Surface): the surface to draw on
+            mode (str, optional): "sprites" or "pixels".
+                Defaults to "sprites".
+            boid_size (int, optional): the radius of the boids.
+                Defaults to BOID_SIZE.
+            show_directions (bool, optional): draw a line in the direction
+                of every boid. Defaults to True.
+            cell_size (int, optional): the size of the cells drawn on the
+                background. Defaults to the cell size of DEFAULT_CONFIG.
+        """
+        if mode not in RENDER_MODES:
+            raise ValueError(f"Unknown render mode {mode!r}, "
+                             f"use {RENDER_MODES}")
+
+        self.screen = screen
+        self.mode = mode
+        self.boid_size = boid_size
+        self.show_directions = show_directions
+
+        # Draw the background and the cells once
+        self.background = pygame.Surface(screen.get_size()).convert()
+        self.background.fill(BG_COLOR)
+        screen_width, screen_height = screen.get_size()
+        cell_size = max(int(cell_size), 1)
+        for x in range(0, screen_width, cell_size):
+            pygame.draw.line(self.background, CELL_COLOR,
+                             (x, 0), (x, screen_height))
+        for y in range(0, screen_height, cell_size):
+            pygame.draw.line(self.background, CELL_COLOR,
+                             (0, y), (screen_width, y))
+
+        # The pixels covered by a boid around its center
+        xs, ys = np.mgrid[-boid_size:boid_size + 1, -boid_size:boid_size + 1]
+        inside = xs ** 2 + ys ** 2 <= boid_size ** 2
+        self.disc = np.stack((xs[inside], ys[inside]), axis=1)
+
+        self.colors = None
+        self.sprites = []
+
+    def draw_obstacles(self, obstacles: list):
+        """Draw obstacles on the background once
+
+        Args:
+            obstacles (list): the circles and polygons of the flock
+        """
+        for obstacle in obstacles:
+            if isinstance(obstacle, Circle):
+                pygame.draw.circle(self.background, OBSTACLE_COLOR,
+                                   obstacle.center, obstacle.radius)
+            else:
+                pygame.draw.polygon(self.background, OBSTACLE_COLOR,
+                                    obstacle.points.tolist())
+
+    def create_sprites(self, colors: list):
+        """Render a circle for every type of boid
+
+        Args:
+            colors (list): the color of every type
+        """
+        size = self.boid_size * 2 + 1
+        self.sprites = []
+
+        for color in colors:
+            sprite = pygame.Surface((size, size)).convert()
+            sprite.fill(BG_COLOR)
+            pygame.draw.circle(sprite, color, (self.boid_size,) * 2,
+                               self.boid_size)
+            sprite.set_colorkey(BG_COLOR, pygame.RLEACCEL)
+            self.sprites.append(sprite)
+
+        self.colors = list(colors)
+
+    def draw(self, positions: np.ndarray, directions: np.ndarray,
+             types: np.ndarray, colors: list):
+        """Draw boids on the background
+
+        Args:
+            positions (np.ndarray): the positions of the boids
+            directions (np.ndarray): the directions of the boids, None to
+                not draw them
+            types (np.ndarray): the types of the boids
+            colors (list): the color of every type
+        """
+        self.screen.blit(self.background, (0, 0))
+
+        if self.mode == "sprites":
+            if self.colors != list(colors):
+                self.create_sprites(colors)
+
+            sprites = self.sprites
+            corners = (positions - self.boid_size).tolist()
+            self.screen.blits(
+                [(sprites[type_], corner)
+                 for type_, corner in zip(types.tolist(), corners)],
+                False
+            )
+
+        # The pixels as one mapped color per pixel
+        pixels = pygame.surfarray.pixels2d(self.screen)
+
+        if self.mode == "pixels":
+            mapped = np.array([self.screen.map_rgb(color)
+                               for color in colors], pixels.dtype)
+            centers = np.rint(positions).astype(np.int64)
+
+            # Only boids with a chance to be on the screen
+            size = self.boid_size
+            near = ((centers >= -size) &
+                    (centers < np.add(pixels.shape, size))).all(axis=1)
+            centers = centers[near]
+
+            for x, y in self.disc.tolist():
+                self.plot(pixels, centers[:, 0] + x, centers[:, 1] + y,
+                          mapped[types[near]])
 
-        pygame.draw.circle(SCREEN, boid.color, pos, BOID_SIZE)
-        pygame.draw.line(SCREEN, LINE_COLOR, pos, next_pos)
+        if directions is not None and self.show_directions:
+            # Points along the line from every boid to where it's going
+            ends = directions * LINE_LENGTH
+            steps = int(np.ceil(np.abs(ends).max(initial=0))) + 1
+            line_color = self.screen.map_rgb(LINE_COLOR)
 
-    # Draw cells
-    for y in range(0, width, cell_size):
-        pygame.draw.line(SCREEN, CELL_COLOR,
-                         (y, 0), (y, width))
+            for along in np.linspace(0, 1, steps).tolist():
+                points = np.rint(positions + ends * along).astype(np.int64)
+                self.plot(pixels, points[:, 0], points[:, 1], line_color)
 
-    for x in range(0, width, cell_size):
-        pygame.draw.line(SCREEN, CELL_COLOR,
-                         (0, x), (width, x))
+        # Unlock the screen
+        del pixels
 
+    @staticmethod
+    def plot(pixels: np.ndarray, xs: np.ndarray, ys: np.ndarray, colors):
+        """Set the pixels at points that are on the screen
 
-def get_flock():
+        Args:
+            pixels (np.ndarray): the mapped colors of the screen
+            xs (np.ndarray): the x of every point
+            ys (np.ndarray): the y of every point
+            colors: the mapped color of every point or one mapped color
+        """
+        on_screen = ((xs >= 0) & (xs < pixels.shape[0]) &
+                     (ys >= 0) & (ys < pixels.shape[1]))
+        if np.ndim(colors):
+            colors = colors[on_screen]
+
+        pixels[xs[on_screen], ys[on_screen]] = colors
+
+
+def get_flock(config: str = None):
     """The main function
-    """
-    pygame.init()
 
+    Args:
+        config (str, optional): a JSON file with the settings to change,
+            like obstacles. Defaults to None.
+    """
     # Return the flock
-    return Flock(
-        num_boids=150,
-        num_types=num_types,
-        world_size=world_size,
-        cell_size=cell_size,
-        max_speed=15,
-        perception=2,
-        field_of_view=270,
-        avoid_dist=20,
-        other_avoid_mult=1.5,
-        other_avoid_dist=40,
-        alignment_factor=0.05,
-        cohesion_factor=0.005,
-        seperation_factor=0.05,
-        turn_margin=100,
-        turn_factor=1.5,
-        loop_bounds=True
-    )
-
-
-def run(flock: Flock):
+    return Flock(**load_config(config))
+
+
+def run(flock: Flock, sim_rate: float = 30, render_rate: float = 60):
     """Run the simulation
 
+    The flock is updated on a thread at the simulation rate and the screen
+    shows the boids between the last two updates at the render rate.
+
     Args:
-        inputs (dict): the inputs to render and use
         flock (Flock): the flock to simulate
+        sim_rate (float, optional): updates per second. Defaults to 30.
+        render_rate (float, optional): frames per second. Defaults to 60.
     """
+    loop = SimulationLoop(flock, sim_rate)
+    loop.start()
 
     running = True
     while running:
-        # Let the program run at 30 fps
-        CLOCK.tick(30)
+        # Let the program run at the render rate
+        CLOCK.tick(render_rate)
 
         # Check for events
         for e in pygame.event.get():
@@ -97,25 +259,106 @@ def run(flock: Flock):
             elif e.type == pygame.KEYDOWN and e.key == pygame.K_ESCAPE:
                 running = False
 
-        # Update boids
-        flock.update_boids()
-
-        # Draw everything
-        draw(flock)
+        # Draw the boids between the last two updates
+        state = loop.interpolate()
+        RENDERER.draw(state["positions"], state["directions"],
+                      state["types"], flock.type_colors)
         pygame.display.update()
 
+    loop.stop()
 
-def reset(flock: Flock):
-    """Reset the boids
+
+def replay(path: str):
+    """Play a recorded trajectory
+
+    Space pauses, left and right seek a second, up and down change the
+    speed, backspace plays backwards and home goes to the start.
 
     Args:
-        flock (Flock): the flock of boids to reset
+        path (str): the trajectory file to play
     """
-    flock.reset_boids(len(flock.boids), num_types)
+    playback = Replay(TrajectoryReader(path))
+    if playback.frame() is None:
+        print(f"{path} has no frames yet")
+        playback.close()
+        return
+
+    # The colors of the types like the flock that recorded the trajectory
+    types_count = max(int(playback.frame().types.max(initial=0)) + 1,
+                      num_types)
+    colors = [Flock.create_color(type_, 360 / types_count)
+              for type_ in range(types_count)]
+
+    running = True
+    while running:
+        CLOCK.tick(30)
+
+        for e in pygame.event.get():
+            if e.type == pygame.QUIT:
+                running = False
+            elif e.type != pygame.KEYDOWN:
+                continue
+            elif e.key == pygame.K_ESCAPE:
+                running = False
+            elif e.key == pygame.K_SPACE:
+                playback.toggle_pause()
+            elif e.key == pygame.K_RIGHT:
+                playback.seek(playback.index + 30)
+            elif e.key == pygame.K_LEFT:
+                playback.seek(playback.index - 30)
+            elif e.key == pygame.K_UP:
+                playback.speed *= 2
+            elif e.key == pygame.K_DOWN:
+                playback.speed /= 2
+            elif e.key == pygame.K_BACKSPACE:
+                playback.speed = -playback.speed
+            elif e.key == pygame.K_HOME:
+                playback.seek(0)
+
+        frame = playback.frame()
+        RENDERER.draw(frame.positions, frame.directions, frame.types,
+                      colors)
+        pygame.display.set_caption(
+            f"Tick {frame.tick}, speed {playback.speed:g}x"
+            f"{' (paused)' if playback.paused else ''}"
+        )
+        pygame.display.update()
+
+        playback.step()
+
+    playback.close()
 
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Show the boids")
+    parser.add_argument("--replay",
+                        help="play a trajectory recorded with boids.run")
+    parser.add_argument("--render", choices=RENDER_MODES, default="sprites",
+                        help="draw boids as sprites or straight to pixels")
+    parser.add_argument("--boid-size", type=int, default=BOID_SIZE,
+                        help="the radius of the boids in pixels")
+    parser.add_argument("--no-directions", action="store_true",
+                        help="don't draw the directions of the boids")
+    parser.add_argument("--sim-hz", type=float, default=30,
+                        help="the number of updates per second")
+    parser.add_argument("--render-hz", type=float, default=60,
+                        help="the number of frames per second")
+    parser.add_argument("--config",
+                        help="a JSON file with the settings of the flock")
+    args = parser.parse_args()
+
     # ---------- SETUP ----------
-    flock = get_flock()
-    # ---------- LOOP ----------
-    run(flock)
+    display = (args.render, args.boid_size, not args.no_directions)
+    if args.replay is not None:
+        # A trajectory has no settings, the config has the world
+        config = load_config(args.config)
+        init_display(config["world_size"], config["cell_size"], *display)
+        replay(args.replay)
+    else:
+        # The display shows the world of the flock
+        flock = get_flock(args.config)
+        init_display(tuple(flock.world_size),
+                     flock.spatial_hash_grid.cell_size, *display)
+        RENDERER.draw_obstacles(flock.obstacles)
+        # ---------- LOOP ----------
+        run(flock, args.sim_hz, args.render_hz)
@@ -0,0 +1,90 @@
+import numpy as np
+import pytest
+
+from boids import Flock, SpatialHashGrid
+from boids.config import load_config
+from boids.agents import Predators, Attractors
+from boids.rules import default_rules
+from boids.vectorized import query_pairs
+
+
+def create_flock(engine: str, agents, **overrides) -> Flock:
+    config = load_config(num_boids=0, world_size=(300, 300), cell_size=30,
+                         perception_radius=40, alignment_factor=0,
+                         cohesion_factor=0)
+    config.update(overrides)
+
+    return Flock(**config, engine=engine, rules=default_rules() + [agents])
+
+
+@pytest.mark.parametrize("wrap", [True, False])
+def test_query_pairs(wrap):
+    rng = np.random.default_rng(2)
+    grid = SpatialHashGrid(50, 2, 360, "rebuild", (300, 300), wrap)
+    positions = rng.uniform(0, 300, (200, 2))
+    grid.rebuild(positions)
+
+    # Some points are outside of the world
+    points = rng.uniform(-100, 400, (50, 2))
+    found = set(zip(*map(np.ndarray.tolist, query_pairs(grid, points))))
+
+    cells = grid.get_cells(points)
+    boid_cells = grid.get_cells(positions)
+    for point, cell in enumerate(cells):
+        offsets = np.abs(boid_cells - cell)
+        if wrap:
+            offsets = np.minimum(offsets, np.array(grid.shape) - offsets)
+
+        for boid in np.flatnonzero((offsets <= 1).all(axis=1)):
+            assert (point, boid) in found
+
+
+@pytest.mark.parametrize("engine", ["numpy", "numba"])
+def test_flee_and_seek(engine):
+    predators = Predators([(150, 150)], max_speed=0)
+    attractors = Attractors([(150, 150)])
+
+    for agents, sign in ((predators, 1), (attractors, -1)):
+        flock = create_flock(engine, agents)
+        flock.add_boids(np.array([[200.0, 150.0], [150.0, 270.0]]),
+                        np.zeros((2, 2)), np.zeros(2, int))
+        flock.update_boids()
+
+        # Only the close boid reacts, by half the factor at half the radius
+        assert np.allclose(flock.directions, [[sign * 0.25, 0], [0, 0]])
+
+
+def test_agents_across_seam():
+    # The radius doesn't divide the world size
+    attractors = Attractors([(20, 500)], radius=150)
+    flock = create_flock("numpy", attractors, world_size=(1000, 1000))
+    flock.add_boids(np.array([[880.0, 500.0]]), np.zeros((1, 2)),
+                    np.zeros(1, int))
+    flock.update_boids()
+
+    # The boid is 140 away around the world, so it steers to the right
+    assert flock.directions[0, 0] > 0 and flock.directions[0, 1] == 0
+
+
+def test_predators_chase():
+    predators = Predators([(120, 150)], [(0, 0)], max_speed=5,
+                          chase_factor=0.5)
+    flock = create_flock("numpy", predators)
+    flock.add_boids(np.array([[150.0, 150.0]]), np.zeros((1, 2)),
+                    np.zeros(1, int))
+
+    flock.update_boids()
+    assert np.allclose(predators.positions, [[125, 150]])
+
+    # Predators move around a looping world like the boids
+    predators.positions[:] = (298, 150)
+    predators.directions[:] = (5, 0)
+    predators.chase_factor = 0
+    for _ in range(2):
+        flock.update_boids()
+    assert np.allclose(predators.positions, [[5, 150]])
+
+
+def test_object_engine_agents():
+    with pytest.raises(ValueError):
+        create_flock("object", Attractors([(0, 0)]))
@@ -0,0 +1,96 @@
+import json
+
+from boids import SpatialHashGrid
+from boids.benchmark import (run_benchmarks, compare, main, create_flock,
+                             benchmark_grid)
+
+
+def test_run_benchmarks():
+    results = run_benchmarks(counts=[50], grid_settings=[(100, 2)],
+                             repeat=1)
+
+    names = {(result["benchmark"], result["engine"])
+             for result in results["results"]}
+    assert ("update_boids", "object") in names
+    assert ("update_boids", "numpy") in names
+    assert ("get_boids", "object") in names
+    assert ("rebuild", "object") in names
+
+    loop_bounds = {result["loop_bounds"] for result in results["results"]}
+    assert loop_bounds == {True, False}
+
+    # The grid is benchmarked in both bounds modes as well
+    grid_bounds = {result["loop_bounds"] for result in results["results"]
+                   if result["benchmark"] == "get_boids"}
+    assert grid_bounds == {True, False}
+
+    fields_of_view = {result["field_of_view"]
+                      for result in results["results"]
+                      if result["benchmark"] == "get_boids"}
+    assert fields_of_view == {120, 270, 360}
+
+
+def test_max_object_boids():
+    results = run_benchmarks(counts=[50], grid_settings=[(100, 2)],
+                             engines=["object", "numpy"], repeat=1,
+                             max_object_boids=10)
+
+    engines = {result["engine"] for result in results["results"]}
+    assert engines == {"numpy"}
+
+
+def test_benchmark_grid_keeps_flock():
+    flock = create_flock(200, 50, 3, True, "object")
+    grid = flock.spatial_hash_grid
+    cells = [(boid.hash, boid.cell_index) for boid in flock.boids]
+
+    assert len(list(benchmark_grid(flock, 2))) == 6
+
+    # The flock's boids are still where its grid has them
+    assert [(boid.hash, boid.cell_index) for boid in flock.boids] == cells
+    for boid in flock.boids:
+        assert grid.get_cell(boid.hash)[boid.cell_index] is boid
+
+
+def test_benchmark_grid_wraps(monkeypatch):
+    flock = create_flock(200, 50, 3, True, "object")
+    grids = []
+
+    # Record the grids the benchmarks create
+    init = SpatialHashGrid.__init__
+
+    def record(grid, *args, **kwargs):
+        init(grid, *args, **kwargs)
+        grids.append(grid)
+
+    monkeypatch.setattr(SpatialHashGrid, "__init__", record)
+    list(benchmark_grid(flock, 1))
+
+    world_size = flock.spatial_hash_grid.world_size
+    assert grids
+    assert all(grid.wrap and grid.world_size == world_size
+               for grid in grids)
+
+
+def test_compare():
+    old = run_benchmarks(counts=[50], grid_settings=[(100, 2)],
+                         engines=["numpy"], repeat=1)
+    new = json.loads(json.dumps(old))
+
+    assert compare(old, new) == []
+
+    new["results"][0]["seconds"] = old["results"][0]["seconds"] * 2
+    slower = compare(old, new)
+
+    assert len(slower) == 1
+    assert slower[0][1] > 1.9
+
+
+def test_main(tmp_path, capsys):
+    path = tmp_path / "results.json"
+    main(["--out", str(path), "--counts", "20", "--engines", "numpy",
+          "--repeat", "1"])
+
+    results = json.loads(path.read_text())
+    assert results["results"]
+    assert "update_boids" in capsys.readouterr().out
@@ -1,7 +1,9 @@
-from pygame import Vector2
+import pytest
 import numpy as np
 
-from boids import Flock
+from boids import Flock, Boid
+from boids.config import load_config
+from boids.vector import Vector2
 
 
 def test_create_boid():
@@ -456,3 +458,206 @@ def test_seperation_multiple_types():
             assert current_dist > dist
         else:
             assert current_dist == dist
+
+
+def test_loop_bounds_across_edge():
+    flock = Flock(
+        num_boids=0,
+        num_types=1,
+        world_size=(100, 100),
+        cell_size=10,
+        max_speed=5,
+        perception=2,
+        field_of_view=360,
+        avoid_dist=10,
+        other_avoid_mult=1,
+        other_avoid_dist=0,
+        alignment_factor=0,
+        cohesion_factor=1,
+        seperation_factor=0,
+        turn_margin=10,
+        turn_factor=1,
+        loop_bounds=True
+    )
+
+    boid1 = flock.create_boid(1, 360)
+    boid2 = flock.create_boid(1, 360)
+
+    boid1.pos = Vector2(1, 50)
+    boid2.pos = Vector2(99, 50)
+    boid1.dir = Vector2(0, 0)
+
+    # The center of mass is just across the edge, not across the world
+    flock.cohesion(boid1, [boid2])
+    assert boid1.dir == Vector2(-2, 0)
+
+    # Seperate away from the boid across the edge
+    flock.cohesion_factor = 0
+    flock.seperation_factor = 1
+    boid1.dir = Vector2(0, 0)
+
+    flock.seperation(boid1, [boid2])
+    assert boid1.dir == Vector2(2, 0)
+
+
+@pytest.mark.parametrize("loop_bounds", [True, False])
+def test_steer(loop_bounds):
+    flock = Flock(**load_config(num_boids=300, world_size=(200, 200),
+                                cell_size=20, perception_radius=30,
+                                loop_bounds=loop_bounds),
+                  rng=np.random.default_rng(2))
+    grid = flock.spatial_hash_grid
+    direction = Vector2(0, 0)
+
+    for boid in flock.boids:
+        # Get the close boids and apply every rule on its own
+        boids, distances_sq, boids_of_type = grid.get_neighbours(
+            boid, flock.perception_radius
+        )
+        expected = Boid(boid.pos, Vector2(boid.dir), boid.type, None)
+        if boids:
+            flock.seperation(expected, boids, distances_sq)
+        if boids_of_type:
+            flock.alignment(expected, boids_of_type)
+            flock.cohesion(expected, boids_of_type)
+
+        assert flock.steer(boid, direction) == len(boids)
+        assert direction == expected.dir
+
+
+@pytest.mark.parametrize("double_buffer", [False, True])
+@pytest.mark.parametrize("loop_bounds", [True, False])
+def test_update_allocates_no_boids(monkeypatch, double_buffer, loop_bounds):
+    flock = Flock(
+        num_boids=300,
+        num_types=2,
+        world_size=(200, 200),
+        cell_size=20,
+        max_speed=5,
+        perception=2,
+        field_of_view=270,
+        avoid_dist=10,
+        other_avoid_mult=1.5,
+        other_avoid_dist=20,
+        alignment_factor=0.05,
+        cohesion_factor=0.005,
+        seperation_factor=0.05,
+        turn_margin=20,
+        turn_factor=1,
+        loop_bounds=loop_bounds,
+        double_buffer=double_buffer
+    )
+    flock.update_boids()
+
+    created = []
+
+    def count(init):
+        def counted_init(self, *args, **kwargs):
+            created.append(type(self))
+            init(self, *args, **kwargs)
+        return counted_init
+
+    monkeypatch.setattr(Vector2, "__init__", count(Vector2.__init__))
+    monkeypatch.setattr(Boid, "__init__", count(Boid.__init__))
+
+    flock.update_boids()
+    assert created == []
+    assert len({id(boid.color) for boid in flock.boids}) == 2
+
+
+def test_default_rng_seed():
+    # Without a generator the boids come from the seed of np.random
+    flocks = []
+    for _ in range(2):
+        np.random.seed(5)
+        flocks.append(Flock(**load_config(num_boids=20), engine="numpy"))
+
+    assert np.array_equal(flocks[0].positions, flocks[1].positions)
+
+
+def test_reset_boids_rng():
+    flocks = [
+        Flock(**load_config(num_boids=100), engine=engine,
+              rng=np.random.default_rng(3))
+        for engine in ("object", "numpy", "object")
+    ]
+    object_flock, array_flock, same_flock = flocks
+
+    positions = [tuple(boid.pos) for boid in object_flock.boids]
+    assert np.allclose(positions, array_flock.positions)
+    assert positions == [tuple(boid.pos) for boid in same_flock.boids]
+    assert [boid.type for boid in object_flock.boids] == \
+        array_flock.types.tolist()
+
+    # Every boid is in the cell of its position
+    grid = object_flock.spatial_hash_grid
+    for boid in object_flock.boids:
+        assert boid.hash == grid.hash(boid.pos)
+        assert boid in grid.get_cell(boid.hash)
+
+    object_flock.reset_boids(50, 3, np.random.default_rng(3))
+    assert len(object_flock.boids) == 50
+    assert sum(map(len, grid.grid.values())) == 50
+
+
+@pytest.mark.parametrize("engine", ["object", "numpy"])
+def test_add_remove_boids(engine):
+    flock = Flock(**load_config(num_boids=20), engine=engine,
+                  rng=np.random.default_rng(0))
+    positions = {boid.id: tuple(boid.pos) for boid in flock.boids}
+
+    ids = flock.add_boids([[10, 20], [30, 40]], [[1, 0], [0, 1]], [0, 1])
+    assert ids == [20, 21]
+    positions.update({20: (10, 20), 21: (30, 40)})
+
+    flock.remove_boids([3, 21, 0, 19])
+    for id_ in (3, 21, 0, 19):
+        del positions[id_]
+
+    # The boids keep their ids and positions after swapping
+    boids = flock.boids
+    assert len(boids) == 18
+    for index, boid in enumerate(boids):
+        assert flock.indices[boid.id] == index
+        assert tuple(boid.pos) == positions[boid.id]
+
+    if engine == "object":
+        grid = flock.spatial_hash_grid
+        assert sum(map(len, grid.grid.values())) == 18
+        for boid in boids:
+            assert grid.get_cell(boid.hash)[boid.cell_index] is boid
+
+    with pytest.raises(ValueError):
+        flock.remove_boids([3])
+    with pytest.raises(ValueError):
+        flock.add_boids([[0, 0]], [[0, 0]], [2])
+
+    flock.update_boids()
+    assert len(flock.boids) == 18
+    assert flock.add_boids(*flock.random_boids(1, 2)) == [22]
+
+
+def test_add_boids_amortized():
+    flock = Flock(**load_config(num_boids=10), engine="numpy",
+                  rng=np.random.default_rng(0))
+
+    # Adding one boid at a time only copies the boids when the buffers
+    # are full
+    buffers = {id(flock.row_buffers[0])}
+    for index in range(200):
+        flock.add_boids([[index, 0]], [[0, 1]], [index % 2])
+        buffers.add(id(flock.row_buffers[0]))
+    assert len(buffers) <= 6
+
+    assert len(flock.positions) == len(flock.ids) == 210
+    assert flock.ids.tolist() == list(range(210))
+    assert flock.positions[10:, 0].tolist() == list(range(200))
+    assert flock.types[10:].tolist() == [0, 1] * 100
+
+    # Removing and adding again reuses the buffers
+    flock.remove_boids(range(100))
+    buffer = flock.row_buffers[0]
+    flock.add_boids([[1, 2]], [[0, 0]], [1])
+    assert flock.row_buffers[0] is buffer
+    assert flock.positions[-1].tolist() == [1, 2]
+    assert flock.indices[210] == 110
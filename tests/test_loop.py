@@ -0,0 +1,101 @@
+import numpy as np
+import pytest
+
+from boids import Flock
+from boids.config import load_config
+from boids.flock import TICK_RATE
+from boids.loop import SimulationLoop
+
+
+def create_flock(**overrides):
+    config = load_config(num_boids=50, **overrides)
+    return Flock(**config, engine="numpy", rng=np.random.default_rng(0))
+
+
+@pytest.mark.parametrize("rate", [TICK_RATE, 60, 120])
+def test_time_step(rate):
+    # Without steering the boids move the same distance at every rate
+    still = dict(alignment_factor=0, cohesion_factor=0,
+                 seperation_factor=0, loop_bounds=False, turn_factor=0)
+    expected = create_flock(**still)
+    flock = create_flock(**still)
+    flock.time_step = 1 / rate
+
+    for _ in range(TICK_RATE):
+        expected.update_boids()
+    for _ in range(rate):
+        flock.update_boids()
+
+    assert np.allclose(flock.positions, expected.positions)
+
+
+def test_time_step_tick_rate():
+    expected = create_flock()
+    flock = create_flock()
+    flock.time_step = 1 / TICK_RATE
+
+    for _ in range(5):
+        expected.update_boids()
+        flock.update_boids()
+
+    assert np.allclose(flock.positions, expected.positions)
+    assert np.allclose(flock.directions, expected.directions)
+
+
+def test_step():
+    now = [0.0]
+    loop = SimulationLoop(create_flock(), rate=10, max_steps=3,
+                          clock=lambda: now[0])
+    assert loop.flock.time_step == 0.1
+
+    assert loop.step(0.05) == 0
+    assert loop.step(0.25) == 2
+    assert loop.current[0] == pytest.approx(0.2)
+    assert loop.previous[0] == pytest.approx(0.1)
+
+    # A flock that falls behind skips the updates it can't catch up with
+    assert loop.step(10.0) == 3
+    assert loop.next_time == pytest.approx(10.1)
+
+
+def test_interpolate():
+    loop = SimulationLoop(create_flock(), rate=10, clock=lambda: 0.0)
+    loop.step(0.1)
+    (_, previous), (current_time, current) = loop.previous, loop.current
+
+    state = loop.interpolate(current_time + loop.time_step / 2)
+    offsets = current["positions"] - previous["positions"]
+    offsets -= 1000 * np.round(offsets / 1000)
+    assert np.allclose(state["positions"],
+                       (previous["positions"] + offsets / 2) % 1000)
+
+    # Boids that just went over the edge are shown in the world
+    assert np.allclose(loop.interpolate(0.0)["positions"],
+                       previous["positions"] % 1000)
+    assert np.allclose(loop.interpolate(5.0)["positions"],
+                       current["positions"] % 1000)
+
+
+def test_interpolate_loop_around():
+    loop = SimulationLoop(create_flock(), rate=10, clock=lambda: 0.0)
+    loop.previous[1]["positions"][0] = (998, 500)
+    loop.current = (loop.previous[0] + 0.1,
+                    {name: np.array(array)
+                     for name, array in loop.previous[1].items()})
+    loop.current[1]["positions"][0] = (4, 500)
+
+    # Half way between 998 and 4 across the edge of the world
+    state = loop.interpolate(loop.previous[0] + 0.15)
+    assert np.allclose(state["positions"][0], (1, 500))
+
+
+def test_start_stop():
+    loop = SimulationLoop(create_flock(workers=2), rate=200)
+    loop.start()
+    while loop.current is loop.previous or loop.previous[0] == 0:
+        pass
+    loop.stop()
+
+    assert loop.thread is None
+    assert loop.flock.executor is None
+    assert loop.current[0] > loop.previous[0]
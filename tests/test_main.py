@@ -0,0 +1,74 @@
+import numpy as np
+import pytest
+
+pygame = pytest.importorskip("pygame")
+
+import main  # noqa: E402
+from boids import TrajectoryRecorder  # noqa: E402
+
+
+COLORS = [(255, 0, 0), (0, 255, 0)]
+
+
+@pytest.fixture
+def screen(monkeypatch):
+    # Draw without a window
+    monkeypatch.setenv("SDL_VIDEODRIVER", "dummy")
+    pygame.display.init()
+    yield pygame.display.set_mode((100, 80))
+    pygame.display.quit()
+
+
+@pytest.mark.parametrize("mode", main.RENDER_MODES)
+def test_draw(screen, mode):
+    renderer = main.Renderer(screen, mode, boid_size=3, cell_size=40)
+    positions = np.array([[50.0, 40.0], [20.0, 60.0]])
+    directions = np.array([[10.0, 0.0], [0.0, 0.0]])
+    renderer.draw(positions, directions, np.array([0, 1]), COLORS)
+
+    # The line starts at the center of the boid and goes past its body
+    assert screen.get_at((50, 40))[:3] == tuple(main.LINE_COLOR)[:3]
+    assert screen.get_at((60, 40))[:3] == tuple(main.LINE_COLOR)[:3]
+    assert screen.get_at((50, 42))[:3] == COLORS[0]
+
+    # A boid that doesn't move has a line of one pixel
+    assert screen.get_at((20, 60))[:3] == tuple(main.LINE_COLOR)[:3]
+    assert screen.get_at((21, 60))[:3] == COLORS[1]
+
+    # The cells are on the background
+    assert screen.get_at((40, 10))[:3] == tuple(main.CELL_COLOR)[:3]
+    assert screen.get_at((30, 10))[:3] == tuple(main.BG_COLOR)[:3]
+
+    renderer.draw(positions, None, np.array([0, 1]), COLORS)
+    assert screen.get_at((50, 40))[:3] == COLORS[0]
+
+
+@pytest.mark.parametrize("mode", main.RENDER_MODES)
+def test_draw_off_screen(screen, mode):
+    renderer = main.Renderer(screen, mode, boid_size=3)
+    positions = np.array([[-2.0, 40.0], [-50.0, -50.0], [150.0, 40.0],
+                          [99.0, 79.0]])
+    directions = np.array([[0.0, 0.0], [5.0, 5.0], [-40.0, 0.0],
+                           [5.0, 5.0]])
+    renderer.draw(positions, directions, np.array([0, 1, 0, 1]), COLORS)
+
+    # Only the parts of the boids on the screen are drawn
+    assert screen.get_at((0, 40))[:3] == COLORS[0]
+    assert screen.get_at((98, 78))[:3] == COLORS[1]
+    assert screen.get_at((99, 79))[:3] == tuple(main.LINE_COLOR)[:3]
+
+    # The line of a boid off the screen reaches into the screen
+    assert screen.get_at((99, 40))[:3] == tuple(main.LINE_COLOR)[:3]
+
+
+def test_unknown_mode(screen):
+    with pytest.raises(ValueError):
+        main.Renderer(screen, "shapes")
+
+
+def test_replay_without_frames(tmp_path, capsys):
+    path = str(tmp_path / "trajectory.traj")
+    TrajectoryRecorder(path).close()
+
+    main.replay(path)
+    assert "no frames" in capsys.readouterr().out
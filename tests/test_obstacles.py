@@ -0,0 +1,107 @@
+import numpy as np
+import pytest
+
+from boids import Flock
+from boids.config import load_config
+from boids.obstacles import Circle, Polygon, ObstacleField, load_obstacle
+
+
+def test_circle():
+    circle = Circle((10, 10), 5)
+    points = np.array([[10, 10], [10, 20], [13, 14]], float)
+
+    assert np.allclose(circle.signed_distance(points), [-5, 5, 0])
+
+
+def test_polygon():
+    square = Polygon([(0, 0), (10, 0), (10, 10), (0, 10)])
+    points = np.array([[5, 5], [2, 5], [15, 5], [13, 14], [5, -1]], float)
+
+    assert np.allclose(square.signed_distance(points), [-5, -2, 5, 5, 1])
+
+    with pytest.raises(ValueError):
+        Polygon([(0, 0), (1, 1)])
+
+
+def test_load_obstacle():
+    circle = load_obstacle({"circle": [1, 2], "radius": 3})
+    assert circle.center == (1, 2) and circle.radius == 3
+
+    polygon = load_obstacle(Polygon([(0, 0), (1, 0), (0, 1)]).to_dict())
+    assert polygon.points.tolist() == [[0, 0], [1, 0], [0, 1]]
+
+    assert load_obstacle(circle) is circle
+    with pytest.raises(ValueError):
+        load_obstacle({"square": 1})
+
+
+def test_field():
+    field = ObstacleField([Circle((50, 50), 10)], (100, 100), resolution=2)
+    assert field.shape == (50, 50)
+
+    positions = np.array([[50.5, 30.5], [80.5, 50.5], [-20, 50.5],
+                          [50.5, 150]])
+    distances, gradients = field.sample(positions)
+
+    # The distance at the center of the cell and the way out
+    centers = np.array([[51, 31], [81, 51]], float)
+    assert np.allclose(distances[:2],
+                       Circle((50, 50), 10).signed_distance(centers))
+    assert np.allclose(gradients[0], [0, -1], atol=0.1)
+    assert np.allclose(gradients[1], [1, 0], atol=0.1)
+
+    # Boids outside of the world use the closest cell
+    assert np.isclose(distances[2], 39, atol=0.1)
+    assert np.isclose(distances[3], 39, atol=0.1)
+
+    cells = [field.cell(x, y) for x, y in positions]
+    assert cells == field.cells(positions).tolist()
+    assert field.distance_list[cells[0]] == distances[0]
+    assert field.gradient_list[2 * cells[0]:2 * cells[0] + 2] == \
+        gradients[0].tolist()
+
+
+@pytest.mark.parametrize("engine", ["object", "numpy"])
+def test_avoid_obstacles(engine):
+    flock = Flock(**load_config(num_boids=0, world_size=(200, 200),
+                                turn_margin=20, turn_factor=1,
+                                alignment_factor=0, cohesion_factor=0,
+                                loop_bounds=False),
+                  engine=engine, obstacles=[Circle((100, 100), 20)])
+
+    # One boid flies at the obstacle and one is far away
+    flock.add_boids(np.array([[100.0, 130.0], [100.0, 170.0]]),
+                    np.array([[0.0, -2.0], [0.0, -2.0]]), np.zeros(2, int))
+    flock.update_boids()
+
+    directions = flock.get_state()["directions"]
+    assert np.allclose(directions, [[0, -1], [0, -2]], atol=0.1)
+
+    # Only the object engine looks up boids in lists
+    field = flock.obstacle_field
+    assert (field._distance_list is None) == (engine != "object")
+
+
+def test_save_obstacles(tmp_path):
+    obstacles = [{"circle": [50, 50], "radius": 10},
+                 {"polygon": [[0, 0], [10, 0], [0, 10]]}]
+    flock = Flock(**load_config(num_boids=10, obstacles=obstacles),
+                  obstacle_resolution=8)
+    assert flock.obstacle_field.resolution == 8
+    assert flock.get_params()["obstacles"] == [
+        {"circle": [50.0, 50.0], "radius": 10.0},
+        {"polygon": [[0.0, 0.0], [10.0, 0.0], [0.0, 10.0]]},
+    ]
+
+    path = tmp_path / "flock.snap"
+    flock.save(str(path))
+    loaded = Flock.load(str(path))
+
+    assert loaded.get_params()["obstacles"] == \
+        flock.get_params()["obstacles"]
+    assert loaded.obstacle_resolution == 8
+    assert np.array_equal(loaded.obstacle_field.distances,
+                          flock.obstacle_field.distances)
+
+    flock.obstacles = None
+    assert flock.obstacle_field is None
@@ -0,0 +1,127 @@
+import json
+import pytest
+
+from boids import Flock
+from boids.profiler import FlockProfiler
+from boids.rules import Seek, default_rules
+
+
+def create_flock(engine: str, **kwargs):
+    return Flock(
+        num_boids=100,
+        num_types=2,
+        world_size=(200, 200),
+        cell_size=20,
+        max_speed=5,
+        perception=2,
+        field_of_view=270,
+        avoid_dist=10,
+        other_avoid_mult=1.5,
+        other_avoid_dist=20,
+        alignment_factor=0.05,
+        cohesion_factor=0.005,
+        seperation_factor=0.05,
+        turn_margin=20,
+        turn_factor=1,
+        loop_bounds=True,
+        engine=engine,
+        **kwargs
+    )
+
+
+def test_lap():
+    profiler = FlockProfiler(history=3)
+
+    for _ in range(5):
+        profiler.start_tick()
+        profiler.lap("first")
+        profiler.lap("second")
+        profiler.lap("first")
+        profiler.count("counter", 2)
+        profiler.end_tick()
+
+    assert set(profiler.timings) == {"first", "second", "total"}
+    assert len(profiler.timings["first"]) == 3
+    assert list(profiler.counters["counter"]) == [2, 2, 2]
+
+    summary = profiler.summary()
+    assert summary["counter"]["mean"] == 2
+    assert summary["total"]["samples"] == 3
+
+    counts, edges = profiler.histogram("total", bins=4)
+    assert counts.sum() == 3 and len(edges) == 5
+
+
+@pytest.mark.parametrize("engine,phases", [
+    ("object", {"neighbours", "seperation", "alignment", "cohesion",
+                "bounds", "grid"}),
+    ("numpy", {"grid", "neighbours", "seperation", "alignment", "cohesion",
+               "bounds", "move"}),
+    ("numba", {"grid", "rules", "bounds", "move"}),
+])
+def test_flock_profiler(engine, phases, tmp_path):
+    flock = create_flock(engine)
+    flock.profiler = FlockProfiler()
+
+    for _ in range(3):
+        flock.update_boids()
+
+    assert set(flock.profiler.timings) == phases | {"total"}
+    assert len(flock.profiler.timings["total"]) == 3
+
+    # The neighbour phase and the neighbour counter are kept apart
+    summary = flock.profiler.summary()
+    if "neighbours" in phases:
+        assert summary["neighbours"]["samples"] == 3
+        assert summary["neighbours"]["mean"] < 1
+    assert summary["avg_neighbours"]["mean"] > 1
+    assert summary["max_cell"]["max"] >= 1
+
+    path = tmp_path / "profile.json"
+    flock.profiler.export(str(path))
+    assert "summary" in json.loads(path.read_text())
+
+
+@pytest.mark.parametrize("workers", [1, 3])
+def test_profiler_rules(workers):
+    rules = default_rules() + [Seek((100, 100))]
+    flock = create_flock("numba", rules=rules, workers=workers)
+    flock.profiler = FlockProfiler()
+    flock.update_boids()
+    flock.close()
+
+    # The kernel applies the default rules, the other rules are timed
+    # one by one
+    tick = flock.profiler.timings
+    assert "neighbours" not in tick
+    if workers == 1:
+        assert {"rules", "seek"} <= set(tick)
+        assert tick["seek"][0] > 0
+        return
+
+    # The ranges of the workers are timed by their wall time and the
+    # times of the workers are added up on their own
+    assert {"ranges", "workers.rules", "workers.seek"} <= set(tick)
+    assert "rules" not in tick
+    phases = [name for name in tick
+              if name != "total" and not name.startswith("workers.")]
+    assert tick["total"][0] == pytest.approx(
+        sum(tick[name][0] for name in phases)
+    )
+
+
+def test_object_profiler_counts_neighbours():
+    flock = create_flock("object", double_buffer=True)
+    numpy_flock = create_flock("numpy")
+
+    numpy_flock.positions[:] = [tuple(boid.pos) for boid in flock.boids]
+    numpy_flock.directions[:] = [tuple(boid.dir) for boid in flock.boids]
+    numpy_flock.types[:] = [boid.type for boid in flock.boids]
+
+    flock.profiler = FlockProfiler()
+    numpy_flock.profiler = FlockProfiler()
+    flock.update_boids()
+    numpy_flock.update_boids()
+
+    assert flock.profiler.counters["avg_neighbours"][0] == \
+        pytest.approx(numpy_flock.profiler.counters["avg_neighbours"][0])
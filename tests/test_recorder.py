@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+
+from boids import Flock, TrajectoryRecorder, TrajectoryReader
+from boids.config import load_config
+
+
+@pytest.mark.parametrize("engine", ["object", "numpy"])
+def test_record(tmp_path, engine):
+    path = str(tmp_path / "trajectory.traj")
+    flock = Flock(**load_config(num_boids=50), engine=engine)
+    expected = []
+
+    with TrajectoryRecorder(path, stride=2, directions=True,
+                            chunk_frames=3) as recorder:
+        flock.recorder = recorder
+
+        for tick in range(20):
+            # Change the boids half way
+            if tick == 10:
+                flock.remove_boids([1, 2])
+                flock.add_boids([[5, 5]], [[1, 1]], [1])
+
+            flock.update_boids()
+            if tick % 2 == 0:
+                state = flock.get_state()
+                expected.append((tick, {name: np.array(array)
+                                        for name, array in state.items()}))
+
+    reader = TrajectoryReader(path)
+    assert len(reader) == 10
+    assert reader.ticks() == [tick for tick, _ in expected]
+
+    for frame, (tick, state) in zip(reader, expected):
+        assert frame.tick == tick
+        assert frame.positions.dtype == np.float32
+        assert np.allclose(frame.positions, state["positions"], atol=1e-3)
+        assert np.allclose(frame.directions, state["directions"],
+                           atol=1e-3)
+        assert np.array_equal(frame.ids, state["ids"])
+        assert np.array_equal(frame.types, state["types"])
+
+    assert reader[-1].tick == 18
+    assert len(reader[-1].ids) == 49
+    with pytest.raises(IndexError):
+        reader[10]
+
+
+def test_reader_unfinished_chunk(tmp_path):
+    path = str(tmp_path / "trajectory.traj")
+    flock = Flock(**load_config(num_boids=10), engine="numpy")
+
+    recorder = TrajectoryRecorder(path, dtype=np.float64, chunk_frames=4)
+    for _ in range(6):
+        recorder.record(flock)
+
+    # Only the full chunk is written until the recorder is closed
+    assert len(TrajectoryReader(path)) == 4
+    recorder.close()
+
+    reader = TrajectoryReader(path)
+    assert len(reader) == 6
+    assert reader[5].directions is None
+    assert np.array_equal(reader[5].positions, flock.positions)
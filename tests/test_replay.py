@@ -0,0 +1,96 @@
+import numpy as np
+
+from boids import Flock, TrajectoryRecorder, TrajectoryReader
+from boids.config import load_config
+from boids.replay import Replay
+from boids.run import main
+
+
+def record(path, steps: int):
+    flock = Flock(**load_config(num_boids=20), engine="numpy")
+    positions = []
+
+    with TrajectoryRecorder(path, dtype=np.float64) as recorder:
+        flock.recorder = recorder
+        for _ in range(steps):
+            flock.update_boids()
+            positions.append(np.array(flock.positions))
+
+    return positions
+
+
+def test_replay(tmp_path):
+    path = str(tmp_path / "trajectory.traj")
+    positions = record(path, 40)
+    replay = Replay(TrajectoryReader(path), prefetch=4)
+
+    assert np.array_equal(replay.frame().positions, positions[0])
+    assert replay.step() == 1
+
+    replay.speed = 2.5
+    assert [replay.step() for _ in range(3)] == [3, 6, 8]
+    assert np.array_equal(replay.frame().positions, positions[8])
+
+    replay.toggle_pause()
+    assert replay.step() == 8
+    replay.toggle_pause()
+
+    replay.speed = -4
+    assert replay.upcoming() == [8, 4, 0]
+    assert replay.step() == 4
+
+    # Seeking stops at both ends
+    replay.seek(100)
+    assert replay.index == 39
+    assert replay.frame().tick == 39
+    replay.seek(-5)
+    assert replay.step() == 0
+
+    replay.close()
+
+
+def test_empty_replay(tmp_path):
+    path = str(tmp_path / "trajectory.traj")
+    record(path, 0)
+    replay = Replay(TrajectoryReader(path))
+
+    # There is nothing to show or seek to
+    assert replay.frame() is None
+    replay.seek(10)
+    assert replay.step() == 0
+    assert replay.upcoming() == []
+
+    replay.close()
+
+
+def test_replay_decodes_ahead(tmp_path):
+    path = str(tmp_path / "trajectory.traj")
+    record(path, 10)
+    replay = Replay(TrajectoryReader(path), prefetch=5)
+
+    def decoded():
+        return sorted(replay.frames) == replay.upcoming()
+
+    # Wait until the thread decoded the upcoming frames
+    with replay.condition:
+        assert replay.condition.wait_for(decoded, 5)
+        assert replay.upcoming() == [0, 1, 2, 3, 4]
+
+    # Frames that are not upcoming anymore are forgotten
+    replay.seek(6)
+    with replay.condition:
+        assert replay.condition.wait_for(decoded, 5)
+        assert replay.upcoming() == [6, 7, 8, 9]
+
+    replay.close()
+    assert not replay.thread.is_alive()
+
+
+def test_main_record(tmp_path):
+    path = str(tmp_path / "trajectory.traj")
+    main(["--steps", "6", "--boids", "30", "--record", path,
+          "--stride", "2"])
+
+    reader = TrajectoryReader(path)
+    assert reader.ticks() == [0, 2, 4]
+    assert reader[0].positions.shape == (30, 2)
@@ -0,0 +1,100 @@
+import numpy as np
+import pytest
+
+from boids import Flock
+from boids.config import load_config
+from boids.rules import (Rule, Seperation, Alignment, Cohesion, Seek,
+                         default_rules, fused_rules)
+
+
+def create_flock(engine: str, **overrides) -> Flock:
+    config = load_config(num_boids=300, world_size=(300, 300), cell_size=30,
+                         perception_radius=40)
+    config.update(overrides)
+
+    return Flock(**config, engine=engine, rng=np.random.default_rng(4))
+
+
+def test_fused_rules():
+    assert fused_rules(default_rules()) == 3
+    assert fused_rules(default_rules() + [Seek((0, 0))]) == 3
+    assert fused_rules([Alignment(), Seperation(), Cohesion()]) == 0
+    assert fused_rules([Seperation()]) == 0
+
+
+@pytest.mark.parametrize("rules", [
+    [Seek((150, 150), 0.01)],
+    default_rules() + [Seek((150, 150), 0.01)],
+    [Cohesion(), Alignment(), Seperation()],
+])
+def test_engines_match(rules):
+    flocks = [create_flock(engine, rules=rules)
+              for engine in ("numpy", "numba")]
+
+    for _ in range(3):
+        for flock in flocks:
+            flock.update_boids()
+
+    assert np.allclose(flocks[0].positions, flocks[1].positions)
+    assert np.allclose(flocks[0].directions, flocks[1].directions)
+
+
+def test_rule_order_matters():
+    flocks = [create_flock("numpy", rules=rules) for rules in (
+        [Seperation(), Alignment(), Cohesion()],
+        [Cohesion(), Alignment(), Seperation()],
+    )]
+
+    for flock in flocks:
+        flock.update_boids()
+
+    assert not np.allclose(flocks[0].directions, flocks[1].directions)
+
+
+def test_seek():
+    flock = create_flock("numpy", rules=[Seek((10, 150), 0.01)],
+                         num_boids=0)
+    flock.add_boids(np.array([[100.0, 150.0], [290.0, 150.0]]),
+                    np.zeros((2, 2)), np.zeros(2, int))
+
+    flock.update_boids()
+
+    # The second boid is closer to the target around the world
+    assert np.allclose(flock.directions, [[-0.9, 0], [0.2, 0]])
+
+
+def test_neighbours_only_when_needed(monkeypatch):
+    flock = create_flock("numpy", rules=[Seek((150, 150))])
+
+    def find_neighbours(start, stop):
+        raise AssertionError("No rule needs the neighbours")
+
+    monkeypatch.setattr(flock, "find_neighbours", find_neighbours)
+    flock.update_boids()
+
+
+def test_custom_rule():
+    class Count(Rule):
+        neighbours = "type"
+
+        def __init__(self):
+            self.counts = []
+
+        def apply(self, flock, start, stop, neighbours, directions):
+            assert neighbours.same_type.all()
+            self.counts.append(neighbours.counts)
+
+    count = Count()
+    flock = create_flock("numpy", rules=[count], workers=2)
+    flock.update_boids()
+
+    counts = np.concatenate(count.counts)
+    assert len(count.counts) == 2 and len(counts) == 300
+    assert counts.sum() > 0
+
+
+def test_object_engine_rules():
+    create_flock("object", rules=default_rules())
+
+    with pytest.raises(ValueError):
+        create_flock("object", rules=[Seek((0, 0))])
@@ -0,0 +1,65 @@
+import json
+import numpy as np
+
+from boids.config import load_config, DEFAULT_CONFIG
+from boids import run
+from boids.flock import Flock
+from boids.run import main
+
+
+def test_load_config(tmp_path):
+    path = tmp_path / "config.json"
+    path.write_text(json.dumps({"num_boids": 10, "world_size": [50, 60]}))
+
+    config = load_config(str(path), num_types=3, perception=None)
+
+    assert config["num_boids"] == 10
+    assert config["num_types"] == 3
+    assert config["world_size"] == (50, 60)
+    assert config["perception"] == DEFAULT_CONFIG["perception"]
+
+
+def test_main_dump(tmp_path, capsys):
+    path = tmp_path / "state.npz"
+    main(["--steps", "3", "--boids", "50", "--seed", "1",
+          "--dump", str(path)])
+
+    assert "3 steps of 50 boids" in capsys.readouterr().out
+
+    state = np.load(path)
+    assert state["positions"].shape == (50, 2)
+    assert state["directions"].shape == (50, 2)
+    assert state["types"].shape == (50,)
+
+
+def test_main_seed(tmp_path):
+    paths = [tmp_path / "first.npz", tmp_path / "second.npz"]
+
+    for path in paths:
+        main(["--steps", "3", "--boids", "50", "--seed", "1",
+              "--engine", "numpy", "--dump", str(path)])
+
+    first, second = (np.load(path) for path in paths)
+    assert np.array_equal(first["positions"], second["positions"])
+
+
+def test_main_config_engine(tmp_path, monkeypatch):
+    path = tmp_path / "config.json"
+    path.write_text(json.dumps({"num_boids": 20, "engine": "numpy",
+                                "workers": 2}))
+
+    flocks = []
+
+    def create_flock(**config):
+        flocks.append(Flock(**config))
+        return flocks[-1]
+
+    monkeypatch.setattr(run, "Flock", create_flock)
+
+    # The config can set the engine and the flags replace it
+    main(["--steps", "1", "--config", str(path)])
+    main(["--steps", "1", "--config", str(path), "--engine", "object",
+          "--workers", "1"])
+
+    assert [(flock.engine, flock.workers) for flock in flocks] == \
+        [("numpy", 2), ("object", 1)]
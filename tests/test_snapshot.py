@@ -0,0 +1,69 @@
+import numpy as np
+import pytest
+
+from boids import Flock
+from boids.config import load_config
+from boids.snapshot import write_snapshot, read_snapshot
+
+
+def test_write_read_snapshot(tmp_path):
+    path = str(tmp_path / "arrays.snap")
+    arrays = {
+        "floats": np.random.uniform(size=(13, 2)),
+        "ints": np.arange(7),
+        "empty": np.empty((0, 2)),
+    }
+    write_snapshot(path, {"name": "test"}, arrays)
+
+    header, loaded = read_snapshot(path)
+    assert header == {"name": "test", "version": 1}
+    for name, array in arrays.items():
+        assert np.array_equal(loaded[name], array)
+        assert loaded[name].dtype == array.dtype
+
+    # Changing the loaded arrays doesn't change the file
+    loaded["ints"][0] = 100
+    assert read_snapshot(path)[1]["ints"][0] == 0
+
+    with open(path, "r+b") as file:
+        file.write(b"NOTASNAP")
+    with pytest.raises(ValueError):
+        read_snapshot(path)
+
+
+@pytest.mark.parametrize("engine", ["object", "numpy"])
+def test_save_load(tmp_path, engine):
+    path = str(tmp_path / "flock.snap")
+    flock = Flock(**load_config(num_boids=100, loop_bounds=False),
+                  engine=engine, rng=np.random.default_rng(2))
+    flock.remove_boids([5, 17])
+    flock.update_boids()
+    flock.alignment_factor = 0.1
+    flock.save(path)
+
+    loaded = Flock.load(path)
+    assert loaded.get_params() == flock.get_params()
+    assert loaded.grid_stale
+    assert loaded.indices == flock.indices
+    assert loaded.add_boids(*loaded.random_boids(1, 2)) == \
+        flock.add_boids(*flock.random_boids(1, 2))
+
+    for _ in range(3):
+        flock.update_boids()
+        loaded.update_boids()
+
+    # The order of the boids in the cells can change, which only changes
+    # the order of the sums of the rules
+    state, loaded_state = flock.get_state(), loaded.get_state()
+    for name in state:
+        assert np.allclose(state[name], loaded_state[name])
+
+
+def test_load_other_engine(tmp_path):
+    path = str(tmp_path / "flock.snap")
+    flock = Flock(**load_config(num_boids=100), engine="object")
+    flock.save(path)
+
+    loaded = Flock.load(path, engine="numpy")
+    assert loaded.engine == "numpy"
+    assert np.array_equal(loaded.positions, flock.get_state()["positions"])
@@ -1,7 +1,9 @@
-from pygame import Vector2
+import tracemalloc
 import numpy as np
+import pytest
 
-from boids import SpatialHashGrid, Flock, Boid
+from boids import SpatialHashGrid, Flock, Boid, spatial_hash_grid
+from boids.vector import Vector2
 
 
 def test_hash():
@@ -11,17 +13,26 @@ def test_hash():
         field_of_view=360
     )
 
+    # The key of a cell is x * num_rows + y
+    rows = spatial_hash_grid.num_rows
+
     point_hash = spatial_hash_grid.hash(Vector2(99, 99))
-    assert point_hash == (0, 0)
+    assert point_hash == 0
 
     point_hash = spatial_hash_grid.hash(Vector2(100, 100))
-    assert point_hash == (1, 1)
+    assert point_hash == 1 * rows + 1
 
     point_hash = spatial_hash_grid.hash(Vector2(199, 199))
-    assert point_hash == (1, 1)
+    assert point_hash == 1 * rows + 1
 
     point_hash = spatial_hash_grid.hash(Vector2(200, 200))
-    assert point_hash == (2, 2)
+    assert point_hash == 2 * rows + 2
+
+    # Cells outside of the world have keys of their own
+    point_hash = spatial_hash_grid.hash(Vector2(-50, 150))
+    assert spatial_hash_grid.key_cell(point_hash) == (-1, 1)
+    point_hash = spatial_hash_grid.hash(Vector2(150, -50))
+    assert spatial_hash_grid.key_cell(point_hash) == (1, -1)
 
 
 def test_insert():
@@ -167,3 +178,419 @@ def test_get_boids_multiple_types():
 
     flock.spatial_hash_grid.delete(boid1)
     flock.spatial_hash_grid.delete(boid2)
+
+
+def test_field_of_view():
+    grid = SpatialHashGrid(cell_size=10, perception=2, field_of_view=90)
+    boid = Boid(Vector2(50, 50), Vector2(-1, 0.1), 0, None)
+    grid.insert(boid, boid.pos)
+
+    # Others at an angle from the direction of the boid
+    others = {}
+    angle = np.arctan2(0.1, -1)
+    for degrees in (-50, -40, 0, 40, 50, 180):
+        offset = np.array([np.cos(angle + np.radians(degrees)),
+                           np.sin(angle + np.radians(degrees))]) * 5
+        other = Boid(Vector2(*(offset + 50)), Vector2(1, 0), 0, None)
+        grid.insert(other, other.pos)
+        others[degrees] = other
+
+    def visible() -> set:
+        boids, _ = grid.get_boids(boid)
+        return {degrees for degrees, other in others.items()
+                if other in boids}
+
+    # Angles across -180 degrees count as well
+    assert visible() == {-40, 0, 40}
+
+    grid.field_of_view = 180
+    assert grid.fov_cos == -1
+    assert visible() == set(others)
+
+    # A boid that doesn't move sees all around
+    grid.field_of_view = 10
+    boid.dir = Vector2(0, 0)
+    assert visible() == set(others)
+
+
+def test_flock_field_of_view():
+    flock = Flock(
+        num_boids=0,
+        num_types=1,
+        world_size=(1000, 1000),
+        cell_size=10,
+        max_speed=1,
+        perception=2,
+        field_of_view=270,
+        avoid_dist=0,
+        other_avoid_mult=1,
+        other_avoid_dist=0,
+        alignment_factor=0,
+        cohesion_factor=0,
+        seperation_factor=0,
+        turn_margin=0,
+        turn_factor=0,
+        loop_bounds=True
+    )
+    assert flock.field_of_view == 270
+    assert np.isclose(flock.spatial_hash_grid.fov_cos, np.cos(np.radians(135)))
+
+    flock.field_of_view = 120
+    assert flock.field_of_view == 120
+    assert flock.get_params()["field_of_view"] == 120
+    assert np.isclose(flock.spatial_hash_grid.fov_cos, 0.5)
+
+
+def test_rebuild():
+    spatial_hash_grid = SpatialHashGrid(
+        cell_size=100,
+        perception=2,
+        field_of_view=360,
+        mode="rebuild"
+    )
+
+    boids = [
+        Boid(Vector2(np.random.uniform(0, 1000),
+                     np.random.uniform(0, 1000)),
+             Vector2(0, 0), 0, (0, 0, 0))
+        for _ in range(100)
+    ]
+    positions = np.array([tuple(boid.pos) for boid in boids])
+    spatial_hash_grid.rebuild(positions, boids)
+
+    assert spatial_hash_grid.cell_end[-1] == len(boids)
+
+    for boid in boids:
+        assert boid.hash == spatial_hash_grid.hash(boid.pos)
+        assert boid in spatial_hash_grid.get_cell(boid.hash)
+
+        for other in spatial_hash_grid.get_cell(boid.hash):
+            assert other.hash == boid.hash
+
+
+def test_get_boids_rebuild():
+    incremental = SpatialHashGrid(
+        cell_size=100,
+        perception=2,
+        field_of_view=270
+    )
+    rebuilt = SpatialHashGrid(
+        cell_size=100,
+        perception=2,
+        field_of_view=270,
+        mode="rebuild"
+    )
+
+    boids = [
+        Boid(Vector2(np.random.uniform(0, 1000),
+                     np.random.uniform(0, 1000)),
+             Vector2(np.random.uniform(-1, 1),
+                     np.random.uniform(-1, 1)),
+             np.random.randint(0, 2), (0, 0, 0))
+        for _ in range(200)
+    ]
+
+    for boid in boids:
+        incremental.insert(boid, boid.pos)
+
+    expected = [incremental.get_boids(boid) for boid in boids]
+
+    rebuilt.rebuild(np.array([tuple(boid.pos) for boid in boids]), boids)
+
+    for boid, (exp_boids, exp_boids_of_type) in zip(boids, expected):
+        close_boids, boids_of_type = rebuilt.get_boids(boid)
+
+        assert set(map(id, close_boids)) == set(map(id, exp_boids))
+        assert set(map(id, boids_of_type)) == set(map(id, exp_boids_of_type))
+
+
+def test_move_counters():
+    spatial_hash_grid = SpatialHashGrid(
+        cell_size=100,
+        perception=2,
+        field_of_view=360
+    )
+
+    boid = Boid(Vector2(50, 50), Vector2(0, 0), 0, (0, 0, 0))
+    spatial_hash_grid.insert(boid, boid.pos)
+    cell = spatial_hash_grid.grid[boid.hash]
+
+    spatial_hash_grid.move(boid, Vector2(60, 60))
+    assert spatial_hash_grid.moved == 1
+    assert spatial_hash_grid.migrated == 0
+    assert spatial_hash_grid.grid[boid.hash] is cell
+    assert cell == [boid]
+
+    spatial_hash_grid.move(boid, Vector2(160, 60))
+    assert spatial_hash_grid.moved == 2
+    assert spatial_hash_grid.migrated == 1
+    assert boid not in cell
+    assert spatial_hash_grid.grid[boid.hash] == [boid]
+
+    spatial_hash_grid.reset_counters()
+    assert spatial_hash_grid.moved == spatial_hash_grid.migrated == 0
+
+
+def test_rebuild_counters():
+    spatial_hash_grid = SpatialHashGrid(
+        cell_size=100,
+        perception=2,
+        field_of_view=360,
+        mode="rebuild"
+    )
+
+    positions = np.array([[50.0, 50.0], [150.0, 50.0], [250.0, 50.0]])
+    spatial_hash_grid.rebuild(positions)
+    assert spatial_hash_grid.migrated == 3
+
+    positions += [[10, 0], [60, 0], [0, 0]]
+    spatial_hash_grid.rebuild(positions)
+    assert spatial_hash_grid.moved == 3
+    assert spatial_hash_grid.migrated == 1
+
+
+def test_get_neighbours_radius():
+    flock = Flock(
+        num_boids=0,
+        num_types=2,
+        world_size=(1000, 1000),
+        cell_size=10,
+        max_speed=1,
+        perception=2,
+        field_of_view=360,
+        avoid_dist=0,
+        other_avoid_mult=1,
+        other_avoid_dist=0,
+        alignment_factor=0,
+        cohesion_factor=0,
+        seperation_factor=0,
+        turn_margin=0,
+        turn_factor=0,
+        loop_bounds=True
+    )
+
+    boid1 = create_boid(flock, 5, 5, 0)
+    boid2 = create_boid(flock, 8, 9, 0)
+    boid3 = create_boid(flock, 14, 14, 1)
+
+    boids, distances_sq, boids_of_type = \
+        flock.spatial_hash_grid.get_neighbours(boid1)
+    assert boids == [boid2, boid3]
+    assert distances_sq == [25, 162]
+    assert boids_of_type == [boid2]
+
+    boids, distances_sq, boids_of_type = \
+        flock.spatial_hash_grid.get_neighbours(boid1, radius=5)
+    assert boids == [boid2]
+    assert distances_sq == [25]
+
+    boids, boids_of_type = flock.spatial_hash_grid.get_boids(boid1, 4.9)
+    assert boids == [] and boids_of_type == []
+
+
+def test_wrap():
+    spatial_hash_grid = SpatialHashGrid(
+        cell_size=10,
+        perception=2,
+        field_of_view=360,
+        world_size=(100, 100),
+        wrap=True
+    )
+
+    assert spatial_hash_grid.hash(Vector2(-1, 105)) == 9 * 10 + 0
+
+    boid1 = Boid(Vector2(1, 50), Vector2(1, 0), 0, (0, 0, 0))
+    boid2 = Boid(Vector2(99, 50), Vector2(1, 0), 0, (0, 0, 0))
+    spatial_hash_grid.insert(boid1, boid1.pos)
+    spatial_hash_grid.insert(boid2, boid2.pos)
+
+    boids, distances_sq, _ = spatial_hash_grid.get_neighbours(boid1)
+    assert boids == [boid2]
+    assert distances_sq == [4]
+
+    # Across the top and bottom as well
+    boid3 = Boid(Vector2(50, 98), Vector2(1, 0), 0, (0, 0, 0))
+    boid4 = Boid(Vector2(50, 3), Vector2(1, 0), 0, (0, 0, 0))
+    spatial_hash_grid.insert(boid3, boid3.pos)
+    spatial_hash_grid.insert(boid4, boid4.pos)
+
+    boids, distances_sq, _ = spatial_hash_grid.get_neighbours(boid3)
+    assert boids == [boid4]
+    assert distances_sq == [25]
+
+
+def test_wrap_seam():
+    # The world is not a multiple of the cell size, so the cells are wider
+    positions = np.array([[990.0, 500.0], [40.0, 500.0]])
+
+    for storage in ("sparse", "dense"):
+        for mode in ("incremental", "rebuild"):
+            grid = SpatialHashGrid(100, 2, 360, mode, (1050, 1050), True,
+                                   storage)
+            assert grid.num_cells == (10, 10)
+
+            boids = [Boid(Vector2(pos), Vector2(1, 0), 0, (0, 0, 0))
+                     for pos in positions.tolist()]
+            if mode == "rebuild":
+                grid.rebuild(positions, boids)
+            else:
+                grid.insert_all(boids, positions)
+
+            boids_close, distances_sq, _ = grid.get_neighbours(boids[0])
+            assert boids_close == [boids[1]]
+            assert np.isclose(distances_sq[0], 100 ** 2)
+
+    flock = Flock(num_boids=0, num_types=1, world_size=(1050, 1050),
+                  cell_size=100, perception=2, field_of_view=360,
+                  avoid_dist=10, other_avoid_mult=1, other_avoid_dist=10,
+                  alignment_factor=0, cohesion_factor=0, seperation_factor=0,
+                  turn_margin=0, turn_factor=0, max_speed=5,
+                  loop_bounds=True, engine="numpy")
+    flock.add_boids(positions, np.zeros((2, 2)), np.zeros(2, int))
+    flock.spatial_hash_grid.rebuild(flock.positions)
+
+    assert flock.find_neighbours(0, 2).counts.tolist() == [1, 1]
+
+
+def test_wrap_small_world():
+    spatial_hash_grid = SpatialHashGrid(
+        cell_size=10,
+        perception=3,
+        field_of_view=360,
+        world_size=(30, 20),
+        wrap=True,
+        mode="rebuild"
+    )
+
+    # Every cell is only visited once
+    assert sorted(spatial_hash_grid.cell_offsets()) == \
+        [(x, y) for x in range(3) for y in range(2)]
+
+    boids = [
+        Boid(Vector2(np.random.uniform(0, 30),
+                     np.random.uniform(0, 20)),
+             Vector2(0, 0), 0, (0, 0, 0))
+        for _ in range(20)
+    ]
+    spatial_hash_grid.rebuild(
+        np.array([tuple(boid.pos) for boid in boids]), boids
+    )
+
+    for boid in boids:
+        close_boids, _ = spatial_hash_grid.get_boids(boid)
+
+        assert len(close_boids) == 19
+        assert boid not in close_boids
+
+
+def test_dense():
+    sparse = SpatialHashGrid(cell_size=10, perception=2, field_of_view=360)
+    dense = SpatialHashGrid(
+        cell_size=10,
+        perception=2,
+        field_of_view=360,
+        world_size=(100, 100),
+        storage="dense"
+    )
+
+    assert dense.hash(Vector2(25, 37)) == 2 * 10 + 3
+    assert dense.hash(Vector2(-5, 120)) == 0 * 10 + 9
+
+    positions = np.random.uniform(5, 95, (100, 2))
+    boids = []
+    for pos in positions:
+        sparse_boid = Boid(Vector2(pos), Vector2(1, 0), 0, (0, 0, 0))
+        dense_boid = Boid(Vector2(pos), Vector2(1, 0), 0, (0, 0, 0))
+        sparse.insert(sparse_boid, sparse_boid.pos)
+        dense.insert(dense_boid, dense_boid.pos)
+        boids.append((sparse_boid, dense_boid))
+
+    for sparse_boid, dense_boid in boids:
+        sparse.move(sparse_boid, sparse_boid.pos + Vector2(3, -2))
+        dense.move(dense_boid, dense_boid.pos + Vector2(3, -2))
+
+    assert dense.migrated == sparse.migrated
+    assert dense.max_occupancy() == sparse.max_occupancy()
+    assert len(dense.cells_list) == 100
+
+    for sparse_boid, dense_boid in boids:
+        sparse_others = sparse.get_boids(sparse_boid)[0]
+        dense_others = dense.get_boids(dense_boid)[0]
+        assert sorted(tuple(other.pos) for other in sparse_others) == \
+            sorted(tuple(other.pos) for other in dense_others)
+
+
+def test_dense_rebuild():
+    dense = SpatialHashGrid(
+        cell_size=10,
+        perception=2,
+        field_of_view=360,
+        mode="rebuild",
+        world_size=(100, 100),
+        storage="dense"
+    )
+
+    positions = np.array([[5.0, 5.0], [-30.0, 8.0], [95.0, 150.0]])
+    boids = [Boid(Vector2(pos), Vector2(1, 0), 0, (0, 0, 0))
+             for pos in positions]
+    dense.rebuild(positions, boids)
+    cell_start = dense.cell_start
+
+    assert [boid.hash for boid in boids] == [0, 0, 9 * 10 + 9]
+    assert dense.get_cell(0) == boids[:2]
+    assert dense.get_cell(99) == boids[2:]
+
+    # The arrays are reused while the number of cells stays the same
+    dense.rebuild(positions[:1], boids[:1])
+    assert dense.cell_start is cell_start
+    assert dense.get_cell(0) == boids[:1]
+    assert dense.get_cell(99) == []
+
+
+def test_insert_all():
+    positions = np.random.uniform(-20, 120, (200, 2))
+
+    for storage in ("sparse", "dense"):
+        for wrap in (False, True):
+            grid = SpatialHashGrid(10, 2, 360, world_size=(100, 100),
+                                   wrap=wrap, storage=storage)
+            boids = [Boid(Vector2(pos), Vector2(1, 0), 0, (0, 0, 0))
+                     for pos in positions.tolist()]
+            grid.insert_all(boids, positions)
+
+            for boid in boids:
+                assert boid.hash == grid.hash(boid.pos)
+                assert boid in grid.get_cell(boid.hash)
+
+            grid.clear()
+            assert grid.max_occupancy() == 0
+
+
+@pytest.mark.parametrize("wrap", [True, False])
+def test_sparse_allocations(wrap):
+    grid = SpatialHashGrid(20, 2, 360, world_size=(200, 200), wrap=wrap)
+    boids = [Boid(Vector2(pos), Vector2(0, 0), 0, (0, 0, 0))
+             for pos in np.random.uniform(0, 200, (300, 2)).tolist()]
+    for boid in boids:
+        grid.insert(boid, boid.pos)
+    grid.get_cells_around(boids[0].hash)
+
+    # Keep everything the grid returns, so every list it creates shows up
+    tracemalloc.start()
+    try:
+        kept = []
+        for boid in boids:
+            kept.append(grid.get_cells_around(boid.hash))
+            grid.move(boid, boid.pos)
+        snapshot = tracemalloc.take_snapshot()
+    finally:
+        tracemalloc.stop()
+
+    snapshot = snapshot.filter_traces(
+        [tracemalloc.Filter(True, spatial_hash_grid.__file__)]
+    )
+
+    # Only the moved counter is new, nothing is kept per call
+    assert sum(stat.count for stat in snapshot.statistics("lineno")) <= 1
+    assert all(cells is kept[0] for cells in kept)
+    assert all(isinstance(boid.hash, int) for boid in boids)
@@ -0,0 +1,50 @@
+import math
+
+from boids.vector import Vector2
+
+
+def test_create():
+    assert tuple(Vector2()) == (0, 0)
+    assert tuple(Vector2(1, 2)) == (1, 2)
+    assert tuple(Vector2((3, 4))) == (3, 4)
+    assert tuple(Vector2(Vector2(5, 6))) == (5, 6)
+
+
+def test_arithmetic():
+    vector = Vector2(1, 2)
+
+    assert vector + Vector2(1, 1) == Vector2(2, 3)
+    assert vector - Vector2(1, 1) == Vector2(0, 1)
+    assert vector * 2 == Vector2(2, 4)
+    assert 2 * vector == Vector2(2, 4)
+    assert vector / 2 == Vector2(0.5, 1)
+    assert -vector == Vector2(-1, -2)
+    assert vector == (1, 2)
+    assert vector != (1, 3)
+
+
+def test_in_place():
+    vector = Vector2(1, 2)
+    same = vector
+
+    vector += Vector2(1, 1)
+    vector *= 2
+    vector -= Vector2(2, 2)
+    vector /= 2
+
+    assert same is vector
+    assert vector == Vector2(1, 2)
+
+
+def test_distance_to():
+    assert Vector2(0, 0).distance_to(Vector2(3, 4)) == 5
+    assert Vector2(3, 4).length() == 5
+
+
+def test_angle_to():
+    assert math.isclose(Vector2(1, 0).angle_to(Vector2(0, 1)), 90)
+    assert math.isclose(Vector2(0, 1).angle_to(Vector2(1, 0)), -90)
+
+    # Not wrapped to [-180, 180], the same as pygame
+    assert math.isclose(Vector2(-1, 0.1).angle_to(Vector2(-1, -0.1)),
+                        -360 + 2 * math.degrees(math.atan2(0.1, 1)))
@@ -0,0 +1,250 @@
+import numpy as np
+import pytest
+
+from boids import Flock, Boid, BoidView, vectorized, kernels
+from boids.rules import default_rules
+from boids.vector import Vector2
+
+
+def create_flock(engine: str, loop_bounds: bool, num_boids: int = 200,
+                 **kwargs):
+    return Flock(
+        num_boids=num_boids,
+        num_types=2,
+        world_size=(200, 200),
+        cell_size=20,
+        max_speed=5,
+        perception=2,
+        field_of_view=270,
+        avoid_dist=10,
+        other_avoid_mult=1.5,
+        other_avoid_dist=20,
+        alignment_factor=0.05,
+        cohesion_factor=0.005,
+        seperation_factor=0.05,
+        turn_margin=20,
+        turn_factor=1,
+        loop_bounds=loop_bounds,
+        engine=engine,
+        **kwargs
+    )
+
+
+def reference_update(flock: Flock):
+    """Update the object boids while they all read the previous state"""
+    new_boids = []
+
+    for boid in flock.boids:
+        boids, boids_of_type = flock.spatial_hash_grid.get_boids(boid)
+        new_boid = Boid(Vector2(boid.pos), Vector2(boid.dir),
+                        boid.type, boid.color)
+
+        if boids:
+            flock.seperation(new_boid, boids)
+        if boids_of_type:
+            flock.alignment(new_boid, boids_of_type)
+            flock.cohesion(new_boid, boids_of_type)
+
+        flock.keep_in_bounds(new_boid)
+        flock.limit_speed(new_boid)
+
+        new_boid.pos += new_boid.dir
+        new_boids.append(new_boid)
+
+    return new_boids
+
+
+@pytest.mark.parametrize("engine", ["numpy", "numba"])
+@pytest.mark.parametrize("loop_bounds", [True, False])
+@pytest.mark.parametrize("grid_storage", ["sparse", "dense"])
+def test_update_arrays(engine, loop_bounds, grid_storage):
+    object_flock = create_flock("object", loop_bounds)
+    array_flock = create_flock(engine, loop_bounds,
+                               grid_storage=grid_storage)
+
+    array_flock.positions = np.array(
+        [tuple(boid.pos) for boid in object_flock.boids])
+    array_flock.directions = np.array(
+        [tuple(boid.dir) for boid in object_flock.boids])
+    array_flock.types = np.array(
+        [boid.type for boid in object_flock.boids])
+
+    expected = reference_update(object_flock)
+    array_flock.update_boids()
+
+    assert np.allclose(array_flock.positions,
+                       [tuple(boid.pos) for boid in expected])
+    assert np.allclose(array_flock.directions,
+                       [tuple(boid.dir) for boid in expected])
+
+
+def test_field_of_view_mask():
+    offsets = np.array([[1.0, 0.0], [0.0, 1.0], [-1.0, 0.1], [0.0, 0.0]])
+    distances_sq = (offsets ** 2).sum(axis=1)
+    directions = np.array([[2.0, 0.0]] * 4)
+
+    visible = vectorized.field_of_view_mask(
+        offsets, directions, distances_sq, np.cos(np.radians(45))
+    )
+    assert visible.tolist() == [True, False, False, True]
+
+    visible = vectorized.field_of_view_mask(
+        offsets, directions, distances_sq, -1.0
+    )
+    assert visible.all()
+
+    # Boids that don't move see all around
+    visible = vectorized.field_of_view_mask(
+        offsets, np.zeros_like(directions), distances_sq, 0.5
+    )
+    assert visible.all()
+
+
+def test_steer_kernel_matches_rules():
+    flock = create_flock("numpy", True)
+    grid = flock.spatial_hash_grid
+    grid.rebuild(flock.positions)
+
+    # The pipeline of the default rules over all boids
+    neighbours = flock.find_neighbours(0, len(flock.positions))
+    expected = flock.directions.copy()
+    for rule in default_rules():
+        rule_neighbours = neighbours
+        if rule.neighbours == "type":
+            rule_neighbours = neighbours.of_type()
+
+        rule.apply(flock, 0, len(expected), rule_neighbours, expected)
+
+    # Run the kernel as plain Python as well, with or without Numba
+    steer = getattr(kernels.steer, "py_func", kernels.steer)
+    directions = np.empty_like(flock.directions)
+    counts = np.empty(len(directions), np.int64)
+    steer(
+        flock.positions, flock.directions, flock.types,
+        grid.local_cells, grid.order, grid.cell_start, grid.cell_end,
+        grid.shape[0], grid.shape[1], np.array(grid.cell_offsets()),
+        grid.world_size[0], grid.world_size[1], True,
+        grid.fov_cos, np.inf,
+        flock.avoid_dist, flock.other_avoid_dist, flock.other_avoid_mult,
+        flock.alignment_factor, flock.cohesion_factor,
+        flock.seperation_factor, 0, len(directions), directions, counts
+    )
+
+    assert np.allclose(directions, expected)
+    assert np.array_equal(counts, neighbours.counts)
+
+
+@pytest.mark.parametrize("grid_mode", ["incremental", "rebuild"])
+def test_double_buffer(grid_mode):
+    flock = create_flock("object", True, grid_mode=grid_mode,
+                         double_buffer=True)
+    if grid_mode == "rebuild":
+        flock.spatial_hash_grid.rebuild(
+            np.array([tuple(boid.pos) for boid in flock.boids]), flock.boids
+        )
+
+    expected = reference_update(flock)
+    flock.update_boids()
+
+    for boid, expected_boid in zip(flock.boids, expected):
+        assert boid.pos == expected_boid.pos
+        assert boid.dir == expected_boid.dir
+
+
+def test_double_buffer_order():
+    flock = create_flock("object", True, double_buffer=True)
+    shuffled = create_flock("object", True, double_buffer=True,
+                            num_boids=0)
+
+    for boid in reversed(flock.boids):
+        shuffled_boid = Boid(Vector2(boid.pos), Vector2(boid.dir),
+                             boid.type, boid.color)
+        shuffled.spatial_hash_grid.insert(shuffled_boid, shuffled_boid.pos)
+        shuffled.boids.append(shuffled_boid)
+
+    flock.update_boids()
+    shuffled.update_boids()
+
+    for boid, shuffled_boid in zip(flock.boids, reversed(shuffled.boids)):
+        assert boid.pos.distance_to(shuffled_boid.pos) < 1e-9
+        assert boid.dir.distance_to(shuffled_boid.dir) < 1e-9
+
+
+@pytest.mark.parametrize("engine", ["numpy", "numba"])
+def test_perception_radius(engine):
+    object_flock = create_flock("object", True, double_buffer=True,
+                                perception_radius=15)
+    array_flock = create_flock(engine, True, perception_radius=15)
+
+    array_flock.positions[:] = [tuple(boid.pos) for boid in object_flock.boids]
+    array_flock.directions[:] = [tuple(boid.dir)
+                                 for boid in object_flock.boids]
+    array_flock.types[:] = [boid.type for boid in object_flock.boids]
+
+    object_flock.update_boids()
+    array_flock.update_boids()
+
+    assert np.allclose(array_flock.positions,
+                       [tuple(boid.pos) for boid in object_flock.boids])
+    assert np.allclose(array_flock.directions,
+                       [tuple(boid.dir) for boid in object_flock.boids])
+
+
+@pytest.mark.parametrize("engine", ["numpy", "numba"])
+def test_workers(engine):
+    flock = create_flock(engine, True)
+    parallel = create_flock(engine, True, workers=3)
+
+    parallel.positions = flock.positions.copy()
+    parallel.directions = flock.directions.copy()
+    parallel.types = flock.types.copy()
+
+    for step in range(5):
+        flock.update_boids()
+        parallel.update_boids()
+
+        # A closed flock starts new threads when it is updated again
+        if step == 2:
+            parallel.close()
+            assert parallel.executor is None
+
+    assert np.allclose(flock.positions, parallel.positions)
+    assert np.allclose(flock.directions, parallel.directions)
+
+    with parallel:
+        assert parallel.executor is not None
+    assert parallel.executor is None
+
+
+def test_boid_views():
+    flock = create_flock("numpy", True)
+
+    boids = flock.boids
+    assert len(boids) == 200
+    assert all(isinstance(boid, BoidView) for boid in boids)
+
+    boid = boids[0]
+    boid.pos = Vector2(10, 20)
+    boid.dir = Vector2(1, -1)
+
+    assert tuple(flock.positions[0]) == (10, 20)
+    assert tuple(flock.directions[0]) == (1, -1)
+    assert boid.pos == Vector2(10, 20)
+    assert boid.color == flock.type_colors[boid.type]
+
+    # Changing the vectors of a view changes the arrays
+    boid.pos.x = 30
+    boid.dir += Vector2(1, 2)
+    boid.dir *= 2
+    assert tuple(flock.positions[0]) == (30, 20)
+    assert tuple(flock.directions[0]) == (4, 2)
+
+    # Vectors calculated from a view are new vectors
+    pos = boid.pos + Vector2(1, 1)
+    pos.x = 0
+    assert tuple(flock.positions[0]) == (30, 20)
+
+
+def test_unknown_engine():
+    with pytest.raises(ValueError):
+        create_flock("unknown", True)